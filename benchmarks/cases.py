@@ -0,0 +1,57 @@
+""" Benchmarked cores, each case builds a fresh design and its inputs (inputs are seeded, runs are comparable). """
+import numpy as np
+from scipy import signal
+
+from pyha.common.context_managers import SimulationRunning
+from pyha.cores.cordic.core import Cordic, CordicMode
+from pyha.cores.cordic.nco.nco import NCO
+from pyha.cores.fft.fft_core.r2sdf import R2SDF
+from pyha.cores.fft.spectrogram.spectrogram import Spectrogram
+from pyha.cores.filter.dc_removal.dc_removal import DCRemoval
+from pyha.cores.filter.fir.fir import FIR
+from pyha.cores.packet.crc16 import CRC16
+
+
+class Case:
+    """
+    :param name: Key in the results.
+    :param make_dut: Returns new design object.
+    :param make_inputs: Returns list of inputs (one for each argument of 'main').
+    """
+
+    def __init__(self, name, make_dut, make_inputs):
+        self.name = name
+        self.make_dut = make_dut
+        self.make_inputs = make_inputs
+
+    def inputs(self):
+        np.random.seed(0)
+        return self.make_inputs()
+
+    def model_inputs(self, dut):
+        """ Inputs for 'MODEL_PYHA', that simulation does not apply the input callback of the design (e.g. DataValid) """
+        inputs = self.inputs()
+        if hasattr(dut, '_pyha_simulation_input_callback'):
+            with SimulationRunning.enable():
+                inputs = [dut._pyha_simulation_input_callback(x) for x in inputs]
+        return inputs
+
+
+def complex_noise(n, power=0.1):
+    return (np.random.uniform(-1, 1, n) + np.random.uniform(-1, 1, n) * 1j) * power
+
+
+CASES = [
+    Case('r2sdf_256', lambda: R2SDF(256, twiddle_bits=18), lambda: [complex_noise(256 * 4)]),
+    Case('r2sdf_1024', lambda: R2SDF(1024, twiddle_bits=18), lambda: [complex_noise(1024 * 2)]),
+    Case('r2sdf_8192', lambda: R2SDF(8192, twiddle_bits=18), lambda: [complex_noise(8192 * 2)]),
+    Case('fir_remez128', lambda: FIR(signal.remez(128, [0, 0.1, 0.2, 0.5], [1, 0])),
+         lambda: [np.random.uniform(-1, 1, 2048)]),
+    Case('cordic', lambda: Cordic(16, CordicMode.VECTORING), lambda: list(0.5 * (np.random.rand(3, 2048) * 2 - 1))),
+    Case('nco', lambda: NCO(), lambda: [np.random.uniform(-1, 1, 2048)]),
+    Case('dc_removal_2048', lambda: DCRemoval(2048), lambda: [complex_noise(2048 * 3)]),
+    Case('spectrogram', lambda: Spectrogram(256, avg_freq_axis=2, avg_time_axis=4, window_type='hann'),
+         lambda: [complex_noise(256 * 8)]),
+    Case('crc16', lambda: CRC16(init_galois=0x48f9, xor=0x1021),
+         lambda: [np.random.uniform(0, 1, 4096) > 0.5, [False] * 4096]),
+]
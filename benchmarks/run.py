@@ -0,0 +1,148 @@
+""" Performance benchmarks of the shipped cores, results are JSON so that regressions can be tracked between releases.
+
+For each case:
+* simulated cycles per second of 'MODEL_PYHA' and 'HARDWARE' simulations
+* peak (Python heap) memory of the 'HARDWARE' simulation
+* ``Converter.to_vhdl`` time
+* serialization time of the RTL simulation inputs (``write_cocotb_inputs``)
+
+Usage (from repository root)::
+
+    python -m benchmarks.run --output benchmarks.json
+    python -m benchmarks.run --cases r2sdf_256 crc16
+"""
+import argparse
+import datetime
+import json
+import logging
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from pyha import simulate, __version__
+from pyha.common.context_managers import SimulationRunning
+from pyha.conversion.conversion import Converter
+from pyha.simulation.simulation_interface import convert_input_types, transpose, write_cocotb_inputs
+
+from benchmarks.cases import CASES
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def simulation_speed(case, simulation):
+    dut = case.make_dut()
+    inputs = case.model_inputs(dut) if simulation == 'MODEL_PYHA' else case.inputs()
+    seconds = timed(lambda: simulate(dut, *inputs, simulations=[simulation], pipeline_flush=None))
+    return {'seconds': seconds, 'cycles_per_second': len(inputs[0]) / seconds}
+
+
+def peak_memory(case):
+    dut = case.make_dut()
+    inputs = case.inputs()
+    tracemalloc.start()
+    try:
+        simulate(dut, *inputs, simulations=['HARDWARE'], pipeline_flush=None)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def hardware_inputs(dut, inputs):
+    """ Inputs of each cycle, as ``simulate`` gives them to the design and the RTL simulation """
+    if hasattr(dut, '_pyha_simulation_input_callback'):
+        with SimulationRunning.enable():
+            return list(dut._pyha_simulation_input_callback(tuple(inputs)))
+    return transpose(convert_input_types(inputs, silence=True))
+
+
+def conversion(case):
+    """ Times of VHDL conversion and RTL input serialization, design is first simulated with type discovery """
+    dut = case.make_dut()
+    inputs = case.inputs()
+    dut._pyha_enable_function_profiling_for_types()
+    simulate(dut, *inputs, simulations=['HARDWARE'], pipeline_flush=None)
+    with tempfile.TemporaryDirectory() as path:
+        ret = {'conversion_seconds': timed(lambda: Converter(dut, output_dir=path).to_vhdl())}
+        cycles = hardware_inputs(dut, inputs)
+        ret['serialization_seconds'] = timed(lambda: write_cocotb_inputs(cycles, path))
+    return ret
+
+
+def run_case(case):
+    result = {'cycles': len(case.inputs()[0]), 'errors': {}}
+    measurements = [('MODEL_PYHA', lambda: simulation_speed(case, 'MODEL_PYHA')),
+                    ('HARDWARE', lambda: simulation_speed(case, 'HARDWARE')),
+                    ('peak_memory_bytes', lambda: peak_memory(case)),
+                    ('conversion', lambda: conversion(case))]
+    for name, measure in measurements:
+        try:
+            value = measure()
+        except Exception as e:  # keep benchmarking the rest, error is part of the results
+            result['errors'][name] = f'{type(e).__name__}: {e}'
+            continue
+        if name == 'conversion':
+            result.update(value)
+        else:
+            result[name] = value
+    return result
+
+
+def run(cases):
+    return {'pyha_version': __version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'results': {case.name: run_case(case) for case in cases}}
+
+
+def summary(report):
+    def fmt(value, pattern):
+        return '-' if value is None else pattern.format(value)
+
+    header = ('CASE', 'CYCLES', 'MODEL_PYHA [cyc/s]', 'HARDWARE [cyc/s]', 'PEAK [MB]', 'CONVERSION [s]',
+              'SERIALIZE [s]', 'ERRORS')
+    rows = []
+    for name, x in report['results'].items():
+        rows.append((name, str(x['cycles']),
+                     fmt(x.get('MODEL_PYHA', {}).get('cycles_per_second'), '{:.1f}'),
+                     fmt(x.get('HARDWARE', {}).get('cycles_per_second'), '{:.1f}'),
+                     fmt(x.get('peak_memory_bytes') and x['peak_memory_bytes'] / 1e6, '{:.1f}'),
+                     fmt(x.get('conversion_seconds'), '{:.2f}'),
+                     fmt(x.get('serialization_seconds'), '{:.3f}'),
+                     ', '.join(x['errors']) or '-'))
+    widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+    return '\n'.join('  '.join(col.ljust(w) for col, w in zip(row, widths)).rstrip() for row in [header] + rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pyha performance benchmarks')
+    parser.add_argument('--cases', nargs='*', help=f'default is all: {" ".join(x.name for x in CASES)}')
+    parser.add_argument('--output', help='JSON file, default is stdout')
+    args = parser.parse_args(argv)
+
+    cases = CASES
+    if args.cases:
+        unknown = set(args.cases) - {x.name for x in CASES}
+        if unknown:
+            parser.error(f'unknown cases: {" ".join(sorted(unknown))}')
+        cases = [x for x in CASES if x.name in args.cases]
+
+    logging.disable(logging.WARNING)  # simulation progress and overflow logs
+    report = run(cases)
+    print(summary(report), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,12 @@ from .common.data.data import *
 from .common.complex import Complex, default_complex
 from .common.core import Hardware
 from .common.fixed_point import Sfix, scalb, resize, left_index, right_index, default_sfix
+from .common.fixed_point_array import SfixArray, ComplexArray
 from .simulation.simulation_interface import simulate, assert_equals, sims_close, hardware_sims_equal, assert_simulations_equal, get_simulator_quartus
+from .simulation.lanes import simulate_lanes
+from .simulation.parallel import simulate_many
+from .simulation.simulator import Simulator
+from .simulation.streaming import simulate_stream
 from .simulation.plotter import *
 
 redbaron.ipython_behavior = False
@@ -1,5 +1,5 @@
 import numpy as np
-from pyha import Hardware, Complex, get_data_file, load_complex64_file
+from pyha import Hardware, Complex, Simulator, get_data_file, IQFile
 from pyha.cores import DCRemoval
 from pyha.common.datavalid import DataValid, NumpyToDataValid
 
@@ -34,5 +34,5 @@ def test_all():
 
     file = get_data_file('gqrx_20180910_155357_2400499992_2999999_fc.raw')
     # file = get_data_file('gqrx_20180910_155357_2400499992_2999999_fc.raw')
-    input_signal = load_complex64_file(file)[:1024 * 8]  # IQ samples
+    input_signal = IQFile(file).read(1024 * 8)  # IQ samples
     Simulator(dut, trace=True).run(input_signal).assert_equal(rtol=1e-3, atol=1e-3)
@@ -2,7 +2,8 @@ import logging
 import math
 
 from pyha.common.context_managers import SimPath
-from pyha.common.fixed_point import Sfix
+from pyha.common.telemetry import Telemetry
+from pyha.common.fixed_point import Sfix, FixedFormat, _format_property
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('complex')
@@ -33,28 +34,35 @@ class Complex:
     -0.50+0.50j [0:-17]
 
     """
-    __slots__ = ('round_style', 'overflow_style', 'right', 'left', 'val', 'wrap_is_ok', 'signed', 'bits', 'upper_bits')
+    __slots__ = ('fmt', 'val')
+
+    # SfixArray and ComplexArray, set by the 'fixed_point_array' module
+    _array_types = ()
+
+    left = _format_property('left')
+    right = _format_property('right')
+    signed = _format_property('signed')
+    round_style = _format_property('round_style')
+    overflow_style = _format_property('overflow_style')
+    wrap_is_ok = _format_property('wrap_is_ok')
+    bits = _format_property('bits')
+    upper_bits = _format_property('upper_bits')
 
     def __init__(self, val=0.0 + 0.0j, left=0, right=-17, overflow_style='wrap', round_style='truncate',
                  init_only=False, wrap_is_ok=False, signed=True, bits=None, upper_bits=None):
 
-        self.upper_bits = upper_bits
-        self.bits = bits
-        self.signed = signed
-        self.wrap_is_ok = wrap_is_ok
-        self.round_style = round_style
-        self.overflow_style = overflow_style
-        self.right = right
-        self.left = left
         self.val = val
 
         if init_only:
+            self.fmt = FixedFormat.get(left, right, signed, round_style, overflow_style, wrap_is_ok, bits, upper_bits)
             return
 
         if isinstance(val, Sfix):
             self.val = float(val) + float(left)*1j
-            self.left = val.left
-            self.right = val.right
+            left = val.left
+            right = val.right
+
+        self.fmt = FixedFormat.get(left, right, signed, round_style, overflow_style, wrap_is_ok, bits, upper_bits)
 
         if Sfix._float_mode.enabled:
             return
@@ -68,6 +76,14 @@ class Complex:
             else:
                 raise Exception(f'Unknown overflow style {self.overflow_style}')
 
+    @classmethod
+    def _from_fix(cls, real, imag, left, right, overflow_style='wrap', round_style='truncate', wrap_is_ok=False):
+        """ Fast constructor from raw integers, no quantization or overflow effects are applied. """
+        ret = cls.__new__(cls)
+        ret.fmt = fmt = FixedFormat.get(left, right, True, round_style, overflow_style, wrap_is_ok)
+        ret.val = complex(real * fmt.scale, imag * fmt.scale)
+        return ret
+
     @property
     def real(self):
         return Sfix(self.val.real, self.left, self.right, init_only=True)
@@ -87,19 +103,19 @@ class Complex:
     #     self.fixed_effects()
 
     def max_representable(self):
-        return 2 ** self.left - 2 ** self.right
+        return self.fmt.max_representable
 
     def min_representable(self):
-        return -2 ** self.left
+        return self.fmt.min_representable
 
     def overflows(self):
-        max = self.max_representable()
-        min = self.min_representable()
+        max = self.fmt.max_representable
+        min = self.fmt.min_representable
         return self.val.real < min or self.val.imag < min or self.val.real > max or self.val.imag > max
 
     def saturate(self):
-        max = self.max_representable()
-        min = self.min_representable()
+        max = self.fmt.max_representable
+        min = self.fmt.min_representable
         real = self.val.real
         imag = self.val.imag
 
@@ -113,26 +129,29 @@ class Complex:
         elif self.val.imag < min:
             imag = min
 
+        Telemetry.record('SATURATION', *sorted((self.val.real, self.val.imag)))
         self.val = real + imag * 1j
 
     def wrap(self):
-        fmin = self.min_representable()
-        fmax = 2 ** self.left  # no need to substract minimal step, 0.9998... -> 1.0 will still be wrapped as max bit pattern
+        fmin = self.fmt.min_representable
+        fmax = self.fmt.wrap_max  # no need to substract minimal step, 0.9998... -> 1.0 will still be wrapped as max bit pattern
         real = (self.val.real - fmin) % (fmax - fmin) + fmin
         imag = (self.val.imag - fmin) % (fmax - fmin) + fmin
         new_val = real + imag*1j
 
-        logger.error(f'WRAP {self.val:g} -> {new_val:g}\t[{SimPath}]')
+        if Telemetry.record('WRAP', *sorted((self.val.real, self.val.imag))):
+            logger.error(f'WRAP {self.val:g} -> {new_val:g}\t[{SimPath}] (further events are counted)')
         self.val = new_val
 
     def quantize(self):
-        fix = self.val / 2 ** self.right
-        if self.round_style is 'round':
+        scale = self.fmt.scale
+        fix = self.val / scale
+        if self.fmt.round_style == 'round':
             fix = round(fix.real) + round(fix.imag) * 1j
         else:
             fix = math.floor(fix.real) + math.floor(fix.imag) * 1j
 
-        self.val = fix * 2 ** self.right
+        self.val = fix * scale
 
     def resize(self, left=0, right=0, type=None, overflow_style='wrap', round_style='truncate', wrap_is_ok=False,
                signed=True):
@@ -147,18 +166,19 @@ class Complex:
 
     def __eq__(self, other):
         if type(other) is type(self):
-            return all([getattr(self, k) == getattr(other, k) for k in self.__slots__])
+            return self.fmt == other.fmt and self.val == other.val
         return False
 
     def __call__(self, x, left=None, right=None):
+        fmt = self.fmt
         if left is None:
-            left = self.left
+            left = fmt.left
 
         if right is None:
-            right = self.right
+            right = fmt.right
 
-        return Complex(complex(x), left, right, self.overflow_style,
-                    self.round_style, False, self.wrap_is_ok, self.signed)
+        return Complex(complex(x), left, right, fmt.overflow_style,
+                    fmt.round_style, False, fmt.wrap_is_ok, fmt.signed)
 
     def __len__(self):
         if self.signed:
@@ -182,10 +202,14 @@ class Complex:
         elif isinstance(other, (float, int)):
             other = Sfix(other, self.left, self.right, overflow_style='saturate', round_style='round',
                          signed=self.signed)
+        elif isinstance(other, Complex._array_types):
+            return NotImplemented  # let the array types reflected operator handle it
         return other
 
     def __add__(self, other):
         other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
         left = max(self.left, other.left) + 1
         right = min(self.right, other.right)
         return Complex(self.val + other.val,
@@ -198,6 +222,8 @@ class Complex:
 
     def __sub__(self, other):
         other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
         left = max(self.left, other.left) + 1
         right = min(self.right, other.right)
         return Complex(self.val - other.val,
@@ -215,6 +241,8 @@ class Complex:
         Also support mult by float.
         """
         other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
         extra_bit = 1 # for complex mult, from addition
         if isinstance(other, (Sfix, float)):
             extra_bit = 0 # for real mult
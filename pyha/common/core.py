@@ -12,6 +12,7 @@ from pyha import Complex
 from pyha.common.context_managers import RegisterBehaviour, AutoResize, SimulationRunning, SimPath, \
     PYHA_DISABLE_PROFILE_HACKS
 from pyha.common.fixed_point import Sfix, resize, default_sfix
+from pyha.common.profiler import Profiler
 # functions that will not be decorated/converted/parsed
 from pyha.common.util import np_to_py, get_iterable, is_constant
 
@@ -20,6 +21,19 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('core')
 
 
+def type_signature(value):
+    """ Hashable description of everything that VHDL conversion derives from ``value`` (types, formats, sizes) """
+    if isinstance(value, (Sfix, Complex)):
+        return type(value), value.fmt.key
+    if isinstance(value, (list, tuple, UserList)):
+        return type(value), tuple(type_signature(x) for x in value)
+    if isinstance(value, dict):
+        return tuple((k, type_signature(v)) for k, v in value.items())
+    if isinstance(value, Hardware):
+        return type(value), tuple((k, type_signature(v)) for k, v in value.__dict__.items() if not k.startswith('_pyha'))
+    return type(value)
+
+
 class PyhaFunc:
     """ All functions of a Pyha class will be wrapped in this object, calls to original function are done with 'profiler hack' in
     order to save the local variables. """
@@ -27,6 +41,14 @@ class PyhaFunc:
     # if true, just call the function.. 10 x faster (but VHDL generation not supported)
     bypass = False
 
+    # type discovery is turned off (per function) once every local variable has been seen and the types of locals,
+    # arguments and outputs have not changed for this many calls, or after 'discovery_warmup' calls (if not None)
+    # regardless of the types
+    discovery_stable_calls = 64
+    discovery_warmup = None
+    # while discovery is off, locals are still sampled every this many calls (arguments/outputs are checked every call)
+    discovery_sample_interval = 1024
+
     class TraceManager:
         """ Enables nested functions calls, thanks to ref counting """
         last_call_locals = {}
@@ -69,19 +91,34 @@ class PyhaFunc:
 
         self.is_main = self.function_name == 'main'
 
+        self.discovery = True
+        self.stable_calls = 0
+        self.signature = None
+        self.io_signature = None
+        # locals assigned only in rarely taken branches must be seen before discovery can stop
+        self.local_names = set(func.__code__.co_varnames) - {'self'}
+        self.last_call_locals = {}
+
     def call_with_locals_discovery(self, *args, **kwargs):
         """ Call decorated function with tracing to read back local values """
+        if Profiler.enabled:
+            Profiler.enter(Profiler.location(self.func.__self__, self.function_name), self.func.__code__)
         if PYHA_DISABLE_PROFILE_HACKS:
             res = self.func(*args, **kwargs)
+            if Profiler.enabled:
+                Profiler.exit()
             return res
         else:
             self.TraceManager.set_profile()
             res = self.func(*args, **kwargs)
             sys.setprofile(None)  # without this things get fucked up
             self.TraceManager.remove_profile()
+            if Profiler.enabled:
+                Profiler.exit()
 
             self.TraceManager.last_call_locals.pop('self')
-            self.update_local_types(self.TraceManager.last_call_locals)
+            self.last_call_locals = self.TraceManager.last_call_locals
+            self.update_local_types(self.last_call_locals)
 
             # in case nested call, restore the tracer function
             self.TraceManager.restore_profile()
@@ -144,19 +181,70 @@ class PyhaFunc:
                     continue  # dont allow overwriting Sfix values
                 self.output_types[i] = v
 
+    def update_discovery(self, args, kwargs, ret):
+        """ Turns the type discovery off once types have been stable for ``discovery_stable_calls`` calls """
+        io_signature = (type_signature(args), type_signature(kwargs), type_signature(ret))
+        signature = (io_signature, type_signature(self.last_call_locals))
+        if signature == self.signature:
+            self.stable_calls += 1
+        else:
+            self.signature = signature
+            self.stable_calls = 0
+
+        warmup_over = PyhaFunc.discovery_warmup is not None and self.calls >= PyhaFunc.discovery_warmup
+        locals_seen = self.local_names <= self.local_types.keys()
+        discovery = (self.stable_calls < PyhaFunc.discovery_stable_calls or not locals_seen) and not warmup_over
+        if self.discovery and not discovery:
+            logger.debug(f'{self.class_name}.{self.function_name}() types are stable, stopping type discovery')
+        self.discovery = discovery
+        self.io_signature = io_signature
+
+    def call_without_discovery(self, args, kwargs):
+        """ Fast path, same register and auto-resize behaviour as the discovery path but locals are not collected.
+        If the types changed, the types of this call are collected and discovery restarts on the next call. """
+        fifo = SimPath.fifo
+        fifo.append(f'{self.class_name}.{self.function_name}()')
+        profile = Profiler.enabled
+        if profile:
+            Profiler.enter(Profiler.location(self.func.__self__, self.function_name), self.func.__code__)
+        try:
+            with RegisterBehaviour.enable(), AutoResize.enable():
+                ret = self.func(*args, **kwargs)
+        finally:
+            fifo.pop()
+            if profile:
+                Profiler.exit()
+
+        io_signature = (type_signature(args), type_signature(kwargs), type_signature(ret))
+        if io_signature != self.io_signature:
+            logger.info(f'{self.class_name}.{self.function_name}() got new types, restarting type discovery')
+            self.discovery = True
+            self.stable_calls = 0
+            # register effects of this call are already done, just collect the new types
+            self.update_input_types(args, kwargs)
+            self.update_output_types(ret)
+        return ret
+
     def __call__(self, *args, **kwargs):
         if PyhaFunc.bypass:
             return self.func(*args, **kwargs)
 
-        self.update_input_types(args, kwargs)
         self.calls += 1
+        if not self.discovery and self.calls % PyhaFunc.discovery_sample_interval:
+            return self.call_without_discovery(args, kwargs)
 
-        with SimPath(f'{self.class_name}.{self.function_name}()'):
-            with RegisterBehaviour.enable():
-                with AutoResize.enable():
-                    ret = self.call_with_locals_discovery(*args, **kwargs)
+        # 'type discovery' is the overhead, time spent in the function itself is profiled separately
+        with Profiler.phase('type discovery'):
+            self.update_input_types(args, kwargs)
 
-        self.update_output_types(ret)
+            with SimPath(f'{self.class_name}.{self.function_name}()'):
+                with RegisterBehaviour.enable():
+                    with AutoResize.enable():
+                        ret = self.call_with_locals_discovery(*args, **kwargs)
+
+            self.update_output_types(ret)
+            if not PYHA_DISABLE_PROFILE_HACKS:
+                self.update_discovery(args, kwargs, ret)
         return ret
 
 
@@ -199,7 +287,13 @@ class Meta(type):
 
 
 def auto_resize(target, value):
-    if not AutoResize.is_enabled() or not isinstance(target, (Sfix, Complex)) or Sfix._float_mode.enabled:
+    if not AutoResize.is_enabled() or Sfix._float_mode.enabled:
+        return value
+    if isinstance(target, Sfix._array_types):
+        # lanes of 'simulate_lanes', list element already holds an array
+        return resize(value, target.left, target.right, overflow_style=target.overflow_style,
+                      round_style=target.round_style, wrap_is_ok=target.wrap_is_ok, signed=target.signed)
+    if not isinstance(target, (Sfix, Complex)):
         return value
     if target.bits is not None:
         right = value.right
@@ -220,11 +314,68 @@ def auto_resize(target, value):
     else:
         left = target.left if target.left is not None else value.left
         right = target.right if target.right is not None else value.right
+
+    if isinstance(value, Sfix._array_types):
+        # lanes of 'simulate_lanes', register turns into an array
+        return value.resize(left, right, overflow_style=target.overflow_style, round_style=target.round_style,
+                            wrap_is_ok=target.wrap_is_ok, signed=target.signed)
     return target(value, left, right)
     # return resize(value, left, right, round_style=target.round_style,
     #               overflow_style=target.overflow_style, wrap_is_ok=target.wrap_is_ok, signed=target.signed)
 
 
+class DirtyRegisters:
+    """ Objects (``Hardware`` or ``PyhaList``) whose registers were assigned in the current cycle, register update
+    only commits these, so the cost scales with activity instead of design size.
+    Objects with own ``_pyha_update_registers`` (``RAM``, ``ShiftRegister``) run every cycle, they are collected once
+    per top-level object. """
+    objects = {}  # id -> object
+    root = None
+    always = []
+
+    @classmethod
+    def reset(cls):
+        cls.objects.clear()
+        cls.root = None
+        cls.always = []
+
+    @staticmethod
+    def mark(obj):
+        DirtyRegisters.objects[id(obj)] = obj
+
+    @classmethod
+    def collect_always(cls, obj):
+        if isinstance(obj, PyhaList):
+            return [x for elem in obj.data if isinstance(elem, Hardware) for x in cls.collect_always(elem)]
+        if not isinstance(obj, Hardware) or type(obj)._pyha_update_registers is not Hardware._pyha_update_registers:
+            return [obj]
+        if obj._pyha_is_local():
+            return []
+        return [x for child in obj._pyha_updateable for x in cls.collect_always(child)]
+
+    @classmethod
+    def always_for(cls, root):
+        if cls.root is not root:
+            cls.root = root
+            cls.always = [x for child in root._pyha_updateable for x in cls.collect_always(child)]
+        return cls.always
+
+    @classmethod
+    def commit_marked(cls):
+        objects = cls.objects
+        for obj in objects.values():
+            obj._pyha_commit_registers()
+        objects.clear()
+
+    @classmethod
+    def commit(cls, root):
+        always = cls.always_for(root)
+        cls.commit_marked()
+
+        for obj in always:
+            obj._pyha_update_registers()
+
+
 class PyhaList(UserList):
     """ All the lists in the design will be wrapped in this in order to
      override __setitem__ for array element assigns, like a[1] = 1 """
@@ -251,9 +402,13 @@ class PyhaList(UserList):
                 # self.data[i].__dict__['_pyha_next'][k] = v
 
         else:
-            if isinstance(self.data[i], (Sfix, Complex)):
+            if isinstance(self.data[i], (Sfix, Complex, *Sfix._array_types)):
                 with SimPath(f'{self.var_name}[{i}]='):
-                    y = auto_resize(self.data[i], y)
+                    if Profiler.enabled:
+                        with Profiler.phase('auto-resize'):
+                            y = auto_resize(self.data[i], y)
+                    else:
+                        y = auto_resize(self.data[i], y)
 
                 # lazy bounds feature, if bounds is None, take the bound from assigned value
                 if self.data[i].left is None:
@@ -268,6 +423,7 @@ class PyhaList(UserList):
 
             if RegisterBehaviour.is_enabled():
                 self._pyha_next[i] = y
+                DirtyRegisters.mark(self)
             else:
                 self.data[i] = y
 
@@ -281,6 +437,9 @@ class PyhaList(UserList):
         else:
             self.data = self._pyha_next[:]
 
+    def _pyha_commit_registers(self):
+        self.data = self._pyha_next[:]
+
     def _pyha_enable_function_profiling_for_types(self):
         if hasattr(self.data[0], '_pyha_update_registers'):  # is submodule
             for i, x in enumerate(self.data):
@@ -354,8 +513,7 @@ class Hardware(with_metaclass(Meta)):
                             setattr(result, k, deepcopy(v, memo))
                 else:
                     for k, v in self.__dict__.items():
-                        if k == '_pyha_initial_self' or k == '_pyha_next' or isinstance(v,
-                                                                                        Hardware):  # dont waste time on endless deepcopy
+                        if k == '_pyha_initial_self' or k == '_pyha_next':  # dont waste time on endless deepcopy
                             setattr(result, k, copy(v))
                             # print(k, v)
                         else:
@@ -363,15 +521,13 @@ class Hardware(with_metaclass(Meta)):
         return result
 
     def _pyha_update_registers(self):
-        """ Update registers (everything in self), called after the return of toplevel 'main' """
+        """ Update registers assigned in this cycle (see ``DirtyRegisters``), called after the return of toplevel 'main' """
         if RegisterBehaviour.is_force_disabled() or self._pyha_is_local():
             return
-        # update atoms
-        self.__dict__.update(self._pyha_next)
+        DirtyRegisters.commit(self)
 
-        # update all childs
-        for x in self._pyha_updateable:
-            x._pyha_update_registers()
+    def _pyha_commit_registers(self):
+        self.__dict__.update(self._pyha_next)
 
     def _pyha_enable_function_profiling_for_types(self):
         for k, v in self.__dict__.items():
@@ -452,7 +608,11 @@ class Hardware(with_metaclass(Meta)):
         if AutoResize.is_enabled():
             target = getattr(self._pyha_initial_self, name)
             with SimPath(f'{name}='):
-                value = auto_resize(target, value)
+                if Profiler.enabled:
+                    with Profiler.phase('auto-resize'):
+                        value = auto_resize(target, value)
+                else:
+                    value = auto_resize(target, value)
 
         if isinstance(value, list):
             # list assign
@@ -467,8 +627,10 @@ class Hardware(with_metaclass(Meta)):
                         if k.startswith('_pyha'):
                             continue
                         elem.__dict__['_pyha_next'][k] = v
+                    DirtyRegisters.mark(elem)
             else:
                 self.__dict__[name]._pyha_next = value
+                DirtyRegisters.mark(self.__dict__[name])
             return
 
         if isinstance(value, Hardware):
@@ -480,6 +642,7 @@ class Hardware(with_metaclass(Meta)):
             return
 
         self.__dict__['_pyha_next'][name] = value
+        DirtyRegisters.mark(self)
 
     def _pyha_to_python_value(self):
         ret = copy(self)
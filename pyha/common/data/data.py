@@ -1,4 +1,3 @@
-import scipy
 import numpy as np
 
 
@@ -7,10 +6,110 @@ def get_data_file(name):
 
 
 def load_complex64_file(file: str):
-    f = scipy.fromfile(open(file), dtype=scipy.complex64)
+    f = np.fromfile(open(file), dtype=np.complex64)
     return f
 
 
 def save_complex64_file(file: str, iq: np.array):
-    out = iq.astype(scipy.complex64)
+    out = iq.astype(np.complex64)
     out.tofile(file)
+
+
+# bytes per IQ sample and default scale to -1.0 ... 1.0 range
+IQ_FORMATS = {
+    'complex64': (8, 1.0),
+    'int16': (4, 1 / 32768),  # interleaved I, Q
+    'int12': (3, 1 / 2048),  # LimeSDR packed: 12 bit I, 12 bit Q in 3 bytes
+}
+
+
+class IQFile:
+    """
+    Memory-mapped IQ capture, samples are read in chunks so long recordings can feed ``simulate`` or models
+    without loading the whole file.
+
+    :param file: Path to the raw capture (no header).
+    :param format: One of ``IQ_FORMATS``: 'complex64', 'int16' or 'int12' (LimeSDR packed).
+    :param dtype: ``Complex`` format of the design input, samples are quantized to it (values stay floats).
+    :param chunk_size: Number of samples in chunks returned by iteration.
+    :param scale: Multiplier for integer formats, default maps full scale to -1.0 ... 1.0.
+
+    >>> iq = IQFile(file, format='int12', dtype=Complex(0.0, 0, -11, overflow_style='saturate', round_style='round'))
+    >>> iq.seek(1_000_000)
+    >>> simulate(dut, iq.read(8192))
+    >>> for chunk in iq:  # rest of the file
+    ...     process(chunk)
+    """
+
+    def __init__(self, file, format='complex64', dtype=None, chunk_size=1 << 16, scale=None):
+        if format not in IQ_FORMATS:
+            raise ValueError(f'Unknown IQ format {format}, use one of {list(IQ_FORMATS)}')
+        self.file = str(file)
+        self.format = format
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        sample_bytes, default_scale = IQ_FORMATS[format]
+        self.scale = default_scale if scale is None else scale
+
+        if format == 'complex64':
+            self.data = np.memmap(self.file, dtype=np.complex64, mode='r')
+        elif format == 'int16':
+            self.data = np.memmap(self.file, dtype=np.int16, mode='r').reshape(-1, 2)
+        else:
+            self.data = np.memmap(self.file, dtype=np.uint8, mode='r').reshape(-1, sample_bytes)
+        self.position = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def seek(self, offset, whence=0):
+        """ Move to sample ``offset``, ``whence`` is same as for ``file.seek`` (0 - start, 1 - current, 2 - end) """
+        base = {0: 0, 1: self.position, 2: len(self)}[whence]
+        self.position = min(max(base + offset, 0), len(self))
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def read(self, count=None):
+        """ Next ``count`` samples (or rest of the file) as complex array """
+        end = len(self) if count is None else min(self.position + count, len(self))
+        raw = self.data[self.position:end]
+        self.position = end
+        return self.quantize(self.decode(raw))
+
+    def decode(self, raw):
+        if self.format == 'complex64':
+            return np.array(raw, dtype=np.complex128)
+        if self.format == 'int16':
+            return (raw[:, 0] + raw[:, 1] * 1j) * self.scale
+
+        raw = raw.astype(np.int32)
+        i = raw[:, 0] | ((raw[:, 1] & 0x0F) << 8)
+        q = (raw[:, 1] >> 4) | (raw[:, 2] << 4)
+        i = np.where(i >= 2048, i - 4096, i)  # sign extend
+        q = np.where(q >= 2048, q - 4096, q)
+        return (i + q * 1j) * self.scale
+
+    def quantize(self, samples):
+        if self.dtype is None:
+            return samples
+        from pyha.common.fixed_point_array import ComplexArray
+        return ComplexArray(samples, self.dtype.left, self.dtype.right, overflow_style=self.dtype.overflow_style,
+                            round_style=self.dtype.round_style, wrap_is_ok=self.dtype.wrap_is_ok).val
+
+    def __iter__(self):
+        while self.position < len(self):
+            yield self.read(self.chunk_size)
+
+
+def load_iq_chunks(file, chunk_size=1 << 16, offset=0, count=None, format='complex64', dtype=None, scale=None):
+    """ Generator of ``chunk_size`` sample chunks of an IQ capture, starting from sample ``offset``.
+    See ``IQFile`` for other arguments. """
+    iq = IQFile(file, format=format, dtype=dtype, chunk_size=chunk_size, scale=scale)
+    iq.seek(offset)
+    remaining = len(iq) - iq.tell() if count is None else count
+    while remaining > 0 and iq.tell() < len(iq):
+        chunk = iq.read(min(chunk_size, remaining))
+        remaining -= len(chunk)
+        yield chunk
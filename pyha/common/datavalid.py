@@ -33,8 +33,14 @@ class NumpyToDataValid:
         ret = []
         if isinstance(inputs[0], (list, np.ndarray)):
             for row in inputs:
-                ret += [DataValid(self.dtype(elem), valid=True) for elem in row]
+                ret += [self.convert(elem) for elem in row]
         else:
-            ret += [DataValid(self.dtype(elem), valid=True) for elem in inputs]
+            ret += [self.convert(elem) for elem in inputs]
 
-        return np.array(ret)
\ No newline at end of file
+        return np.array(ret)
+
+    def convert(self, elem):
+        """ ``None`` is an invalid sample """
+        if elem is None:
+            return DataValid(self.dtype(0.0), valid=False)
+        return DataValid(self.dtype(elem), valid=True)
\ No newline at end of file
@@ -1,14 +1,128 @@
 import logging
 import math
+from functools import lru_cache
 
 import numpy as np
 
 from pyha.common.context_managers import ContextManagerRefCounted, SimPath
+from pyha.common.telemetry import Telemetry
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('sfix')
 
 
+class FixedFormat:
+    """
+    Interned fixed-point format, shared by all ``Sfix``/``Complex`` values of the same type.
+    Holds the bounds and styles plus precomputed scale factors and limits, thus values only need to store
+    (format, raw value). Use ``FixedFormat.get`` to construct, equal formats are the same object:
+
+    >>> FixedFormat.get(0, -17) is Sfix(0.5, 0, -17).fmt
+    True
+
+    Formats are immutable, use ``replace`` to get a modified format.
+
+    Formats wider than ``WIDE_BITS`` (accumulators grow without limit in float mode) are not interned and compute their
+    bounds on first use. Interned formats are kept in a LRU cache of ``INTERN_MAX`` entries, equal formats compare equal
+    even if they are not the same object.
+    """
+    WIDE_BITS = 256
+    INTERN_MAX = 4096
+
+    BOUNDS = ('scale', 'max_representable', 'min_representable', 'wrap_max', 'max_fix', 'min_fix', 'int_ok')
+    __slots__ = ('left', 'right', 'signed', 'round_style', 'overflow_style', 'wrap_is_ok', 'bits', 'upper_bits',
+                 'key') + BOUNDS
+
+    def __init__(self, left, right, signed, round_style, overflow_style, wrap_is_ok, bits, upper_bits, lazy=False):
+        self.left = left
+        self.right = right
+        self.signed = signed
+        self.round_style = round_style
+        self.overflow_style = overflow_style
+        self.wrap_is_ok = wrap_is_ok
+        self.bits = bits
+        self.upper_bits = upper_bits
+        self.key = (left, right, signed, round_style, overflow_style, wrap_is_ok, bits, upper_bits)
+        if not lazy:
+            self.compute_bounds()
+
+    def compute_bounds(self):
+        left, right, signed = self.left, self.right, self.signed
+        self.scale = self.max_representable = self.min_representable = self.wrap_max = self.max_fix = self.min_fix = None
+        self.int_ok = False
+        if left is not None and right is not None:
+            self.scale = 2.0 ** right
+            try:
+                self.max_representable = 2 ** left - 2 ** right
+                self.min_representable = -2 ** left if signed else 0
+                self.wrap_max = 2 ** left  # upper end of the wrap range, one step above 'max_representable'
+            except OverflowError:  # bounds grow without limit in float mode (no resize)
+                self.max_representable = self.wrap_max = float('inf')
+                self.min_representable = float('-inf') if signed else 0
+            # integer representation needs integer bounds
+            self.int_ok = left == int(left) and right == int(right) and left >= right
+            if self.int_ok:
+                self.max_fix = (1 << int(left - right)) - 1
+                self.min_fix = -(1 << int(left - right)) if signed else 0
+
+    def __getattr__(self, name):
+        # only called for the bounds of lazy formats, that are not set yet
+        if name in FixedFormat.BOUNDS:
+            self.compute_bounds()
+            return object.__getattribute__(self, name)
+        raise AttributeError(name)
+
+    @staticmethod
+    def get(left=None, right=None, signed=True, round_style='truncate', overflow_style='wrap', wrap_is_ok=False,
+            bits=None, upper_bits=None):
+        if left is not None and right is not None and left - right > FixedFormat.WIDE_BITS:
+            return FixedFormat(left, right, signed, round_style, overflow_style, wrap_is_ok, bits, upper_bits, lazy=True)
+        return _intern_format(left, right, signed, round_style, overflow_style, wrap_is_ok, bits, upper_bits)
+
+    def __eq__(self, other):
+        return self is other or (type(other) is FixedFormat and self.key == other.key)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def replace(self, **kwargs):
+        """ Return format with some fields changed """
+        args = dict(zip(('left', 'right', 'signed', 'round_style', 'overflow_style', 'wrap_is_ok', 'bits',
+                         'upper_bits'), self.key))
+        args.update(kwargs)
+        return FixedFormat.get(**args)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        # unpickled formats are interned again
+        return FixedFormat.get, self.key
+
+    def __repr__(self):
+        return f'FixedFormat{self.key}'
+
+
+@lru_cache(maxsize=FixedFormat.INTERN_MAX)
+def _intern_format(*key):
+    return FixedFormat(*key)
+
+
+def _format_property(name):
+    """ Sfix/Complex format fields live in the shared ``FixedFormat``, setting one switches to another format. """
+
+    def getter(self):
+        return getattr(self.fmt, name)
+
+    def setter(self, value):
+        self.fmt = self.fmt.replace(**{name: value})
+
+    return property(getter, setter)
+
+
 class Sfix:
     """
     Signed fixed-point type. Default fixed-point format in Pyha is ``Sfix(left=0, right=-17)`` (17 fractional bits + sign)
@@ -22,15 +136,18 @@ class Sfix:
         Wrap:
 
         >>> Sfix(1.25, left=0, right=-17)
-        ERROR:sfix:WRAP 1.25000 -> -0.75000	[]
+        ERROR:sfix:WRAP 1.25 -> -0.75	[] (further events are counted)
         -0.75 [0:-17]
 
         Saturation:
 
         >>> Sfix(1.25, left=0, right=-17, overflow_style='saturate')
-        WARNING:sfix:SATURATION 1.25000 -> 0.99999	[]
+        WARNING:sfix:SATURATION 1.25 -> 0.999992	[] (further events are counted)
         0.9999923706054688 [0:-17]
 
+        Only the first event of each ``SimPath`` location is logged, all events are counted by ``Telemetry``
+        (see ``simulate(...).overflows``).
+
 
     :param round_style: 'truncate' (default) or 'round'
     :param wrap_is_ok: silences logging about WRAP
@@ -66,6 +183,18 @@ class Sfix:
     >>> a * a * a
     0.0018605706040557557 [2:-51]
 
+    Once the format (``left`` and ``right``) is known, the value is stored as the raw two's-complement integer
+    in ``fix`` and all the arithmetic, resizing, shifting and bit indexing is done on integers, thus results are
+    bit-exact at any width. ``val`` is the float view of the same value:
+
+    >>> a = Sfix(0.123, left=0, right=-17)
+    >>> a.fix
+    16121
+    >>> (a * a * a * a).fix  # 56 significant bits, would not fit into float
+    67541066170262881
+
+    Values with lazy bounds (``None``) and values created in the 'float mode' are backed by float (``fix`` is ``None``).
+
     ``resize`` can be used to force values into other format:
 
     >>> resize(a * a * a, left=0, right=-17)
@@ -78,39 +207,67 @@ class Sfix:
     # Disables all quantization and saturating stuff
     _float_mode = ContextManagerRefCounted()
 
-    __slots__ = ('signed', 'wrap_is_ok', 'round_style', 'overflow_style', 'right', 'left', 'val', 'bits', 'upper_bits')
+    # SfixArray and ComplexArray, set by the 'fixed_point_array' module
+    _array_types = ()
+
+    __slots__ = ('fmt', 'val', 'fix')
+
+    left = _format_property('left')
+    right = _format_property('right')
+    signed = _format_property('signed')
+    round_style = _format_property('round_style')
+    overflow_style = _format_property('overflow_style')
+    wrap_is_ok = _format_property('wrap_is_ok')
+    bits = _format_property('bits')
+    upper_bits = _format_property('upper_bits')
 
     def __init__(self, val=0.0, left=None, right=None, overflow_style='wrap',
                  round_style='truncate', init_only=False, wrap_is_ok=False, signed=True, bits=None, size_res=None, upper_bits=None):
 
-        self.upper_bits = upper_bits
-        self.bits = bits
-        self.signed = signed
-        self.wrap_is_ok = wrap_is_ok
-        self.round_style = round_style
-        self.overflow_style = overflow_style
-        self.right = right
-        self.left = left
-        self.val = float(val)
+        self.fix = None
+        if isinstance(val, Sfix):
+            source = val
+            self.val = val.val
+        else:
+            source = None
+            self.val = float(val)
+
         if init_only or Sfix._float_mode.enabled:
+            self.fmt = FixedFormat.get(left, right, signed, round_style, overflow_style, wrap_is_ok, bits, upper_bits)
+            if source is not None and source.fix is not None and source.fmt.right == right and self.fmt.int_ok:
+                self.fix = source.fix
             return
 
         if isinstance(left, Sfix):
-            self.right = left.right
-            self.left = left.left
+            right = left.right
+            left = left.left
         elif size_res is not None:
-            self.right = size_res.right
-            self.left = size_res.left
+            right = size_res.right
+            left = size_res.left
         else:
-            self.right = int(right) if right else right
-            self.left = int(left) if left else left
+            right = int(right) if right else right
+            left = int(left) if left else left
 
-        if self.left is None or self.right is None:
+        self.fmt = FixedFormat.get(left, right, signed, round_style, overflow_style, wrap_is_ok, bits, upper_bits)
+        if left is None or right is None:
             return
 
-        self.quantize()
+        self.quantize(source)
+        self._overflow_effects()
+
+    @classmethod
+    def _from_fix(cls, fix, left, right, signed=True, overflow_style='wrap', round_style='truncate', wrap_is_ok=False):
+        """ Fast constructor for integer-backed values, no quantization or overflow effects are applied. """
+        ret = cls.__new__(cls)
+        ret.fmt = fmt = FixedFormat.get(left, right, signed, round_style, overflow_style, wrap_is_ok)
+        ret.fix = fix
+        ret.val = fix * fmt.scale
+        return ret
+
+    def _overflow_effects(self):
         if self.overflows():
-            if overflow_style is 'saturate':
+            overflow_style = self.fmt.overflow_style
+            if overflow_style == 'saturate':
                 self.saturate()
             elif overflow_style in 'wrap':
                 self.wrap()
@@ -120,65 +277,94 @@ class Sfix:
     def __eq__(self, other):
         other = self._convert_other_operand(other)
         if type(other) is type(self):
-            equal = all([getattr(self, k) == getattr(other,k) for k in self.__slots__])
+            equal = self.fmt == other.fmt and self.val == other.val
+            if equal and self.fix is not None and other.fix is not None:
+                equal = self.fix == other.fix
             return equal
         return False
 
     def max_representable(self):
-        return 2 ** self.left - 2 ** self.right
+        return self.fmt.max_representable
 
     def min_representable(self):
-        if self.signed:
-            return -2 ** self.left
-        else:
-            return 0
+        return self.fmt.min_representable
 
     def overflows(self):
-        return self.val < self.min_representable() or \
-               self.val > self.max_representable()
+        fmt = self.fmt
+        if self.fix is not None:
+            return self.fix < fmt.min_fix or self.fix > fmt.max_fix
+        return self.val < fmt.min_representable or \
+               self.val > fmt.max_representable
 
     def saturate(self):
         old = self.val
-        if self.val > self.max_representable():
-            self.val = self.max_representable()
-        elif self.val < self.min_representable():
-            self.val = self.min_representable()
-
-        if old != 1.0:  # skip warnings about 1.0
-            if str(SimPath) != 'inputs':
-                try:
-                    import pydevd
-                    pydevd.settrace()
-                except ModuleNotFoundError:  # this happens when ran in 'Run' mode instead of 'Debug'
-                    pass
-            logger.warning(f'SATURATION {old:g} -> {self.val:g}\t[{SimPath}]')
+        fmt = self.fmt
+        if self.fix is not None:
+            self.fix = max(min(self.fix, fmt.max_fix), fmt.min_fix)
+            self.val = self.fix * fmt.scale
+        elif self.val > fmt.max_representable:
+            self.val = fmt.max_representable
+        elif self.val < fmt.min_representable:
+            self.val = fmt.min_representable
+
+        if Telemetry.record('SATURATION', old) and old != 1.0:  # skip warnings about 1.0
+            logger.warning(f'SATURATION {old:g} -> {self.val:g}\t[{SimPath}] (further events are counted)')
 
     def wrap(self):
-        fmin = self.min_representable()
-        fmax = 2 ** self.left  # no need to substract minimal step, 0.9998... -> 1.0 will still be wrapped as max bit pattern
-        new_val = (self.val - fmin) % (fmax - fmin) + fmin
-        if not self.wrap_is_ok and self.signed:
-            if str(SimPath) != 'inputs':
-                try:
-                    import pydevd
-                    pydevd.settrace()
-                except ModuleNotFoundError:  # this happens when ran in 'Run' mode instead of 'Debug'
-                    pass
-            logger.error(f'WRAP {self.val:g} -> {new_val:g}\t[{SimPath}]')
+        fmt = self.fmt
+        if self.fix is not None:
+            fmin = fmt.min_fix
+            fmax = fmt.max_fix + 1
+            new_fix = (self.fix - fmin) % (fmax - fmin) + fmin
+            new_val = new_fix * fmt.scale
+        else:
+            fmin = fmt.min_representable
+            fmax = fmt.wrap_max  # no need to substract minimal step, 0.9998... -> 1.0 will still be wrapped as max bit pattern
+            new_fix = None
+            new_val = (self.val - fmin) % (fmax - fmin) + fmin
+        if not fmt.wrap_is_ok and fmt.signed:
+            if Telemetry.record('WRAP', self.val):
+                logger.error(f'WRAP {self.val:g} -> {new_val:g}\t[{SimPath}] (further events are counted)')
+        self.fix = new_fix
         self.val = new_val
 
-    def quantize(self):
-        fix = self.val / 2 ** self.right
-        if self.round_style is 'round':
-            fix = round(fix)
+    def quantize(self, source=None):
+        """ Quantize to ``right`` bound, result is stored as raw integer in ``fix``.
+        If ``source`` is integer-backed Sfix, this works without going trough float. """
+        fmt = self.fmt
+        if not fmt.int_ok:
+            # degenerate format, keep the float representation
+            fix = self.val / fmt.scale
+            fix = round(fix) if fmt.round_style == 'round' else math.floor(fix)
+            self.val = fix * fmt.scale
+            return
+
+        if source is not None and source.fix is not None:
+            shift = source.fmt.right - fmt.right
+            if shift >= 0:
+                fix = source.fix << shift
+            else:
+                fix, remainder = divmod(source.fix, 1 << -shift)
+                if fmt.round_style == 'round':
+                    # round half to even, same as the Python 'round' and VHDL 'fixed_round'
+                    half = 1 << (-shift - 1)
+                    if remainder > half or (remainder == half and fix & 1):
+                        fix += 1
         else:
-            # this used to be int(fix), but this is a bug when fix is negative
-            fix = math.floor(fix)
+            fix = self.val / fmt.scale
+            if fmt.round_style == 'round':
+                fix = round(fix)
+            else:
+                # this used to be int(fix), but this is a bug when fix is negative
+                fix = math.floor(fix)
 
-        self.val = fix * 2 ** self.right
+        self.fix = fix
+        self.val = fix * fmt.scale
 
     # TODO: test, rounding not needed?
     def fixed_value(self):
+        if self.fix is not None:
+            return self.fix
         return int(round(self.val / 2 ** self.right))
 
     def __getitem__(self, item):
@@ -186,7 +372,7 @@ class Sfix:
         if self.right < 0:
             item += abs(self.right)
 
-        return bool(self.fixed_value() & (2 ** item))
+        return bool(self.fixed_value() & (1 << item))
 
     def __setitem__(self, key, value):
         if self.right < 0:
@@ -194,11 +380,13 @@ class Sfix:
 
         fix = self.fixed_value()
         if value:
-            fix = fix | (2 ** key)
+            fix = fix | (1 << key)
         else:
-            fix = fix & ~(2 ** key)
+            fix = fix & ~(1 << key)
 
-        self.val = fix * 2 ** self.right
+        if self.fix is not None:
+            self.fix = fix
+        self.val = fix * self.fmt.scale
 
     def __str__(self):
         return f'{self.val:g} [{self.left}:{self.right}]'
@@ -210,6 +398,8 @@ class Sfix:
         return float(self.val)
 
     def __int__(self):
+        if self.fix is not None and self.right <= 0:
+            return self.fix >> -self.right
         return int(math.floor(self.val))
 
     def resize(self, left=0, right=0, type=None, overflow_style='wrap', round_style='truncate', wrap_is_ok=False,
@@ -218,38 +408,48 @@ class Sfix:
             left = type.left
             right = type.right
 
-        return Sfix(self.val, left, right, overflow_style=overflow_style, round_style=round_style, wrap_is_ok=wrap_is_ok, signed=signed)
+        return Sfix(self, left, right, overflow_style=overflow_style, round_style=round_style, wrap_is_ok=wrap_is_ok, signed=signed)
 
     def _size_add(self, other):
         """ Size rules for add/sub operation. Handles the 'None'(lazy) cases. """
-        if self.left is None and other.left is None:
+        self_left, self_right = self.fmt.left, self.fmt.right
+        other_left, other_right = other.left, other.right
+        if self_left is None and other_left is None:
             left = None
-        elif self.left is None:
-            left = other.left + 1
-        elif other.left is None:
-            left = self.left + 1
+        elif self_left is None:
+            left = other_left + 1
+        elif other_left is None:
+            left = self_left + 1
         else:
-            left = max(self.left, other.left) + 1
-        if self.right is None and other.right is None:
+            left = max(self_left, other_left) + 1
+        if self_right is None and other_right is None:
             right = None
-        elif self.right is None:
-            right = other.right
-        elif other.right is None:
-            right = self.right
+        elif self_right is None:
+            right = other_right
+        elif other_right is None:
+            right = self_right
         else:
-            right = min(self.right, other.right)
+            right = min(self_right, other_right)
         return left, right
 
     def _convert_other_operand(self, other):
         if isinstance(other, (float, int)):
             other = Sfix(other, self.left, self.right, overflow_style='saturate', round_style='round',
                          signed=self.signed)
+        elif isinstance(other, Sfix._array_types):
+            return NotImplemented  # let the array types reflected operator handle it
         return other
 
     def __add__(self, other):
         other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
         left, right = self._size_add(other)
         signed = self.signed or other.signed
+        if self.fix is not None and getattr(other, 'fix', None) is not None:
+            fix = (self.fix << (self.fmt.right - right)) + (other.fix << (other.fmt.right - right))
+            return Sfix._from_fix(fix, left, right, signed=signed)
+
         return Sfix(self.val + other.val,
                     left,
                     right,
@@ -260,7 +460,13 @@ class Sfix:
 
     def __sub__(self, other):
         other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
         left, right = self._size_add(other)
+        if self.fix is not None and getattr(other, 'fix', None) is not None:
+            fix = (self.fix << (self.fmt.right - right)) - (other.fix << (other.fmt.right - right))
+            return Sfix._from_fix(fix, left, right)
+
         return Sfix(self.val - other.val,
                     left,
                     right,
@@ -272,24 +478,31 @@ class Sfix:
 
     def __mul__(self, other):
         other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
+        self_left, self_right = self.fmt.left, self.fmt.right
+        other_left, other_right = other.left, other.right
 
-        if self.left is None and other.left is None:
+        if self_left is None and other_left is None:
             left = None
-        elif self.left is None:
-            left = other.left + 1
-        elif other.left is None:
-            left = self.left + 1
+        elif self_left is None:
+            left = other_left + 1
+        elif other_left is None:
+            left = self_left + 1
         else:
-            left = self.left + other.left + 1
+            left = self_left + other_left + 1
 
-        if self.right is None and other.right is None:
+        if self_right is None and other_right is None:
             right = None
-        elif self.right is None:
-            right = other.right
-        elif other.right is None:
-            right = self.right
+        elif self_right is None:
+            right = other_right
+        elif other_right is None:
+            right = self_right
         else:
-            right = self.right + other.right
+            right = self_right + other_right
+
+        if self.fix is not None and getattr(other, 'fix', None) is not None:
+            return Sfix._from_fix(self.fix * other.fix, left, right)
 
         return Sfix(self.val * other.val,
                     left,
@@ -311,12 +524,19 @@ class Sfix:
                     signed=self.signed)
 
     def sign_bit(self):
+        if self.fix is not None:
+            return self.fix < 0
         s = np.sign(self.val)
         if s in [0, 1]:
             return False
         return True
 
     def __rshift__(self, other):
+        if self.fix is not None and not Sfix._float_mode.enabled:
+            ret = Sfix._from_fix(self.fix >> other, self.left, self.right)
+            ret._overflow_effects()
+            return ret
+
         if self.right is None or Sfix._float_mode.enabled:
             o = math.ldexp(self.val, -other)
         else:
@@ -326,6 +546,12 @@ class Sfix:
         return Sfix(o, self.left, self.right)
 
     def __lshift__(self, other):
+        if self.fix is not None and not Sfix._float_mode.enabled:
+            # THIS CAN WRAP!
+            ret = Sfix._from_fix(self.fix << other, self.left, self.right)
+            ret._overflow_effects()
+            return ret
+
         if self.right is None or Sfix._float_mode.enabled:
             o = math.ldexp(self.val, other)
         else:
@@ -335,6 +561,10 @@ class Sfix:
         return Sfix(o, self.left, self.right)
 
     def scalb(self, i):
+        if self.fix is not None and not Sfix._float_mode.enabled:
+            # raw value stays the same, only the format changes -> cannot overflow
+            return Sfix._from_fix(self.fix, self.left + i, self.right + i, overflow_style='saturate', round_style='round')
+
         n = 2 ** i
         try:
             return Sfix(self.val * n, self.left + i, self.right + i, overflow_style='saturate', round_style='round')
@@ -342,6 +572,9 @@ class Sfix:
             return Sfix(self.val * n, overflow_style='saturate', round_style='round')
 
     def __abs__(self):
+        if self.fix is not None:
+            return Sfix._from_fix(abs(self.fix), self.left + 1, self.right)
+
         return Sfix(abs(self.val),
                     self.left + 1,
                     self.right,
@@ -361,6 +594,9 @@ class Sfix:
 
     def __neg__(self):
         left = None if self.left is None else self.left + 1
+        if self.fix is not None:
+            return Sfix._from_fix(-self.fix, left, self.right)
+
         return Sfix(-self.val,
                     left,
                     self.right,
@@ -372,15 +608,19 @@ class Sfix:
         else:
             return -self.right + self.left
 
-    def __call__(self, x: float, left=None, right=None):
+    def __call__(self, x, left=None, right=None):
+        fmt = self.fmt
         if left is None:
-            left = self.left
+            left = fmt.left
 
         if right is None:
-            right = self.right
+            right = fmt.right
+
+        if not isinstance(x, Sfix):
+            x = float(x)
 
-        return Sfix(float(x), left, right, self.overflow_style,
-                    self.round_style, False, self.wrap_is_ok, self.signed)
+        return Sfix(x, left, right, fmt.overflow_style,
+                    fmt.round_style, False, fmt.wrap_is_ok, fmt.signed)
 
     def _pyha_to_python_value(self):
         return float(self)
@@ -0,0 +1,538 @@
+import logging
+
+import numpy as np
+
+from pyha.common.complex import Complex
+from pyha.common.context_managers import SimPath
+from pyha.common.fixed_point import Sfix
+from pyha.common.telemetry import Telemetry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('sfix')
+
+# raw values wider than this are kept in 'object' arrays (Python integers)
+INT64_SAFE_BITS = 62
+
+
+def _fix_dtype(left, right):
+    """ NumPy dtype that can hold the raw values of format [left:right] (+sign). """
+    return np.int64 if left - right + 1 <= INT64_SAFE_BITS else object
+
+
+def _as_dtype(fix, dtype):
+    if fix.dtype == dtype:
+        return fix
+    if dtype is object:
+        return np.array([int(x) for x in fix.ravel()], dtype=object).reshape(fix.shape)
+    return fix.astype(dtype)
+
+
+def _quantize_float(val, right, round_style, dtype):
+    fix = np.ldexp(np.asarray(val, dtype=float), -right)
+    if round_style == 'round':
+        fix = np.round(fix)  # round half to even, same as Sfix
+    else:
+        fix = np.floor(fix)
+
+    if not np.all(np.isfinite(fix)):
+        raise ValueError('Cannot convert non-finite values to fixed-point')
+    if dtype is not object and not np.all(np.abs(fix) < 2.0 ** 63):
+        dtype = object  # far out of range, Python integers keep the wrap exact (format dtype is restored later)
+    if dtype is object:
+        return np.array([int(x) for x in fix.ravel()], dtype=object).reshape(fix.shape)
+    return fix.astype(np.int64)
+
+
+def _shift_fix(fix, shift, round_style):
+    """ Move raw values 'shift' bits to the left (negative shift = drop LSB's with rounding). """
+    if shift >= 0:
+        return fix << shift
+
+    shift = -shift
+    res = fix >> shift  # arithmetic shift i.e. floor
+    if round_style == 'round':
+        remainder = fix - (res << shift)
+        half = 1 << (shift - 1)
+        res = res + ((remainder > half) | ((remainder == half) & ((res & 1) == 1)))
+    return res
+
+
+def _overflow_fix(fix, left, right, signed, overflow_style, wrap_is_ok):
+    fmax = (1 << (left - right)) - 1
+    fmin = -(1 << (left - right)) if signed else 0
+    overflows = (fix > fmax) | (fix < fmin)
+    if not np.any(overflows):
+        return fix
+
+    count = int(np.count_nonzero(overflows))
+    bad = fix[overflows]
+    vmin, vmax = float(np.min(bad)) * 2.0 ** right, float(np.max(bad)) * 2.0 ** right
+    if overflow_style == 'saturate':
+        fix = np.minimum(np.maximum(fix, fmin), fmax)
+        if Telemetry.record('SATURATION', vmin, vmax, count):
+            logger.warning(f'SATURATION {count} of {fix.size} values\t[{SimPath}] (further events are counted)')
+    elif overflow_style in 'wrap':
+        fix = (fix - fmin) % (fmax + 1 - fmin) + fmin
+        if not wrap_is_ok and signed:
+            if Telemetry.record('WRAP', vmin, vmax, count):
+                logger.error(f'WRAP {count} of {fix.size} values\t[{SimPath}] (further events are counted)')
+    else:
+        raise Exception(f'Unknown overflow style {overflow_style}')
+    return fix
+
+
+class SfixArray:
+    """
+    Array of fixed-point values that share one format, stored as raw two's-complement integers in a NumPy buffer.
+    Follows the same bit-growth, resize, saturate/wrap and round/truncate rules as ``Sfix``, but over whole arrays at once.
+    Use it for fast MODEL side prototyping of long signals.
+
+    Raw values are kept in ``int64`` arrays, formats wider than 62 bits automatically switch to ``object`` arrays (Python integers).
+
+    >>> a = SfixArray([0.5, -0.123, 0.99], left=0, right=-17)
+    >>> a
+    [ 0.5        -0.1230011   0.98999786] [0:-17]
+    >>> a * a
+    [0.25       0.01512927 0.98009577] [1:-34]
+    >>> (a * a).resize(0, -8, round_style='round')
+    [0.25       0.015625   0.98046875] [0:-8]
+
+    Elements are returned as ``Sfix``:
+
+    >>> a[1]
+    -0.123001 [0:-17]
+    """
+    __slots__ = ('fix', 'left', 'right', 'signed', 'overflow_style', 'round_style', 'wrap_is_ok')
+
+    def __init__(self, val=(), left=0, right=-17, overflow_style='wrap', round_style='truncate', wrap_is_ok=False,
+                 signed=True, init_only=False):
+        if isinstance(left, (Sfix, SfixArray)):
+            left, right = left.left, left.right
+
+        self.left = int(left)
+        self.right = int(right)
+        self.signed = signed
+        self.overflow_style = overflow_style
+        self.round_style = round_style
+        self.wrap_is_ok = wrap_is_ok
+
+        dtype = _fix_dtype(self.left, self.right)
+        if isinstance(val, SfixArray):
+            work_dtype = _fix_dtype(max(val.left, self.left), min(val.right, self.right))
+            fix = _shift_fix(_as_dtype(val.fix, work_dtype), val.right - self.right, round_style)
+        elif len(val) and isinstance(val[0], Sfix):
+            fix = [_shift_fix(x.fixed_value(), x.right - self.right, round_style) for x in val]
+            fix = np.array(fix, dtype=dtype)
+        else:
+            fix = _quantize_float(val, self.right, round_style, dtype)
+
+        if not init_only:
+            fix = _overflow_fix(fix, self.left, self.right, signed, overflow_style, wrap_is_ok)
+            fix = _as_dtype(fix, dtype)
+        self.fix = fix
+
+    @classmethod
+    def _from_fix(cls, fix, left, right, signed=True):
+        """ Fast constructor, no quantization or overflow effects are applied. """
+        ret = cls.__new__(cls)
+        ret.fix = fix
+        ret.left = left
+        ret.right = right
+        ret.signed = signed
+        ret.overflow_style = 'wrap'
+        ret.round_style = 'truncate'
+        ret.wrap_is_ok = False
+        return ret
+
+    @property
+    def val(self):
+        """ Float view of the values """
+        return np.ldexp(self.fix.astype(float), self.right)
+
+    def fixed_value(self):
+        return self.fix
+
+    def max_representable(self):
+        return 2 ** self.left - 2 ** self.right
+
+    def min_representable(self):
+        if self.signed:
+            return -2 ** self.left
+        else:
+            return 0
+
+    def resize(self, left=0, right=0, type=None, overflow_style='wrap', round_style='truncate', wrap_is_ok=False,
+               signed=None):
+        if type is not None:
+            left = type.left
+            right = type.right
+        if signed is None:
+            signed = self.signed
+
+        return SfixArray(self, left, right, overflow_style=overflow_style, round_style=round_style,
+                         wrap_is_ok=wrap_is_ok, signed=signed)
+
+    def _convert_other_operand(self, other):
+        if isinstance(other, Sfix) and other.fix is None:
+            other = other.val  # unknown bounds (e.g. lazy register initial value), treat like float
+        if isinstance(other, (float, int)):
+            other = Sfix(other, self.left, self.right, overflow_style='saturate', round_style='round',
+                         signed=self.signed)
+        elif not isinstance(other, (Sfix, SfixArray)):
+            return NotImplemented
+        return other
+
+    def _aligned(self, other, left, right):
+        dtype = _fix_dtype(left, right)
+        a = _as_dtype(self.fix, dtype) << (self.right - right)
+        b = other.fix
+        b = _as_dtype(b, dtype) if isinstance(other, SfixArray) else int(b)
+        return a, b << (other.right - right)
+
+    def __add__(self, other):
+        other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
+        left = max(self.left, other.left) + 1
+        right = min(self.right, other.right)
+        a, b = self._aligned(other, left, right)
+        return SfixArray._from_fix(a + b, left, right, self.signed or other.signed)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
+        left = max(self.left, other.left) + 1
+        right = min(self.right, other.right)
+        a, b = self._aligned(other, left, right)
+        return SfixArray._from_fix(a - b, left, right)
+
+    def __rsub__(self, other):
+        other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
+        left = max(self.left, other.left) + 1
+        right = min(self.right, other.right)
+        a, b = self._aligned(other, left, right)
+        return SfixArray._from_fix(b - a, left, right)
+
+    def __mul__(self, other):
+        other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
+        left = self.left + other.left + 1
+        right = self.right + other.right
+        dtype = _fix_dtype(left, right)
+        b = _as_dtype(other.fix, dtype) if isinstance(other, SfixArray) else int(other.fix)
+        return SfixArray._from_fix(_as_dtype(self.fix, dtype) * b, left, right)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __neg__(self):
+        dtype = _fix_dtype(self.left + 1, self.right)
+        return SfixArray._from_fix(-_as_dtype(self.fix, dtype), self.left + 1, self.right)
+
+    def __abs__(self):
+        dtype = _fix_dtype(self.left + 1, self.right)
+        return SfixArray._from_fix(abs(_as_dtype(self.fix, dtype)), self.left + 1, self.right)
+
+    def __rshift__(self, other):
+        fix = self.fix >> other
+        return SfixArray._from_fix(fix, self.left, self.right, self.signed)
+
+    def __lshift__(self, other):
+        # THIS CAN WRAP!
+        fix = _as_dtype(self.fix, _fix_dtype(self.left + other, self.right)) << other
+        fix = _overflow_fix(fix, self.left, self.right, self.signed, 'wrap', False)
+        return SfixArray._from_fix(_as_dtype(fix, _fix_dtype(self.left, self.right)), self.left, self.right,
+                                   self.signed)
+
+    def scalb(self, i):
+        return SfixArray._from_fix(self.fix.copy(), self.left + i, self.right + i, self.signed)
+
+    def __lt__(self, other):
+        return self.val < other
+
+    def __gt__(self, other):
+        return self.val > other
+
+    def __ge__(self, other):
+        return self.val >= other
+
+    def __le__(self, other):
+        return self.val <= other
+
+    def __len__(self):
+        return len(self.fix)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return Sfix._from_fix(int(self.fix[item]), self.left, self.right, signed=self.signed,
+                                  overflow_style=self.overflow_style, round_style=self.round_style,
+                                  wrap_is_ok=self.wrap_is_ok)
+        ret = SfixArray._from_fix(self.fix[item], self.left, self.right, self.signed)
+        ret.overflow_style = self.overflow_style
+        ret.round_style = self.round_style
+        ret.wrap_is_ok = self.wrap_is_ok
+        return ret
+
+    def __setitem__(self, key, value):
+        value = SfixArray(get_array(value), self.left, self.right, overflow_style=self.overflow_style,
+                          round_style=self.round_style, wrap_is_ok=self.wrap_is_ok, signed=self.signed)
+        self.fix[key] = value.fix if not isinstance(key, (int, np.integer)) else value.fix[0]
+
+    def __array__(self, dtype=None, copy=None):
+        return self.val if dtype is None else self.val.astype(dtype)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self.left == other.left and self.right == other.right and self.signed == other.signed and \
+                   np.array_equal(self.fix, other.fix)
+        return False
+
+    def __str__(self):
+        return f'{self.val} [{self.left}:{self.right}]'
+
+    def __repr__(self):
+        return self.__str__()
+
+    def bitwidth(self):
+        """ Bits of one element, same as ``len(Sfix)`` """
+        if self.signed:
+            return -self.right + self.left + 1
+        else:
+            return -self.right + self.left
+
+    def tolist(self):
+        """ Convert to list of ``Sfix`` objects """
+        return list(self)
+
+    def _pyha_to_python_value(self):
+        return self.val
+
+
+def get_array(value):
+    if isinstance(value, (SfixArray, ComplexArray, list, tuple, np.ndarray)):
+        return value
+    return [value]
+
+
+class ComplexArray:
+    """
+    Array of complex fixed-point values that share one format, ``real`` and ``imag`` are ``SfixArray`` like NumPy integer buffers.
+    Follows the same rules as ``Complex``.
+
+    >>> a = ComplexArray([0.5 + 0.25j, -0.1 - 0.9j], left=0, right=-17)
+    >>> a * a
+    [ 0.1875    +0.25j       -0.80000153+0.18001129j] [2:-34]
+    >>> a.real
+    [ 0.5       -0.1000061] [0:-17]
+    """
+    __slots__ = ('real_fix', 'imag_fix', 'left', 'right', 'overflow_style', 'round_style', 'wrap_is_ok')
+    signed = True
+
+    def __init__(self, val=(), left=0, right=-17, overflow_style='wrap', round_style='truncate', wrap_is_ok=False,
+                 init_only=False):
+        if isinstance(left, (Complex, ComplexArray)):
+            left, right = left.left, left.right
+
+        self.left = int(left)
+        self.right = int(right)
+        self.overflow_style = overflow_style
+        self.round_style = round_style
+        self.wrap_is_ok = wrap_is_ok
+
+        dtype = _fix_dtype(self.left, self.right)
+        if isinstance(val, ComplexArray):
+            shift = val.right - self.right
+            work_dtype = _fix_dtype(max(val.left, self.left), min(val.right, self.right))
+            real = _shift_fix(_as_dtype(val.real_fix, work_dtype), shift, round_style)
+            imag = _shift_fix(_as_dtype(val.imag_fix, work_dtype), shift, round_style)
+        else:
+            if len(val) and isinstance(val[0], Complex):
+                val = [complex(x) for x in val]
+            val = np.asarray(val, dtype=complex)
+            real = _quantize_float(val.real, self.right, round_style, dtype)
+            imag = _quantize_float(val.imag, self.right, round_style, dtype)
+
+        if not init_only:
+            real = _overflow_fix(real, self.left, self.right, True, overflow_style, wrap_is_ok)
+            imag = _overflow_fix(imag, self.left, self.right, True, overflow_style, wrap_is_ok)
+            real = _as_dtype(real, dtype)
+            imag = _as_dtype(imag, dtype)
+        self.real_fix = real
+        self.imag_fix = imag
+
+    @classmethod
+    def _from_fix(cls, real, imag, left, right):
+        """ Fast constructor, no quantization or overflow effects are applied. """
+        ret = cls.__new__(cls)
+        ret.real_fix = real
+        ret.imag_fix = imag
+        ret.left = left
+        ret.right = right
+        ret.overflow_style = 'wrap'
+        ret.round_style = 'truncate'
+        ret.wrap_is_ok = False
+        return ret
+
+    @property
+    def real(self):
+        return SfixArray._from_fix(self.real_fix, self.left, self.right)
+
+    @property
+    def imag(self):
+        return SfixArray._from_fix(self.imag_fix, self.left, self.right)
+
+    @property
+    def val(self):
+        """ Complex float view of the values """
+        return self.real.val + self.imag.val * 1j
+
+    def resize(self, left=0, right=0, type=None, overflow_style='wrap', round_style='truncate', wrap_is_ok=False,
+               signed=True):
+        if type is not None:
+            left = type.left
+            right = type.right
+
+        return ComplexArray(self, left, right, overflow_style=overflow_style, round_style=round_style,
+                            wrap_is_ok=wrap_is_ok)
+
+    def _convert_other_operand(self, other):
+        if isinstance(other, Sfix) and other.fix is None:
+            other = other.val  # unknown bounds (e.g. lazy register initial value), treat like float
+        elif isinstance(other, Complex) and other.right is None:
+            other = complex(other.val)
+
+        if isinstance(other, complex):
+            other = Complex(other, self.left, self.right, overflow_style='saturate', round_style='round')
+        elif isinstance(other, (float, int)):
+            other = Sfix(other, self.left, self.right, overflow_style='saturate', round_style='round')
+
+        if isinstance(other, Complex):
+            other = ComplexArray([complex(other)], other.left, other.right)
+        elif isinstance(other, Sfix):
+            other = SfixArray._from_fix(np.array([other.fixed_value()]), other.left, other.right)
+        elif not isinstance(other, (ComplexArray, SfixArray)):
+            return NotImplemented
+        return other
+
+    @staticmethod
+    def _parts(x):
+        if isinstance(x, ComplexArray):
+            return x.real_fix, x.imag_fix
+        return x.fix, np.zeros_like(x.fix)
+
+    def _add_sub(self, other, op):
+        other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
+        left = max(self.left, other.left) + 1
+        right = min(self.right, other.right)
+        dtype = _fix_dtype(left, right)
+        ar, ai = (_as_dtype(x, dtype) << (self.right - right) for x in self._parts(self))
+        br, bi = (_as_dtype(x, dtype) << (other.right - right) for x in self._parts(other))
+        return ComplexArray._from_fix(op(ar, br), op(ai, bi), left, right)
+
+    def __add__(self, other):
+        return self._add_sub(other, np.add)
+
+    def __radd__(self, other):
+        return self.__add__(other)
+
+    def __sub__(self, other):
+        return self._add_sub(other, np.subtract)
+
+    def __rsub__(self, other):
+        return self._add_sub(other, lambda a, b: b - a)
+
+    def __mul__(self, other):
+        """ Complex multiplication, also support mult by real values. """
+        other = self._convert_other_operand(other)
+        if other is NotImplemented:
+            return other
+        extra_bit = 1 if isinstance(other, ComplexArray) else 0  # for complex mult, from addition
+        left = (self.left + other.left + 1) + extra_bit
+        right = self.right + other.right
+        dtype = _fix_dtype(left, right)
+        ar, ai = (_as_dtype(x, dtype) for x in self._parts(self))
+        br, bi = (_as_dtype(x, dtype) for x in self._parts(other))
+        if extra_bit:
+            real = ar * br - ai * bi
+            imag = ar * bi + ai * br
+        else:
+            real = ar * br
+            imag = ai * br
+        return ComplexArray._from_fix(real, imag, left, right)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __neg__(self):
+        dtype = _fix_dtype(self.left + 1, self.right)
+        return ComplexArray._from_fix(-_as_dtype(self.real_fix, dtype), -_as_dtype(self.imag_fix, dtype),
+                                      self.left + 1, self.right)
+
+    def __rshift__(self, other):
+        return ComplexArray._from_fix(self.real_fix >> other, self.imag_fix >> other, self.left, self.right)
+
+    def __lshift__(self, other):
+        return ComplexArray._from_fix(self.real_fix, self.imag_fix, self.left + other, self.right + other) \
+            .resize(self.left, self.right)
+
+    def scalb(self, i):
+        return ComplexArray._from_fix(self.real_fix.copy(), self.imag_fix.copy(), self.left + i, self.right + i)
+
+    def conjugate(self):
+        dtype = _fix_dtype(self.left + 1, self.right)
+        return ComplexArray._from_fix(self.real_fix.copy(), -_as_dtype(self.imag_fix, dtype), self.left + 1,
+                                      self.right)
+
+    def __len__(self):
+        return len(self.real_fix)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, item):
+        if isinstance(item, (int, np.integer)):
+            return Complex._from_fix(int(self.real_fix[item]), int(self.imag_fix[item]), self.left, self.right,
+                                     overflow_style=self.overflow_style, round_style=self.round_style,
+                                     wrap_is_ok=self.wrap_is_ok)
+        return ComplexArray._from_fix(self.real_fix[item], self.imag_fix[item], self.left, self.right)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.val if dtype is None else self.val.astype(dtype)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self.left == other.left and self.right == other.right and \
+                   np.array_equal(self.real_fix, other.real_fix) and np.array_equal(self.imag_fix, other.imag_fix)
+        return False
+
+    def __str__(self):
+        return f'{self.val} [{self.left}:{self.right}]'
+
+    def __repr__(self):
+        return self.__str__()
+
+    def bitwidth(self):
+        """ Bits of one element, same as ``len(Complex)`` """
+        return -self.right + self.left + 1
+
+    def tolist(self):
+        """ Convert to list of ``Complex`` objects """
+        return list(self)
+
+    def _pyha_to_python_value(self):
+        return self.val
+
+
+Sfix._array_types = Complex._array_types = (SfixArray, ComplexArray)
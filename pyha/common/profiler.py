@@ -0,0 +1,258 @@
+""" Wall time profiler of the 'HARDWARE' simulation: per design instance and method (e.g. 'self.stages[0].main') and
+per framework phase (type discovery, auto-resize, register update, input/output conversion).
+
+``sys.setprofile`` is taken by the type discovery, so ``cProfile`` cannot be used; instead the design methods and the
+framework are instrumented directly. Results can be loaded with ``pstats.Stats(Profiler)`` or ``dump_stats`` like
+``cProfile`` output.
+"""
+import marshal
+import sys
+import time
+import tracemalloc
+
+PHASES = ('type discovery', 'auto-resize', 'register update', 'input conversion', 'output conversion')
+
+
+class ProfileEntry:
+    """ Statistics of one method of one design instance, or one framework phase (location like '<register update>').
+    ``own`` excludes the time of the nested methods/phases, ``total`` includes it. """
+    __slots__ = ('location', 'file', 'line', 'calls', 'own', 'total', 'allocated', 'blocks', 'callers')
+
+    def __init__(self, location, file='~', line=0):
+        self.location = location
+        self.file = file
+        self.line = line
+        self.calls = 0
+        self.own = 0.0
+        self.total = 0.0
+        self.allocated = 0  # net bytes, only with ``memory=True``
+        self.blocks = 0  # net allocated memory blocks (objects), only with ``memory=True``
+        self.callers = {}  # caller location -> [calls, own, total]
+
+    @property
+    def per_call(self):
+        return self.total / self.calls if self.calls else 0.0
+
+    def __repr__(self):
+        return f'{self.location} x{self.calls} own {self.own:.6f}s total {self.total:.6f}s'
+
+
+class ProfileReport(list):
+    """ List of ``ProfileEntry``, sorted by ``sort`` key. ``str()`` gives a summary table. """
+
+    def __init__(self, entries, sort='own'):
+        super().__init__(sorted(entries, key=lambda x: getattr(x, sort), reverse=True))
+        self.memory = any(x.allocated or x.blocks for x in self)
+
+    def __str__(self):
+        if not len(self):
+            return 'No profile'
+
+        header = ('CALLS', 'OWN [s]', 'TOTAL [s]', 'PER CALL [us]') \
+                 + (('ALLOCATED [B]', 'BLOCKS') if self.memory else ()) + ('LOCATION',)
+        rows = [(str(x.calls), f'{x.own:.4f}', f'{x.total:.4f}', f'{x.per_call * 1e6:.2f}')
+                + ((str(x.allocated), str(x.blocks)) if self.memory else ()) + (x.location,) for x in self]
+        widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+        lines = ['  '.join(col.ljust(w) for col, w in zip(row, widths)).rstrip() for row in [header] + rows]
+        return '\n'.join(lines)
+
+
+class ProfiledFunction:
+    """ Replaces a method in the instance ``__dict__`` while profiling (``PyhaFunc`` methods profile themselves) """
+
+    def __init__(self, func, location, code):
+        self.func = func
+        self.location = location
+        self.code = code
+
+    def __call__(self, *args, **kwargs):
+        Profiler.enter(self.location, self.code)
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            Profiler.exit()
+
+
+class Phase:
+    """ Context manager that profiles a framework phase, does nothing if profiler is not enabled """
+    __slots__ = ('location',)
+
+    def __init__(self, name):
+        self.location = f'<{name}>'
+
+    def __enter__(self):
+        if Profiler.enabled:
+            Profiler.enter(self.location)
+
+    def __exit__(self, *exc):
+        if Profiler.enabled:
+            Profiler.exit()
+
+
+class SimulationProfiler:
+    """ Accumulates wall time and call counts (and net allocated bytes and blocks, if ``memory``) per location.
+``allocation_sites`` has the source lines that allocated during profiling (``tracemalloc.StatisticDiff``, with the
+number of blocks and bytes), largest first.
+
+    >>> Profiler.start(dut)
+    >>> ...  # run the simulation
+    >>> Profiler.stop()
+    >>> print(Profiler.report(sort='total'))
+    >>> pstats.Stats(Profiler).sort_stats('tottime').print_stats(10)
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.own_tracemalloc = False
+        self.paths = {}  # id of design object -> instance path
+        self.entries = {}
+        self.stack = []
+        self.instrumented = []
+        self.phases = {name: Phase(name) for name in PHASES}
+        self.stats = {}
+        self.snapshot = None
+        self.allocation_sites = []
+
+    def reset(self):
+        self.entries = {}
+        self.stack = []
+        self.stats = {}
+        self.snapshot = None
+        self.allocation_sites = []
+
+    def start(self, model, memory=False):
+        """ Start profiling ``model``, ``memory`` also tracks net allocated bytes and blocks (uses ``tracemalloc``,
+        slow) """
+        self.reset()
+        self.paths = {}
+        self.instrument(model, 'self')
+        self.memory = memory
+        self.own_tracemalloc = memory and not tracemalloc.is_tracing()
+        if self.own_tracemalloc:
+            tracemalloc.start()
+        if memory:
+            self.snapshot = tracemalloc.take_snapshot()
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+        while self.stack:  # simulation raised
+            self.exit()
+        for obj, name, previous in self.instrumented:
+            if previous is None:
+                obj.__dict__.pop(name, None)
+            else:
+                obj.__dict__[name] = previous
+        self.instrumented = []
+        if self.snapshot is not None:
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            self.allocation_sites = tracemalloc.take_snapshot().filter_traces(ignore) \
+                .compare_to(self.snapshot.filter_traces(ignore), 'lineno')
+            self.snapshot = None
+        if self.own_tracemalloc:
+            tracemalloc.stop()
+        self.memory = self.own_tracemalloc = False
+
+    def instrument(self, obj, path):
+        """ Label the design objects with instance paths, wrap the methods that are not ``PyhaFunc`` """
+        from pyha.common.core import Hardware, PyhaList, PyhaFunc, SKIP_FUNCTIONS
+        from pyha.simulation.tracer import Tracer
+        if isinstance(obj, PyhaList):
+            for i, x in enumerate(obj.data):
+                if isinstance(x, Hardware):
+                    self.instrument(x, f'{path}[{i}]')
+            return
+        if not isinstance(obj, Hardware) or id(obj) in self.paths:
+            return
+
+        self.paths[id(obj)] = path
+        for k, v in list(obj.__dict__.items()):
+            if not k.startswith('_pyha'):
+                self.instrument(v, f'{path}.{k}')
+
+        for name in dir(type(obj)):
+            if name.startswith('_') or name in SKIP_FUNCTIONS or not callable(getattr(type(obj), name)):
+                continue
+            method = getattr(obj, name)
+            inner = method
+            while isinstance(inner, Tracer):
+                inner = inner.func
+            if isinstance(inner, PyhaFunc):
+                continue
+            code = getattr(getattr(inner, '__func__', inner), '__code__', None)
+            if code is None:  # class, constant etc.
+                continue
+            self.instrumented.append((obj, name, obj.__dict__.get(name)))
+            obj.__dict__[name] = ProfiledFunction(method, f'{path}.{name}', code)
+
+    def location(self, obj, function_name):
+        try:
+            return f'{self.paths[id(obj)]}.{function_name}'
+        except KeyError:  # local object
+            return f'{type(obj).__name__}.{function_name}'
+
+    def phase(self, name):
+        """ Context manager for one of the ``PHASES`` """
+        return self.phases[name]
+
+    def enter(self, location, code=None):
+        if self.memory:
+            allocated, blocks = tracemalloc.get_traced_memory()[0], sys.getallocatedblocks()
+        else:
+            allocated = blocks = 0
+        self.stack.append([location, code, time.perf_counter(), 0.0, allocated, 0, blocks, 0])
+
+    def exit(self):
+        if not self.stack:
+            return
+        now = time.perf_counter()
+        location, code, start, children_time, allocated, children_allocated, blocks, children_blocks = self.stack.pop()
+        elapsed = now - start
+        if self.memory:
+            allocated = tracemalloc.get_traced_memory()[0] - allocated
+            blocks = sys.getallocatedblocks() - blocks
+        else:
+            allocated = blocks = 0
+
+        try:
+            entry = self.entries[location]
+        except KeyError:
+            entry = self.entries[location] = ProfileEntry(location, *((code.co_filename, code.co_firstlineno)
+                                                                      if code is not None else ()))
+        own = elapsed - children_time
+        entry.calls += 1
+        entry.own += own
+        entry.total += elapsed
+        entry.allocated += allocated - children_allocated
+        entry.blocks += blocks - children_blocks
+
+        if self.stack:
+            parent = self.stack[-1]
+            parent[3] += elapsed
+            parent[5] += allocated
+            parent[7] += blocks
+            caller = entry.callers.setdefault(parent[0], [0, 0.0, 0.0])
+            caller[0] += 1
+            caller[1] += own
+            caller[2] += elapsed
+
+    def report(self, sort='own'):
+        """ ``ProfileReport`` sorted by 'own', 'total', 'calls', 'per_call', 'allocated' or 'blocks' """
+        return ProfileReport(self.entries.values(), sort)
+
+    def create_stats(self):
+        """ Fills ``stats`` in the ``pstats`` format, so ``pstats.Stats(Profiler)`` works """
+        keys = {x.location: (x.file, x.line, x.location) for x in self.entries.values()}
+        self.stats = {keys[x.location]: (x.calls, x.calls, x.own, x.total,
+                                         {keys[k]: tuple(v[:1] * 2 + v[1:]) for k, v in x.callers.items()})
+                      for x in self.entries.values()}
+
+    def dump_stats(self, file):
+        """ Write ``pstats`` compatible file, same as ``cProfile.Profile.dump_stats`` """
+        self.create_stats()
+        with open(file, 'wb') as f:
+            marshal.dump(self.stats, f)
+
+
+Profiler = SimulationProfiler()
@@ -41,5 +41,12 @@ class RAM(Hardware):
             self.data[self.write_address] = self.write_value
             self.write_enable = False
 
+    def _pyha_is_idle(self):
+        """ True if ``_pyha_update_registers`` would not change anything """
+        try:
+            return not self.write_enable and self.read_reg == self.data[self.read_address]
+        except:
+            return False
+
 
 
@@ -24,3 +24,7 @@ class ShiftRegister(Hardware):
     def _pyha_update_registers(self):
         self.data.append(self.to_push)
 
+    def _pyha_is_idle(self):
+        """ True if ``_pyha_update_registers`` would not change anything """
+        return all(x == self.to_push for x in self.data)
+
@@ -0,0 +1,92 @@
+""" Overflow (wrap/saturation) telemetry, replaces logging of every single event. """
+from pyha.common.context_managers import SimPath
+
+
+class OverflowEvents:
+    """ Statistics of one kind of overflow event ('WRAP' or 'SATURATION') at one ``SimPath`` location """
+    __slots__ = ('kind', 'location', 'count', 'min', 'max', 'first_cycle', 'last_cycle')
+
+    def __init__(self, kind, location, value_min, value_max, cycle):
+        self.kind = kind
+        self.location = location
+        self.count = 0
+        self.min = value_min
+        self.max = value_max
+        self.first_cycle = cycle
+        self.last_cycle = cycle
+
+    def __repr__(self):
+        return f'{self.kind} x{self.count} [{self.location}] values {self.min:g}...{self.max:g}, ' \
+               f'cycles {self.first_cycle}...{self.last_cycle}'
+
+
+class OverflowReport(list):
+    """ List of ``OverflowEvents``, most frequent first. ``str()`` gives a summary table. """
+
+    def __str__(self):
+        if not len(self):
+            return 'No overflows'
+
+        header = ('KIND', 'COUNT', 'MIN', 'MAX', 'FIRST CYCLE', 'LAST CYCLE', 'LOCATION')
+        rows = [(x.kind, str(x.count), f'{x.min:g}', f'{x.max:g}', str(x.first_cycle), str(x.last_cycle),
+                 x.location or '-') for x in self]
+        widths = [max(len(r[i]) for r in rows + [header]) for i in range(len(header))]
+        lines = ['  '.join(col.ljust(w) for col, w in zip(row, widths)).rstrip() for row in [header] + rows]
+        return '\n'.join(lines)
+
+
+def break_into_debugger(event):
+    """ Hook that stops the PyCharm debugger on the first overflow of each location (but not on 'inputs' conversion). """
+    if event.location == 'inputs':
+        return
+    try:
+        import pydevd
+        pydevd.settrace()
+    except ModuleNotFoundError:  # this happens when ran in 'Run' mode instead of 'Debug'
+        pass
+
+
+class OverflowTelemetry:
+    """ Counts wrap and saturation events per ``SimPath`` location (register assigns show up as 'name=').
+    Only the first event of each location is supposed to be logged, rest are just counted.
+
+    :param hook: called with ``OverflowEvents`` on the first event of each location, for example ``break_into_debugger``
+    """
+
+    def __init__(self):
+        self.events = {}
+        self.cycle = None
+        self.hook = None
+
+    def reset(self):
+        self.events = {}
+        self.cycle = None
+
+    def record(self, kind, value_min, value_max=None, count=1):
+        """ Returns True if this is the first event of this kind at the current location """
+        if value_max is None:
+            value_max = value_min
+        key = (kind, tuple(SimPath.fifo))
+        try:
+            events = self.events[key]
+            first = False
+        except KeyError:
+            events = self.events[key] = OverflowEvents(kind, str(SimPath), value_min, value_max, self.cycle)
+            first = True
+
+        events.count += count
+        events.last_cycle = self.cycle
+        if value_min < events.min:
+            events.min = value_min
+        if value_max > events.max:
+            events.max = value_max
+
+        if first and self.hook is not None:
+            self.hook(events)
+        return first
+
+    def report(self):
+        return OverflowReport(sorted(self.events.values(), key=lambda x: x.count, reverse=True))
+
+
+Telemetry = OverflowTelemetry()
@@ -0,0 +1,111 @@
+""" On-disk cache of module conversions, skips RedBaron parsing and transforms of unchanged modules.
+
+Key is the hash of Pyha version (and the sources of conversion code), source code of the class and the VHDL types of
+the datamodel and function arguments/locals/outputs. Value is the VHDL file and typedefs of the module.
+
+Directory is ``~/.cache/pyha/conversion``, environment variable ``PYHA_CONVERSION_CACHE`` changes it, value 'off'
+disables the cache.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+import pyha
+from pyha.common.core import PyhaFunc
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('conversion')
+
+CONVERSION_SOURCES = ['cache.py', 'conversion.py', 'redbaron_transforms.py', 'top_generator.py', 'type_transforms.py']
+
+
+def conversion_code_hash():
+    """ Changes in conversion code must invalidate the cache, even if version stays the same (development installs) """
+    h = hashlib.sha256(pyha.__version__.encode())
+    for name in CONVERSION_SOURCES:
+        h.update((Path(__file__).parent / name).read_bytes())
+    return h.hexdigest()
+
+
+def vhdl_type(name, value):
+    from pyha.conversion.type_transforms import init_vhdl_type
+    try:
+        return init_vhdl_type(name, value)._pyha_type()
+    except Exception:  # not convertible, conversion fails later with proper error
+        return type(value).__name__
+
+
+def type_signature(convert_name, datamodel, obj, converted_modules):
+    """ Everything besides the source code that affects the VHDL output of the module, ``converted_modules`` are the
+    names of previously converted modules (package imports them) """
+    lines = [convert_name, ', '.join(converted_modules)]
+    for x in datamodel.elems:
+        lines.append(f'{x._name}: {x._pyha_type()}')
+    lines.append(datamodel._pyha_reset())  # initial values, also the values of constants
+
+    for name, func in sorted(vars(obj).items()):
+        if not isinstance(func, PyhaFunc):
+            continue
+        lines.append(f'def {name} called={bool(func.calls)} tuple={func.outputs_is_tuple}')
+        lines += [f'local {k}: {vhdl_type(k, v)}' for k, v in sorted(func.get_local_types().items())]
+        lines += [f'arg {i}: {vhdl_type(f"arg{i}", v)}' for i, v in enumerate(func.arg_types or [])]
+        lines += [f'kwarg {k}: {vhdl_type(k, v)}' for k, v in sorted((func.kwarg_types or {}).items())]
+        lines += [f'output {i}: {vhdl_type(f"output{i}", v)}' for i, v in enumerate(func.output_types or [])]
+    return '\n'.join(lines)
+
+
+class ConversionCache:
+    """ ``{key: (vhdl, typedefs)}`` stored as one JSON file per key. """
+
+    def __init__(self):
+        path = os.environ.get('PYHA_CONVERSION_CACHE', '~/.cache/pyha/conversion')
+        self.enabled = path != 'off'
+        self.path = Path(path).expanduser()
+        self.hits = 0
+        self.misses = 0
+        self._code_hash = None
+
+    def key(self, source, signature):
+        if self._code_hash is None:
+            self._code_hash = conversion_code_hash()
+        h = hashlib.sha256()
+        for x in [self._code_hash, source, signature]:
+            h.update(x.encode())
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key):
+        """ ``(vhdl, typedefs)`` or None """
+        if not self.enabled:
+            return None
+        try:
+            with (self.path / f'{key}.json').open() as f:
+                data = json.load(f)
+            self.hits += 1
+            return data['vhdl'], data['typedefs']
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+    def put(self, key, vhdl, typedefs):
+        if not self.enabled:
+            return
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            # write to temporary file and rename, concurrent conversions may read the same key
+            fd, tmp = tempfile.mkstemp(dir=str(self.path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'vhdl': vhdl, 'typedefs': typedefs}, f)
+            os.replace(tmp, str(self.path / f'{key}.json'))
+        except OSError as e:
+            logger.warning(f'Could not write conversion cache: {e}')
+
+    def clear(self):
+        for x in self.path.glob('*.json'):
+            x.unlink()
+
+
+Cache = ConversionCache()
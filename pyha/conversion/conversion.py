@@ -1,29 +1,61 @@
 import glob
+import hashlib
 import inspect
+import json
 import logging
+import multiprocessing
 import tempfile
 import textwrap
 import time
+import weakref
+from copy import deepcopy
 from pathlib import Path
 from typing import List
 from unittest.mock import MagicMock, patch
-import os, shutil
+import os
 
 import pyha
 from pyha.common.context_managers import ContextManagerRefCounted
 from pyha.common.core import PyhaFunc, Hardware
 from pyha.common.util import tabber
+from pyha.conversion.cache import Cache, type_signature
 from pyha.conversion.type_transforms import VHDLModule, VHDLList, init_vhdl_type
-from pyha.conversion.redbaron_transforms import convert, file_header
+from pyha.conversion.redbaron_transforms import convert, file_header, remove_unconverted_functions
 from pyha.conversion.top_generator import TopGenerator
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('conversion')
 
+MANIFEST = 'manifest.json'
+
+
+def write_if_changed(path, content) -> bool:
+    """ Write ``content`` (str or bytes) to ``path`` only if it differs from the file on disk, so unchanged files keep
+    their mtime (GHDL and Quartus don't analyse them again). Returns True if the file was written. """
+    path = Path(path)
+    data = content.encode() if isinstance(content, str) else content
+    try:
+        if path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    path.write_bytes(data)
+    return True
+
 
 class Converter:
-    def __init__(self, model, output_dir=None):
+    def __init__(self, model, output_dir=None, state_output=False, jobs=None, incremental=True):
+        """
+        :param output_dir: Where the VHDL files are written, default is a temporary directory.
+        :param incremental: Only rewrite the files that changed, see ``to_vhdl``. False clears the directory first.
+        """
         self.model = model
+        self.jobs = jobs  # conversion processes, see RecursiveConverter
+        self.state_output = state_output  # 'state' port in top.vhd, see pyha.simulation.bisect
+        self.incremental = incremental
+        self.output_files = []  # all files written by 'to_vhdl'
+        self.changed = []  # files that differ from the previous 'to_vhdl'
+        self.removed = []  # files of the previous 'to_vhdl' that are not generated anymore
 
         if output_dir is None or 'TRAVIS' in os.environ:
             self.output_dir = tempfile.TemporaryDirectory().name
@@ -36,18 +68,26 @@ class Converter:
         self.src_util_path = self.src_path / 'util'
 
     def to_vhdl(self):
+        """ Convert the model and write the VHDL, utility and COCOTB files to the output directory.
+
+        In incremental mode files are compared to the ones on disk and only the changed ones are written. Manifest
+        ('manifest.json') lists all the files, the changed and the removed files (relative to output directory, in
+        compile order), these are also in ``changed`` and ``removed``. Directory is cleared if it has no manifest.
+        """
         try:
             os.makedirs(self.output_dir)
         except:
             pass
 
-        # clear contents
-        files = glob.glob(self.output_dir + '/**/*')
-        for f in files:
-            try:
-                os.remove(f)
-            except:
-                pass
+        previous = self.read_manifest() if self.incremental else None
+        if previous is None:
+            # clear contents
+            files = glob.glob(self.output_dir + '/**/*')
+            for f in files:
+                try:
+                    os.remove(f)
+                except:
+                    pass
 
         if not self.quartus_path.exists():
             os.makedirs(self.quartus_path)
@@ -56,14 +96,49 @@ class Converter:
             os.makedirs(self.src_util_path)
 
         start = time.time()
-        self.conv = RecursiveConverter(self.model)
+        self.conv = RecursiveConverter(self.model, jobs=self.jobs)
+        self.conv.top_vhdl.state_output = self.state_output
+        self.output_files, self.changed = [], []
         self.vhdl_sources = self.get_conversion_sources()
+        self.write_manifest(previous)
         end = time.time()
-        logger.info(f'Took {end-start:.2f} seconds')
+        logger.info(f'Took {end-start:.2f} seconds, {len(self.changed)}/{len(self.output_files)} files changed')
         return self
 
+    def relative(self, path):
+        return '.' + str(path)[len(str(self.base_path)):]
+
     def get_vhdl_sources_relative(self):
-        return ['.' + str(path)[len(str(self.base_path)):] for path in self.vhdl_sources]
+        return [self.relative(path) for path in self.vhdl_sources]
+
+    def write(self, path, content):
+        self.output_files.append(path)
+        if write_if_changed(path, content):
+            self.changed.append(path)
+        return path
+
+    def copy(self, source, path):
+        return self.write(path, Path(source).read_bytes())
+
+    def read_manifest(self):
+        try:
+            with (self.base_path / MANIFEST).open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(self, previous):
+        files = [self.relative(x) for x in self.output_files]
+        self.removed = [x for x in (previous or {}).get('files', []) if x not in files]
+        for x in self.removed:
+            try:
+                os.remove(str(self.base_path / x))
+            except OSError:
+                pass
+
+        manifest = {'files': files, 'changed': [self.relative(x) for x in self.changed], 'removed': self.removed}
+        with (self.base_path / MANIFEST).open('w') as f:
+            json.dump(manifest, f, indent=4)
 
     def get_top_module_outputs(self):
         return self.conv.outputs
@@ -71,42 +146,48 @@ class Converter:
     def get_conversion_sources(self):
         # NB! order of files added to src matters!
         sim_inc = Path(pyha.__path__[0] + '/simulation/sim_include')
-        shutil.copyfile(sim_inc / 'complex.vhdl', self.src_util_path / 'complex.vhdl')
-        src = [self.src_util_path / 'complex.vhdl']
+        src = [self.copy(sim_inc / 'complex.vhdl', self.src_util_path / 'complex.vhdl')]
 
         # copy pyha_util to src dir
-        shutil.copyfile(sim_inc / 'pyha_util.vhdl', self.src_util_path / 'pyha_util.vhdl')
-        src += [self.src_util_path / 'pyha_util.vhdl']
+        src += [self.copy(sim_inc / 'pyha_util.vhdl', self.src_util_path / 'pyha_util.vhdl')]
 
         # write typedefs file
-        src += [self.src_util_path / 'typedefs.vhdl']
-        with src[-1].open('w') as f:
-            f.write(self.conv.build_typedefs_package())
+        src += [self.write(self.src_util_path / 'typedefs.vhdl', self.conv.build_typedefs_package())]
 
         # add all conversion files as src
-        src += self.conv.write_vhdl_files(self.src_path)
+        src += [self.write(self.src_path / name, vhdl) for name, vhdl in self.conv.get_vhdl_files()]
 
-        shutil.copyfile(sim_inc / 'fixed_pkg_c.vhdl', self.src_util_path / 'fixed_pkg_c.vhdl')
-        shutil.copyfile(sim_inc / 'fixed_float_types_c.vhdl', self.src_util_path / 'fixed_float_types_c.vhdl')
+        self.copy(sim_inc / 'fixed_pkg_c.vhdl', self.src_util_path / 'fixed_pkg_c.vhdl')
+        self.copy(sim_inc / 'fixed_float_types_c.vhdl', self.src_util_path / 'fixed_float_types_c.vhdl')
         # src += [self.src_util_path / 'fixed_pkg_c.vhdl', self.src_util_path / 'fixed_float_types_c.vhdl']
 
         # copy cocotb simulation top file
-        coco_py = pyha.__path__[0] + '/simulation/sim_include/cocotb_simulation_top.py'
-        shutil.copyfile(coco_py, str(self.base_path / Path(coco_py).name))
+        self.copy(sim_inc / 'cocotb_simulation_top.py', self.base_path / 'cocotb_simulation_top.py')
 
         # copy cocotb makefile
-        coco_py = pyha.__path__[0] + '/simulation/sim_include/Makefile'
-        shutil.copyfile(coco_py, str(self.base_path / Path(coco_py).name))
+        self.copy(sim_inc / 'Makefile', self.base_path / 'Makefile')
         return src
 
 
-def get_objects_rednode(obj):
+class_sources = weakref.WeakKeyDictionary()  # class -> source code, inspecting is slow for big files
+class_trees = {}  # (class qualname, source hash) -> FST of the class, as parsed by baron (not modified by conversion)
+CLASS_TREES_MAX = 256  # oldest trees are dropped after this, (edited) classes of a long notebook session add up
+
+
+def get_objects_source(obj):
+    """ Returns the (dedented) source code of the class of the instance, found once per class """
+    cls = obj.__class__
+    if cls not in class_sources:
+        class_sources[cls] = find_objects_source(obj)
+    return class_sources[cls]
+
+
+def find_objects_source(obj):
     """
-    Returns the RedBaron node for the class instance.
+    Returns the (dedented) source code of the class of the instance.
     This mocks the inspect module to improve the code search resolution (in general inspect finds all the classes from file that match the name and just returns the first)
 
     """
-    from redbaron import RedBaron
     # walk til the first 'locals'
     # Example __qualname__: 'TestClassNodeConv.test_get_datamodel.<locals>.T'
     parent = inspect.getmodule(obj)
@@ -123,10 +204,7 @@ def get_objects_rednode(obj):
 
             # monkeypatch the inspect module to use 'parent code' as input for searching the class code (else it searches full file)
             with patch('inspect.linecache.getlines', MagicMock(return_value=parent_code)):
-                source = textwrap.dedent(inspect.getsource(obj.__class__))
-
-            red_list = RedBaron(source)
-            return red_list[0]
+                return textwrap.dedent(inspect.getsource(obj.__class__))
 
         except TypeError:
             # try finding the class from local IPYTHON input history
@@ -155,32 +233,88 @@ def get_objects_rednode(obj):
                 temp.flush()
                 with patch('inspect.getfile', MagicMock(return_value=temp.name)):
                     source = textwrap.dedent(inspect.getsource(obj.__class__))
-                    red_list = RedBaron(source)
                     logger.warning(f'Found "{obj.__class__.__name__}" source from IPython history!')
-                    return red_list[0]
+                    return source
     except:
         # This is due to the Inspect needing to open a file...
         # could be a bit relaxed with https://github.com/uqfoundation/dill/issues?utf8=%E2%9C%93&q=getsource, but this only works in regular REPL, not Ipython nor Notebook...
         raise Exception(f'Could not fetch "{obj.__class__}" source code (also tried loading from IPython history).')
 
 
+def get_objects_rednode(obj, source=None):
+    """ Returns the RedBaron node for the class instance, ``source`` defaults to ``get_objects_source``.
+
+    Source is parsed once per class, conversion modifies the returned tree so each call builds a new one from a copy of
+    the parsed FST (skips the parsing, that is the slow part).
+    """
+    import baron
+    if source is None:
+        source = get_objects_source(obj)
+    key = (obj.__class__.__qualname__, hashlib.sha256(source.encode()).hexdigest())
+    if key not in class_trees:
+        if len(class_trees) >= CLASS_TREES_MAX:
+            del class_trees[next(iter(class_trees))]
+        class_trees[key] = baron.parse(source)
+
+    return redbaron_from_fst(deepcopy(class_trees[key]))[0]
+
+
+def redbaron_from_fst(fst):
+    """ Same as ``RedBaron(source)``, but from the already parsed ``fst`` """
+    from redbaron import RedBaron
+    from redbaron.base_nodes import NodeList
+    from redbaron.nodes import DotNode
+
+    red = RedBaron.__new__(RedBaron)
+    red.first_blank_lines = []
+    red.node_list = NodeList.from_fst(fst, parent=red, on_attribute='root')
+    red.middle_separator = DotNode({'type': 'endl', 'formatting': [], 'value': '\n', 'indent': ''})
+
+    red.data = []
+    previous = None
+    for i in red.node_list:
+        if i.type != 'endl':
+            red.data.append([i, []])
+        elif previous and previous.type == 'endl':
+            red.data.append([previous, []])
+        elif previous is None and i.type == 'endl':
+            red.data.append([i, []])
+        elif red.data:
+            red.data[-1][1].append(i)
+        previous = i
+    red.node_list.parent = None
+    red.on_attribute = None
+    red.parent = None
+    return red
+
+
 def get_conversion(obj):
     red_node = get_objects_rednode(obj)
     conv = convert(red_node, obj)
     return conv
 
 
+def convert_pending(index):
+    """ Process pool worker, the pending modules are inherited from the parent process (fork) """
+    with RecursiveConverter.in_progress:
+        try:
+            return RecursiveConverter.pending[index].convert_module()
+        except Exception:
+            return None  # converted again in the main process, raises the error there
+
+
 class RecursiveConverter:
     converted_modules = {}
+    signatures = {}  # type signature -> name in 'converted_modules', first compatible module gives the name
     typedefs = [] # will be used to build typedefs package (all new types in the design)
+    modules = []  # RecursiveConverter of each converted module, same order as 'converted_modules'
+    pending = []  # modules that were not found from the conversion cache
+    parallel_min_modules = 8  # process pool is slower for small designs
     in_progress = ContextManagerRefCounted()
 
     @classmethod
     def is_compatible_with_converted_module(cls, module):
-        for name, converted_module in cls.converted_modules.items():
-            if module._pyha_type_is_compatible(converted_module[0]):
-                return name
-        return False
+        return cls.signatures.get(module._pyha_type_signature(), False)
 
     @classmethod
     def get_module_converted_name(cls, module):
@@ -189,8 +323,14 @@ class RecursiveConverter:
             return '{}_{}'.format(type(module.current).__name__, len(cls.converted_modules))
         return name
 
-    def __init__(self, obj, datamodel=None):
-        """ Convert object and all childs to VHDL """
+    def __init__(self, obj, datamodel=None, jobs=None):
+        """ Convert object and all childs to VHDL.
+
+        Hierarchy is walked first (child modules before the parent), this fixes the module names. Then the modules that
+        are not in the conversion cache are converted, with a process pool if ``jobs`` > 1 and there are at least
+        ``parallel_min_modules`` of them. Default ``jobs`` is the ``PYHA_CONVERSION_JOBS`` environment variable or the
+        number of CPUs.
+        """
         with RecursiveConverter.in_progress:
             self.obj = obj
             self.class_name = obj.__class__.__name__
@@ -198,7 +338,10 @@ class RecursiveConverter:
             self.is_root = datamodel is None
             if self.is_root:
                 RecursiveConverter.converted_modules = {}
+                RecursiveConverter.signatures = {}
                 RecursiveConverter.typedefs = []
+                RecursiveConverter.modules = []
+                RecursiveConverter.pending = []
                 self.datamodel = VHDLModule('-', obj)
 
             # recursively convert all child modules
@@ -247,15 +390,58 @@ class RecursiveConverter:
             for node in self.datamodel.elems:
                 conv(self, node)
 
-            self.red_node = get_objects_rednode(obj)
-            convert_name = self.get_module_converted_name(self.datamodel)
-            logger.info(f'{convert_name} to VHDL ...')
+            self.source = get_objects_source(obj)
+            self.convert_name = self.get_module_converted_name(self.datamodel)
+            self.module_index = len(RecursiveConverter.converted_modules)
+            self.key = Cache.key(self.source, type_signature(self.convert_name, self.datamodel, obj,
+                                                             RecursiveConverter.converted_modules))
+            cached = Cache.get(self.key)
+            if cached is not None:
+                logger.info(f'{self.convert_name} to VHDL (cached)')
+                self.vhdl_conversion, self.module_typedefs = cached
+            else:
+                RecursiveConverter.pending.append(self)
+
+            RecursiveConverter.converted_modules[self.convert_name] = (self.datamodel, None)  # VHDL is added later
+            RecursiveConverter.signatures.setdefault(self.datamodel._pyha_type_signature(), self.convert_name)
+            RecursiveConverter.modules.append(self)
 
-            self.conv = convert(self.red_node, obj)  # actual conversion happens here
+            if self.is_root:
+                if jobs is None:
+                    jobs = int(os.environ.get('PYHA_CONVERSION_JOBS', os.cpu_count() or 1))
+                self.convert_pending(jobs)
+                for x in RecursiveConverter.modules:
+                    RecursiveConverter.converted_modules[x.convert_name] = (x.datamodel, x.vhdl_conversion)
+                    RecursiveConverter.typedefs.extend(x.module_typedefs)
+
+    def convert_module(self):
+        """ Returns VHDL and typedefs of the module. Conversion sees the ``converted_modules`` as they were when the
+        module was reached (submodule names and imports depend on these), so the result does not depend on the order
+        the modules are converted in. """
+        converted_modules, signatures = RecursiveConverter.converted_modules, RecursiveConverter.signatures
+        RecursiveConverter.converted_modules = dict(list(converted_modules.items())[:self.module_index])
+        RecursiveConverter.signatures = {k: v for k, v in signatures.items() if v in RecursiveConverter.converted_modules}
+        try:
+            logger.info(f'{self.convert_name} to VHDL ...')
+            red_node = get_objects_rednode(self.obj, remove_unconverted_functions(self.source, self.obj))
+            conv = convert(red_node, self.obj)  # actual conversion happens here
+            return str(conv), conv.build_typedefs()
+        finally:
+            RecursiveConverter.converted_modules, RecursiveConverter.signatures = converted_modules, signatures
 
-            self.vhdl_conversion = str(self.conv)
-            RecursiveConverter.converted_modules[convert_name] = (self.datamodel, self.vhdl_conversion)
-            RecursiveConverter.typedefs.extend(self.conv.build_typedefs())
+    @classmethod
+    def convert_pending(cls, jobs):
+        results = [None] * len(cls.pending)
+        if jobs > 1 and len(cls.pending) >= cls.parallel_min_modules and \
+                'fork' in multiprocessing.get_all_start_methods():
+            logger.info(f'Converting {len(cls.pending)} modules with {min(jobs, len(cls.pending))} processes ...')
+            with multiprocessing.get_context('fork').Pool(min(jobs, len(cls.pending))) as pool:
+                results = pool.map(convert_pending, range(len(cls.pending)))
+
+        for x, result in zip(cls.pending, results):
+            x.vhdl_conversion, x.module_typedefs = result or x.convert_module()
+            Cache.put(x.key, x.vhdl_conversion, x.module_typedefs)
+        cls.pending = []
 
     @property
     def inputs(self) -> List[object]:
@@ -265,18 +451,20 @@ class RecursiveConverter:
     def outputs(self) -> List[object]:
         return self.top_vhdl.get_object_return()
 
-    def write_vhdl_files(self, base_dir: Path) -> List[Path]:
-        paths = []
-        for name, value in self.converted_modules.items():
-            paths.append(base_dir / '{}.vhd'.format(name))
-            with paths[-1].open('w') as f:
-                f.write(value[1]) # [1] is vhdl_conversion
+    def get_vhdl_files(self):
+        """ ``[(file name, VHDL)]`` of the modules and the top entity, in compile order """
+        # [1] is vhdl_conversion
+        files = [('{}.vhd'.format(name), value[1]) for name, value in self.converted_modules.items()]
 
         # add top_generator file
-        paths.append(base_dir / 'top.vhd')
-        with paths[-1].open('w') as f:
-            f.write(self.top_vhdl.make())
+        files.append(('top.vhd', self.top_vhdl.make()))
+        return files
 
+    def write_vhdl_files(self, base_dir: Path) -> List[Path]:
+        paths = []
+        for name, vhdl in self.get_vhdl_files():
+            paths.append(base_dir / name)
+            write_if_changed(paths[-1], vhdl)
         return paths
 
     def build_typedefs_package(self):
@@ -1,3 +1,10 @@
+""" Python to VHDL transforms, RedBaron is the frontend.
+
+The stdlib ``ast`` is used only to pre-process the class source (``remove_unconverted_functions``). It does not replace
+RedBaron: comments are converted to VHDL and the transforms edit the RedBaron tree in place, ``ast`` has neither.
+Remaining conversion time is mostly RedBaron itself (node inserts in ``transform_call``, ``dumps``, parsing).
+"""
+import ast
 import logging
 import textwrap
 from contextlib import suppress
@@ -5,8 +12,8 @@ from contextlib import suppress
 from parse import parse
 from redbaron import Node, EndlNode, DefNode, AssignmentNode, TupleNode, CommentNode, FloatNode, \
     IntNode, UnitaryOperatorNode, GetitemNode, inspect, CallNode, AtomtrailersNode, CallArgumentNode, \
-    BinaryOperatorNode, ComplexNode, AssociativeParenthesisNode
-from redbaron.base_nodes import LineProxyList
+    BinaryOperatorNode, ComplexNode, AssociativeParenthesisNode, ForNode
+from redbaron.base_nodes import LineProxyList, ProxyList
 
 import pyha
 from pyha import Complex
@@ -667,13 +674,58 @@ def set_convert_obj(obj):
     convert_obj = obj
 
 
+def is_comment(line, min_indent, max_indent=None):
+    """ ``line`` is a comment, indented by ``min_indent``...``max_indent`` columns """
+    code = line.lstrip()
+    indent = len(line) - len(code)
+    return code.startswith('#') and indent >= min_indent and (max_indent is None or indent <= max_indent)
+
+
+def remove_unconverted_functions(source, obj=None):
+    """ Cut the functions that ``convert`` would delete out of the class source, before RedBaron parses it.
+    Uses the stdlib ``ast`` as RedBaron is slow to parse and even slower to remove nodes (renders the whole class body
+    again on each removal). Functions that are not converted are often the biggest ones, like '__init__' and 'model'.
+    Comments right above a removed function and at the end of its body go with it, not to the previous function.
+    """
+    class_node = ast.parse(source).body[0]
+    lines = source.split('\n')
+    remove = []
+    for f in class_node.body:
+        if not isinstance(f, ast.FunctionDef):
+            continue
+        if f.name in SKIP_FUNCTIONS or f.name[:2] == '__' or f.name[:5] == '_pyha':
+            pass
+        elif obj is not None and isinstance(obj.__dict__.get(f.name), PyhaFunc) and not obj.__dict__[f.name].calls:
+            logger.warning(f'Not converting function {f.name}, was not called in simulation!')
+        else:
+            continue
+        start = min([f.lineno] + [x.lineno for x in f.decorator_list]) - 1
+        while start and is_comment(lines[start - 1], f.col_offset, f.col_offset):  # comments right above the function
+            start -= 1
+        while start and not lines[start - 1].strip():  # blank lines before, else they end up in the previous function
+            start -= 1
+        end = f.end_lineno  # comments after the last statement, but still in the function body
+        while end < len(lines) and (not lines[end].strip() or is_comment(lines[end], f.col_offset + 1)):
+            end += 1
+        while end > f.end_lineno and not lines[end - 1].strip():
+            end -= 1
+        remove.append((start, end))
+
+    if len(remove) == len(class_node.body):  # empty class body is not valid Python, leave it for 'convert'
+        return source
+
+    for start, end in reversed(remove):
+        del lines[start:end]
+    return '\n'.join(lines)
+
+
 def convert(red: Node, obj=None):
     set_convert_obj(obj)
 
     # delete all non convertable functions from redbaron AST
     # coding style is akward because of some redbaron bugs...
     while True:
-        f = red.find('def', name=lambda x: x in SKIP_FUNCTIONS or x[:2] == '__' or x[:5] == '_pyha')
+        f = find(red, DefNode, lambda x: x.name in SKIP_FUNCTIONS or x.name[:2] == '__' or x.name[:5] == '_pyha')
         if not f:
             break
         f.parent.remove(f)
@@ -684,7 +736,7 @@ def convert(red: Node, obj=None):
         for k, v in obj.__dict__.items():
             if isinstance(v, PyhaFunc):
                 if not v.calls:
-                    f = red.find('def', name=lambda x: x == k)
+                    f = find(red, DefNode, lambda x: x.name == k)
                     if not f:
                         continue
                     logger.warning(f'Not converting function {k}, was not called in simulation!')
@@ -761,6 +813,36 @@ def super_getattr(obj, attr, is_local=False):
     return obj
 
 
+def find_iter(red_node, node_type, test=None):
+    """ Same as ``red_node.find_iter(identifier)`` (same depth-first order), but matches the node class instead of string
+    identifiers. RedBaron builds the identifiers of every visited node, this made the tree walks the main cost of the
+    transforms for large designs. """
+    stack = [red_node]
+    while stack:
+        node = stack.pop()
+        if type(node) is node_type and (test is None or test(node)):
+            yield node
+
+        childs = []
+        for kind, key, _ in node._render():
+            if kind == 'key':
+                child = getattr(node, key)
+                if isinstance(child, Node):
+                    childs.append(child)
+            elif kind in ('list', 'formatting'):
+                nodes = getattr(node, key)
+                childs.extend(nodes.node_list if isinstance(nodes, ProxyList) else nodes)
+        stack.extend(reversed(childs))
+
+
+def find_all(red_node, node_type, test=None):
+    return list(find_iter(red_node, node_type, test))
+
+
+def find(red_node, node_type, test=None):
+    return next(find_iter(red_node, node_type, test), None)
+
+
 def get_object(node):
     """ Parse rebaron AtomTrailers node into Python object (taken from ongoing conversion object)
      Works for object and local scope """
@@ -789,7 +871,7 @@ def get_object(node):
 
 
 def transform_unroll_local_constructor(red_node):
-    assigns = red_node.find_all('assign')
+    assigns = find_all(red_node, AssignmentNode)
     for node in assigns:
         call = node.value.call
         if call is None:  # has no function call
@@ -821,7 +903,7 @@ def transform_unroll_local_constructor(red_node):
 
 
 def transform_constants(red_node):
-    nodes = red_node.find_all('atomtrailers')
+    nodes = find_all(red_node, AtomtrailersNode)
     for node in nodes:
         const = any([is_constant(x.dumps()) for x in node])
         if const and node[0].dumps() == 'self':
@@ -829,7 +911,7 @@ def transform_constants(red_node):
 
 
 def transform_preprocessor(red_node):
-    nodes = red_node.find_all('comment', value=lambda x: x == '# CONVERSION PREPROCESSOR replace next line with:')
+    nodes = find_all(red_node, CommentNode, lambda x: x.value == '# CONVERSION PREPROCESSOR replace next line with:')
 
     for x in nodes:
         new = str(x.parent[x.index_on_parent + 1].value)[2:]
@@ -845,7 +927,7 @@ def transform_resize_arguments(red_node):
 
         Force default fixed_wrap and fixed_truncate.
     """
-    nodes = red_node.find_all('call')
+    nodes = find_all(red_node, CallNode)
 
     for call in nodes:
         call_index = call.previous.index_on_parent
@@ -855,7 +937,7 @@ def transform_resize_arguments(red_node):
         if call.previous.value not in ['resize', 'Sfix']:
             continue
 
-        args = call.find_all('call_argument')
+        args = find_all(call, CallArgumentNode)
         overflow_kword_found = False
         round_kword_found = False
         for arg in args:
@@ -890,7 +972,7 @@ def transform_resize_arguments(red_node):
 
 def transform_int_cast(red_node):
     """ Convert int() to to_integer(round_syle=fixed_truncate, overflow_style=fixed_wrap) for VHDL. """
-    nodes = red_node.find_all('call')
+    nodes = find_all(red_node, CallNode)
     for call in nodes:
         call_index = call.previous.index_on_parent
         if call_index != 0:  # not just copy().. maybe self.copy() etc...
@@ -905,7 +987,7 @@ def transform_int_cast(red_node):
 def transform_remove_copy(red_node):
     """ Remove copy() and deepcopy() calls, in VHDL everything is deepcopy by default
     """
-    nodes = red_node.find_all('call')
+    nodes = find_all(red_node, CallNode)
     for call in nodes:
         call_index = call.previous.index_on_parent
         if call_index != 0:  # not just copy().. maybe self.copy() etc...
@@ -918,7 +1000,7 @@ def transform_remove_copy(red_node):
 
 
 def transform_complex_real_imag(red_node):
-    nodes = red_node.find_all('atomtrailers')
+    nodes = find_all(red_node, AtomtrailersNode)
     for node in nodes:
         if str(node[-1]) == 'real':
             del node[-1]
@@ -935,7 +1017,7 @@ def transform_multiple_assignment(red_node):
     b = 2
     c = 3
     """
-    nodes = red_node.find_all('assign', target=lambda x: isinstance(x, TupleNode))
+    nodes = find_all(red_node, AssignmentNode, lambda x: isinstance(x.target, TupleNode))
 
     for x in nodes:
         for i, (target, value) in enumerate(zip(x.target, x.value)):
@@ -950,7 +1032,7 @@ def transform_lazy_operand(red_node):
     a *= b ->
     a = a * b
     """
-    nodes = red_node.find_all('assign', operator=lambda x: x != '')
+    nodes = find_all(red_node, AssignmentNode, lambda x: x.operator != '')
     for x in nodes:
         x.replace(f'{x.target} = {x.target} {x.operator} {x.value}')
 
@@ -965,7 +1047,7 @@ def transform_auto_resize(red_node):
     """ Wrap all subjects to autosfix inside resize() according to initial type """
     """ When assignment target is sfix indexing ie. sfix[2], converts value to 'to_std_logic(value)' """
 
-    nodes = red_node.find_all('assign')
+    nodes = find_all(red_node, AssignmentNode)
 
     for node in nodes:
 
@@ -1002,7 +1084,7 @@ def transform_auto_resize(red_node):
 def transform_fixed_indexing_result_to_bool(red_node):
     """ VHDL indexing of fixed point value returns 'std_logic' type, this casts such assignments to bool() """
 
-    nodes = red_node.find_all('atomtrailers')
+    nodes = find_all(red_node, AtomtrailersNode)
 
     for node in nodes:
         try:
@@ -1024,7 +1106,7 @@ def transform_registers(red_node):
         if len(x) > 1 and str(x[0].value) == 'self':
             x[0].replace('self_next')
 
-    assigns = red_node.find_all('assign')
+    assigns = find_all(red_node, AssignmentNode)
     for node in assigns:
         if isinstance(node.target, TupleNode):
             for mn in node.target:
@@ -1079,7 +1161,7 @@ def transform_call(red_node):
     tmp_var_count = 0
 
     # loop over all atomtrailers, call is always a member of this
-    atomtrailers = red_node.find_all('atomtrailers')
+    atomtrailers = find_all(red_node, AtomtrailersNode)
     for i, atom in enumerate(atomtrailers):
         if is_hack:  # when parsed out of order call
             atom = atomtrailers[i - 1]
@@ -1208,7 +1290,7 @@ def transform_for(red_node):
 
         red_node.iterator = '_i_'
 
-    fors = red_node.find_all('for')
+    fors = find_all(red_node, ForNode)
     for x in fors:
         modify_for(x)
 
@@ -1221,7 +1303,7 @@ def transform_enum(red_node):
     enums = [x for x in data.elems if isinstance(x, VHDLEnum)]
     for x in enums:
         type_name = x._pyha_type()
-        red_names = red_node.find_all('atomtrailers', value=lambda x: x[0].value == type_name)
+        red_names = find_all(red_node, AtomtrailersNode, lambda x: x.value[0].value == type_name)
         for i, node in enumerate(red_names):
             enum_obj = type(x.current)[str(node[1])]
             red_names[i].replace(str(enum_obj.value))
@@ -1233,7 +1315,7 @@ def transform_dynamic_lists(red_node):
     dynamic_lists = [x for x in data.elems if isinstance(x, VHDLList) and not x.elements_compatible_typed]
     for x in dynamic_lists:
         name = x._name
-        red_names = red_node.find_all('atomtrailers')
+        red_names = find_all(red_node, AtomtrailersNode)
         for node in red_names:
             for i, part in enumerate(node):
                 if str(part) == name and isinstance(part.next, GetitemNode):
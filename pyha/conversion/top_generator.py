@@ -17,10 +17,20 @@ class NoOutputsError(Exception):
     pass
 
 
+def registers_only(vhdl):
+    """ Drop the constants (recursively), what remains matches the VHDL 'self_t' record """
+    if isinstance(vhdl, VHDLModule):
+        vhdl.elems = [registers_only(x) for x in vhdl.elems if not is_constant(x._name)]
+    elif isinstance(vhdl, VHDLList) and not vhdl.not_submodules_list:
+        vhdl.elems = [registers_only(x) for x in vhdl.elems]
+    return vhdl
+
+
 class TopGenerator:
-    def __init__(self, simulated_object):
+    def __init__(self, simulated_object, state_output=False):
         self.simulated_object = simulated_object
         self.simulated_object_vhdl = VHDLModule('-', self.simulated_object)
+        self.state_output = state_output  # debug port 'state' with all the registers, see pyha.simulation.bisect
 
         # 0 or 1 calls wont propagate register outputs
         if self.simulated_object.main.calls == 0:
@@ -61,6 +71,20 @@ class TopGenerator:
         return '\n'.join(f'out{i}: out {x._pyha_stdlogic_type()};'
                          for i, x in enumerate(self.get_object_return()))
 
+    def get_registers(self):
+        return registers_only(VHDLModule('-', self.simulated_object))
+
+    def make_state_port(self) -> str:
+        if not self.state_output:
+            return ''
+        return f'state: out {self.get_registers()._pyha_stdlogic_type()};'
+
+    def make_state_conversion(self) -> str:
+        if not self.state_output:
+            return ''
+        return '\n--register state before the clock edge\n' + \
+               self.get_registers()._pyha_convert_to_stdlogic('state', 'self')
+
     def make_output_variables(self) -> str:
         return '\n'.join(f'variable var_out{i}: {x._pyha_type()};'
                          for i, x in enumerate(self.get_object_return()))
@@ -233,14 +257,14 @@ class TopGenerator:
         sockets['DUT_NAME'] = self.object_class_name()
         sockets['IMPORTS'] = self.make_imports()
         sockets['ENTITY_INPUTS'] = tab(self.make_entity_inputs())
-        sockets['ENTITY_OUTPUTS'] = tab(
-            self.make_entity_outputs()[:-1])  # -1 removes the last ';', VHDL has some retarded rules
+        outputs = '\n'.join(filter(None, [self.make_entity_outputs(), self.make_state_port()]))
+        sockets['ENTITY_OUTPUTS'] = tab(outputs[:-1])  # -1 removes the last ';', VHDL has some retarded rules
         sockets['INPUT_VARIABLES'] = tab(self.make_input_variables())
         sockets['RESET_COMMANDS'] = tab(self.make_reset())
         sockets['INIT_CONSTANTS_COMMANDS'] = tab(self.make_constants())
         sockets['OUTPUT_VARIABLES'] = tab(self.make_output_variables())
         sockets['INPUT_TYPE_CONVERSIONS'] = tab(self.make_input_type_conversions())
-        sockets['OUTPUT_TYPE_CONVERSIONS'] = tab(self.make_output_type_conversions())
+        sockets['OUTPUT_TYPE_CONVERSIONS'] = tab(self.make_output_type_conversions() + self.make_state_conversion())
         sockets['CALL_ARGUMENTS'] = self.make_call_arguments()
 
         # Handle rams.
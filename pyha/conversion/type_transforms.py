@@ -132,10 +132,15 @@ class BaseVHDLType:
     def _pyha_convert_to_stdlogic(self, out_name, in_name, out_index_offset=0) -> str:
         raise NotImplementedError()
 
+    def _pyha_type_signature(self):
+        """ Hashable signature of the type in VHDL domain, equal for compatible types. Modules compute it once (on init),
+        this makes the module de-duplication a dictionary lookup. """
+        return type(self), type(self.current)
+
     def _pyha_type_is_compatible(self, other) -> bool:
-        """ Test if ``other`` (same type as ``self``) is compatible in VHDL domain. Meaning that
-        all array types shall have same [start,end]. Recursive."""
-        raise NotImplementedError()
+        """ Test if ``other`` is compatible in VHDL domain. Meaning that
+        all array types shall have same [start,end]. """
+        return self._pyha_type_signature() == other._pyha_type_signature()
 
     def _pyha_to_python_value(self):
         return self.current
@@ -166,13 +171,8 @@ class VHDLInt(BaseVHDLType):
         return '{}({} downto {}) <= std_logic_vector(to_signed({}, 32));\n'.format(out_name, 31 + out_index_offset,
                                                                                    0 + out_index_offset, in_name)
 
-    def _pyha_type_is_compatible(self, other) -> bool:
-        if isinstance(self.current, bool) or isinstance(other.current, bool):
-            # python bool isinstance of int....
-            return False
-        if isinstance(self.current, int) and isinstance(other.current, int):
-            return True
-        return True
+    def _pyha_type_signature(self):
+        return VHDLInt,  # int and np.int64 are the same in VHDL
 
     def _pyha_to_python_value(self):
         return int(self.current)
@@ -202,11 +202,6 @@ class VHDLBool(BaseVHDLType):
         return '{}({} downto {}) <= bool_to_logic({});\n'.format(out_name, 0 + out_index_offset, 0 + out_index_offset,
                                                                  in_name)
 
-    def _pyha_type_is_compatible(self, other) -> bool:
-        if type(self.current) != type(other.current):
-            return False
-        return True
-
     def _pyha_to_python_value(self):
         return bool(self.current)
 
@@ -273,10 +268,8 @@ class VHDLSfix(BaseVHDLType):
         return '{}({} downto {}) <= to_slv({});\n'.format(out_name, self._pyha_bitwidth() - 1 + out_index_offset,
                                                           0 + out_index_offset, in_name)
 
-    def _pyha_type_is_compatible(self, other) -> bool:
-        if type(self.current) != type(other.current):
-            return False
-        return self.current.left == other.current.left and self.current.right == other.current.right and self.current.signed == other.current.signed
+    def _pyha_type_signature(self):
+        return VHDLSfix, type(self.current), self.current.left, self.current.right, self.current.signed
 
     def _pyha_to_python_value(self):
         if self.current.right == 0:  # no fractional bits
@@ -344,13 +337,10 @@ class VHDLComplex(BaseVHDLType):
         return '{}({} downto {}) <= to_slv({});\n'.format(out_name, self._pyha_bitwidth() - 1 + out_index_offset,
                                                           0 + out_index_offset, in_name)
 
-    def _pyha_type_is_compatible(self, other) -> bool:
-        if isinstance(self.current, complex) and isinstance(other.current, complex):
-            return True
-
-        if type(self.current) != type(other.current):
-            return False
-        return self.current.left == other.current.left and self.current.right == other.current.right
+    def _pyha_type_signature(self):
+        if isinstance(self.current, complex):
+            return VHDLComplex, complex
+        return VHDLComplex, type(self.current), self.current.left, self.current.right
 
     def _pyha_serialize(self):
         fix = self.current.val / 2 ** self.current.right
@@ -393,11 +383,6 @@ class VHDLEnum(BaseVHDLType):
     def _pyha_convert_to_stdlogic(self, var_name) -> str:
         raise NotImplementedError  # old solution interpeted as ints?
 
-    def _pyha_type_is_compatible(self, other) -> bool:
-        if type(self.current) != type(other.current):
-            return False
-        return True
-
     def _pyha_to_python_value(self):
         return self.current.value
 
@@ -465,13 +450,9 @@ class VHDLList(BaseVHDLType):
             ret += sub._pyha_reset(tmp_prefix, filter_func=filter_func)  # recursive
         return ret
 
-    def _pyha_type_is_compatible(self, other) -> bool:
-        if type(self.current) != type(other.current):
-            return False
-        if len(self.current) != len(other.current):
-            return False
-
-        return self.elems[0]._pyha_type_is_compatible(other.elems[0])
+    def _pyha_type_signature(self):
+        return VHDLList, type(self.current), len(self.current), \
+               self.elems[0]._pyha_type_signature() if self.elems else None
 
     def _pyha_bitwidth(self) -> int:
         return sum([x._pyha_bitwidth() for x in self.elems])
@@ -559,6 +540,8 @@ class VHDLModule(BaseVHDLType):
 
         self.elems = get_vars_as_vhdl_types(self.current, parent=self)
         self.elems = [x for x in self.elems if x is not None]
+        # element names are not part of the signature, only the types in order
+        self._type_signature = (VHDLModule, type(self.current), tuple(x._pyha_type_signature() for x in self.elems))
 
     def _pyha_module_name(self):
         from pyha.conversion.conversion import RecursiveConverter
@@ -587,16 +570,8 @@ class VHDLModule(BaseVHDLType):
             ret += sub._pyha_reset(tmp_prefix, filter_func=filter_func)  # recursive
         return ret
 
-    def _pyha_type_is_compatible(self, other) -> bool:
-        if type(self.current) != type(other.current):
-            return False
-
-        if len(self.elems) != len(other.elems):
-            # actually object with more elements could match with the one with lesser elemems, but this is too specific atm.
-            return False
-
-        return all(self_elem._pyha_type_is_compatible(other_elem)
-                   for self_elem, other_elem in zip(self.elems, other.elems))
+    def _pyha_type_signature(self):
+        return self._type_signature
 
     def _pyha_to_python_value(self):
         # maybe class is overloading this?
@@ -675,11 +650,6 @@ class VHDLFloat(BaseVHDLType):
     def _pyha_to_python_value(self):
         return self.current
 
-    def _pyha_type_is_compatible(self, other) -> bool:
-        if type(self.current) != type(other.current):
-            return False
-        return True
-
 
 # class VHDLComplex(BaseVHDLType):
 #     def _pyha_is_equal(self, other, name='', rtol=1e-7, atol=0):
@@ -0,0 +1,266 @@
+""" Find the first cycle where the 'RTL' simulation diverges from 'HARDWARE'.
+
+The 'HARDWARE' simulation runs once and keeps a register checkpoint every ``checkpoint_interval`` cycles. RTL runs
+always start from reset, so they are done on input prefixes that end at the checkpoints and binary search finds the
+first checkpoint where the RTL outputs or registers (debug 'state' port of the top entity) differ. Only
+~log2(cycles / checkpoint_interval) RTL runs are needed. Last step replays 'HARDWARE' from the previous checkpoint and
+compares every cycle up to the failing checkpoint, result holds the full register state of both sides at the first
+differing cycle.
+
+>>> divergence = find_divergence(dut, inputs)
+>>> print(divergence)  # None if simulations match
+"""
+import logging
+import os
+import sys
+from copy import deepcopy
+
+import numpy as np
+from wurlitzer import pipes
+
+from pyha.common.context_managers import RegisterBehaviour, SimulationRunning, AutoResize
+from pyha.common.core import DirtyRegisters
+from pyha.common.telemetry import Telemetry
+from pyha.conversion.conversion import Converter
+from pyha.conversion.top_generator import registers_only
+from pyha.conversion.type_transforms import VHDLModule, VHDLList
+from pyha.simulation.compare import flatten
+from pyha.simulation.simulation_interface import convert_input_types, transpose, pyha_to_python, \
+    write_cocotb_inputs, run_cocotb
+from pyha.simulation.simulator import get_state, set_state
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('sim')
+
+
+def register_vhdl(model):
+    return registers_only(VHDLModule('-', model))
+
+
+def register_bits(vhdl, path='self', out=None):
+    """ ``{path: bits}`` of each register, ``vhdl`` is ``register_vhdl`` of the design """
+    out = {} if out is None else out
+    if isinstance(vhdl, VHDLModule):
+        for x in vhdl.elems:
+            register_bits(x, f'{path}.{x._name}', out)
+    elif isinstance(vhdl, VHDLList):
+        for x in vhdl.elems:
+            register_bits(x, f'{path}{x._name}', out)
+    else:
+        out[path] = vhdl._pyha_serialize()
+    return out
+
+
+def unpack_registers(vhdl, bits, path='self', out=None):
+    """ Split the 'state' port value to ``{path: bits}`` of each register, layout as in ``_pyha_convert_to_stdlogic`` """
+    out = {} if out is None else out
+    if isinstance(vhdl, (VHDLModule, VHDLList)):
+        offset = 0
+        elems = reversed(vhdl.elems) if isinstance(vhdl, VHDLModule) else vhdl.elems  # module: first element is LSB
+        for x in elems:
+            name = f'{path}.{x._name}' if isinstance(vhdl, VHDLModule) else f'{path}{x._name}'
+            unpack_registers(x, bits[offset:offset + x._pyha_bitwidth()], name, out)
+            offset += x._pyha_bitwidth()
+    else:
+        out[path] = bits
+    return out
+
+
+def leaves(vhdl, path='self', out=None):
+    """ ``{path: VHDL type}`` of each register, used to decode the bits """
+    out = {} if out is None else out
+    if isinstance(vhdl, (VHDLModule, VHDLList)):
+        for x in vhdl.elems:
+            leaves(x, f'{path}.{x._name}' if isinstance(vhdl, VHDLModule) else f'{path}{x._name}', out)
+    else:
+        out[path] = vhdl
+    return out
+
+
+def outputs_equal(a, b):
+    flat_a, flat_b = {}, {}
+    flatten(a, '', flat_a)
+    flatten(b, '', flat_b)
+    if flat_a.keys() != flat_b.keys():
+        return False
+    return all(x == flat_b[k] or (x != x and flat_b[k] != flat_b[k]) for k, x in flat_a.items())
+
+
+def simulate_cycles(model, cycles, state_cycles=0):
+    """ Run ``model`` from its current state. Returns outputs of each cycle (``None`` for invalid) and
+    ``register_bits`` at the start of each of the last ``state_cycles`` cycles. """
+    outputs, states = [], []
+    state_from = len(cycles) - state_cycles
+    DirtyRegisters.reset()
+    with SimulationRunning.enable():
+        with RegisterBehaviour.enable():
+            with AutoResize.enable():
+                for i, input in enumerate(cycles):
+                    if i >= state_from:
+                        states.append(register_bits(register_vhdl(model)))
+                    outputs.append(pyha_to_python(model.main(*input)))
+                    model._pyha_update_registers()
+    return outputs, states
+
+
+def hardware_runner(model):
+    """ RTL runner protocol on 'HARDWARE' simulation: each call runs a fresh copy of ``model`` (not simulated yet) from
+    reset. Useful to bisect against another version of the design. """
+
+    def run(cycles, state_cycles):
+        dut = deepcopy(model)
+        dut._pyha_floats_to_fixed(silence=True)
+        return simulate_cycles(dut, cycles, state_cycles)
+
+    return run
+
+
+def ghdl_runner(converter, vhdl):
+    """ RTL runner with GHDL and COCOTB (docker or local GHDL, see ``run_cocotb``), ``converter`` must be made with ``Converter(state_output=True)`` """
+
+    def run(cycles, state_cycles):
+        write_cocotb_inputs(cycles, converter.base_path)
+        for name in ['output.npy', 'state.npy']:
+            if os.path.exists(str(converter.base_path / name)):
+                os.remove(str(converter.base_path / name))
+
+        with pipes(stdout=None, stderr=sys.stderr):
+            run_cocotb(converter, state_cycles=state_cycles)
+
+        types = converter.get_top_module_outputs()
+        outputs = []
+        for row in np.load(str(converter.base_path / 'output.npy')):
+            values = tuple(t._pyha_deserialize(x) for t, x in zip(types, row))
+            outputs.append(values if len(values) > 1 else values[0])
+        states = [unpack_registers(vhdl, str(x)) for x in np.load(str(converter.base_path / 'state.npy'))]
+        return outputs, states
+
+    return run
+
+
+class Divergence:
+    """ First cycle where the simulations differ.
+
+    :ivar cycle: Index of the cycle.
+    :ivar kind: 'state' if registers at the start of the cycle differ (last update went wrong), else 'output'.
+    :ivar registers: Paths of the differing registers.
+    :ivar hardware_state: ``{path: value}`` of all registers at the start of the cycle, 'HARDWARE' simulation.
+    :ivar rtl_state: Same for the RTL simulation.
+    :ivar hardware_output: Output of the cycle.
+    :ivar rtl_output: Output of the cycle.
+    :ivar rtl_runs: Number of RTL simulations that were needed.
+    """
+
+    def __init__(self, cycle, kind, hardware_state, rtl_state, hardware_output, rtl_output, rtl_runs):
+        self.cycle = cycle
+        self.kind = kind
+        self.hardware_state = hardware_state
+        self.rtl_state = rtl_state
+        self.hardware_output = hardware_output
+        self.rtl_output = rtl_output
+        self.rtl_runs = rtl_runs
+        names = {**hardware_state, **rtl_state}  # differ only if runner simulates a different design
+        self.registers = [k for k in names if hardware_state.get(k) != rtl_state.get(k)]
+
+    def __str__(self):
+        lines = [f'First divergence at cycle {self.cycle} ({self.kind}), found with {self.rtl_runs} RTL runs',
+                 f'OUTPUT: HARDWARE {self.hardware_output}, RTL {self.rtl_output}']
+        names = {**self.hardware_state, **self.rtl_state}
+        width = max([len('REGISTER')] + [len(x) for x in names])
+        lines.append(f'  {"REGISTER".ljust(width)}  HARDWARE  RTL')
+        for k in names:
+            mark = '*' if k in self.registers else ' '
+            lines.append(f'{mark} {k.ljust(width)}  {self.hardware_state.get(k, "-")}  {self.rtl_state.get(k, "-")}')
+        return '\n'.join(lines)
+
+
+def find_divergence(model, *args, input_types=None, checkpoint_interval=1024, conversion_path=None, rtl=None):
+    """
+    Binary search the first cycle where RTL simulation is not equal to 'HARDWARE'.
+
+    :param model: Object derived from ``Hardware``, not simulated yet (it is simulated here).
+    :param args: Simulation inputs, a list for each argument of 'main' (same as ``simulate``).
+    :param input_types: Force inputs types, default for floats is Sfix[0:-17].
+    :param checkpoint_interval: Cycles between 'HARDWARE' register checkpoints. Final step replays up to this many cycles.
+    :param conversion_path: Where the VHDL sources (with the debug 'state' port) are written.
+    :param rtl: RTL runner, ``rtl(cycles, state_cycles) -> (outputs, states)`` simulates the hardware inputs of each
+                cycle from reset and returns the outputs of each cycle and ``register_bits`` at the start of each of
+                the last ``state_cycles`` cycles. Default converts the design and uses ``ghdl_runner``.
+    :returns: ``Divergence`` or None if simulations are equal.
+    """
+    if rtl is None:
+        model._pyha_enable_function_profiling_for_types()
+    model._pyha_floats_to_fixed()
+    if hasattr(model, '_pyha_simulation_input_callback'):
+        with SimulationRunning.enable():
+            cycles = list(model._pyha_simulation_input_callback(args))
+    else:
+        cycles = transpose(convert_input_types(args, input_types))
+
+    # checkpoints at the start of the cycles, last one is at the last cycle
+    boundaries = sorted(set(range(checkpoint_interval, len(cycles), checkpoint_interval)) | {len(cycles) - 1})
+    checkpoints = {0: get_state(model)}
+    checkpoint_bits = {}
+    logger.info(f'Running "HARDWARE" simulation with {len(boundaries)} checkpoints...')
+    Telemetry.reset()
+    outputs = []
+    for start, end in zip([0] + boundaries, boundaries):
+        outputs += simulate_cycles(model, cycles[start:end])[0]
+        checkpoints[end] = get_state(model)
+        checkpoint_bits[end] = register_bits(register_vhdl(model))
+    outputs += simulate_cycles(model, cycles[-1:])[0]
+
+    vhdl = register_vhdl(model)
+    if rtl is None:
+        converter = Converter(model, output_dir=conversion_path, state_output=True).to_vhdl()
+        rtl = ghdl_runner(converter, vhdl)
+
+    def probe(i):
+        """ RTL run up to the i-th checkpoint, registers of the cycles since previous checkpoint are kept """
+        end = boundaries[i]
+        start = boundaries[i - 1] if i else 0
+        rtl_outputs, rtl_states = rtl(cycles[:end + 1], end - start + 1)
+        equal = rtl_states[-1] == checkpoint_bits[end] and \
+                all(outputs_equal(a, b) for a, b in zip(outputs, rtl_outputs))
+        return equal, (rtl_outputs, rtl_states)
+
+    runs = 1
+    equal, last = probe(len(boundaries) - 1)
+    if equal:
+        logger.info(f'No divergence in {len(cycles)} cycles')
+        return None
+
+    # first failing checkpoint
+    low, high = 0, len(boundaries) - 1
+    failing = last
+    while low < high:
+        middle = (low + high) // 2
+        runs += 1
+        equal, result = probe(middle)
+        if equal:
+            low = middle + 1
+        else:
+            high, failing = middle, result
+
+    # replay 'HARDWARE' since the previous checkpoint
+    end = boundaries[high]
+    start = boundaries[high - 1] if high else 0
+    set_state(model, checkpoints[start])
+    _, states = simulate_cycles(model, cycles[start:end + 1], end - start + 1)
+    rtl_outputs, rtl_states = failing
+    types = leaves(vhdl)
+
+    def decode(bits):
+        return {k: types[k]._pyha_deserialize(v) if k in types else v for k, v in bits.items()}
+
+    for cycle, state, rtl_state in zip(range(start, end + 1), states, rtl_states):
+        if state != rtl_state:
+            kind = 'state'
+        elif not outputs_equal(outputs[cycle], rtl_outputs[cycle]):
+            kind = 'output'
+        else:
+            continue
+        ret = Divergence(cycle, kind, decode(state), decode(rtl_state), outputs[cycle], rtl_outputs[cycle], runs)
+        logger.info(ret)
+        return ret
+    return None
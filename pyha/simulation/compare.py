@@ -0,0 +1,214 @@
+""" Vectorized comparison of simulation outputs.
+
+Each output is converted once to NumPy columns, one float/complex array for every scalar leaf of the samples
+(``DataValid``, tuples, lists, complex and fixed-point values are flattened, invalid ``DataValid`` and ``None`` become
+NaN). Closeness is ``math.isclose`` semantics: ``abs(a - b) <= max(rtol * max(abs(a), abs(b)), atol)``, for complex
+values the real and imaginary parts must both be close. ``assert_simulations_equal`` uses ``allclose`` instead, same as
+``numpy.testing.assert_allclose``.
+"""
+import warnings
+from enum import Enum
+
+import numpy as np
+
+from pyha.common.core import Hardware, PyhaList
+from pyha.common.util import get_iterable
+
+NUMBER_KINDS = 'biufc'
+SCALAR_TYPES = (bool, int, float, complex, np.number, np.bool_)
+
+
+def as_numbers(array):
+    return array.astype(complex if array.dtype.kind == 'c' else float)
+
+
+def flatten(value, path, out):
+    """ Scalar leaves of one output sample into ``out`` dict, keys are paths like '[1].data' """
+    if value is None:
+        out[path] = np.nan
+    elif isinstance(value, Enum):
+        out[path] = value.value
+    elif isinstance(value, SCALAR_TYPES):
+        out[path] = value
+    elif isinstance(value, (list, tuple, np.ndarray, PyhaList)):
+        for i, x in enumerate(value):
+            flatten(x, f'{path}[{i}]', out)
+    elif isinstance(value, Hardware) and type(value)._pyha_to_python_value is Hardware._pyha_to_python_value:
+        for k, v in vars(value).items():
+            if not k.startswith('_pyha'):
+                flatten(v, f'{path}.{k}', out)
+    elif hasattr(value, '_pyha_to_python_value'):  # Sfix, Complex, DataValid...
+        flatten(value._pyha_to_python_value(), path, out)
+    else:
+        raise TypeError(f'Cannot compare {type(value).__name__} values ({path or "sample"})')
+
+
+def is_numeric(values):
+    """ True if NumPy can convert ``values`` to number array directly (no Pyha types, that may look like sequences) """
+    if isinstance(values, np.ndarray) and values.dtype.kind in NUMBER_KINDS:
+        return True
+    types = set(map(type, values))
+    if all(issubclass(t, SCALAR_TYPES) for t in types):
+        return True
+    if all(issubclass(t, (list, tuple, np.ndarray)) for t in types):
+        return all(is_numeric(x) for x in values)
+    return False
+
+
+def to_columns(output, skip_first_n=0):
+    """ Simulation output to ``{path: array}``, plain numeric outputs are a single column with path '' """
+    output = get_iterable(output)[skip_first_n:]
+    if is_numeric(output):
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                array = np.asarray(output)
+            if array.dtype.kind in NUMBER_KINDS:
+                return {'': as_numbers(array)}
+        except ValueError:  # ragged
+            pass
+
+    samples = []
+    for x in output:
+        flat = {}
+        flatten(x, '', flat)
+        samples.append(flat)
+    paths = list(dict.fromkeys(path for flat in samples for path in flat))
+    return {path: as_numbers(np.array([flat.get(path, np.nan) for flat in samples])) for path in paths}
+
+
+def isclose(a, b, rtol, atol):
+    if a.dtype.kind == 'c' or b.dtype.kind == 'c':
+        return isclose(a.real, b.real, rtol, atol) & isclose(a.imag, b.imag, rtol, atol)
+    with np.errstate(invalid='ignore'):
+        close = np.abs(a - b) <= np.maximum(rtol * np.maximum(np.abs(a), np.abs(b)), atol)
+    return close | (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+def allclose(a, b, rtol, atol):
+    """ ``numpy.testing.assert_allclose`` semantics: ``abs(a - b) <= atol + rtol * abs(b)``, ``b`` is the expected """
+    with np.errstate(invalid='ignore'):
+        close = np.abs(a - b) <= atol + rtol * np.abs(b)
+    return close | (a == b) | (np.isnan(a) & np.isnan(b))
+
+
+class Comparison:
+    """ Result of comparing one simulation to the expected output.
+
+    :ivar mismatches: Number of values that are not close.
+    :ivar first_mismatch: ``(index tuple, path)`` of the first value that is not close, None if all are close.
+    :ivar max_abs: Largest absolute error.
+    :ivar max_rel: Largest relative error (of the non-zero expected values).
+    :ivar sqnr: Signal to quantization noise ratio [dB], expected output is the signal.
+    :ivar error: Set when outputs can't be compared (e.g. lengths differ), other statistics are then not set.
+    """
+
+    def __init__(self, name, values=0, mismatches=0, first_mismatch=None, actual=None, expected=None, max_abs=0.0,
+                 max_rel=0.0, sqnr=np.inf, error=None):
+        self.name = name
+        self.values = values
+        self.mismatches = mismatches
+        self.first_mismatch = first_mismatch
+        self.actual = actual
+        self.expected = expected
+        self.max_abs = max_abs
+        self.max_rel = max_rel
+        self.sqnr = sqnr
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None and self.mismatches == 0
+
+    def __bool__(self):
+        return self.ok
+
+    def __repr__(self):
+        if self.error is not None:
+            return f'{self.name} FAILED: {self.error}'
+        stats = f'max abs {self.max_abs:.3g}, max rel {self.max_rel:.3g}, SQNR {self.sqnr:.1f} dB'
+        if self.ok:
+            return f'{self.name} OK ({self.values} values, {stats})'
+        index, path = self.first_mismatch
+        index = ', '.join(str(int(x)) for x in index)
+        return f'{self.name} FAILED: {self.mismatches}/{self.values} values differ, first at [{index}]{path} ' \
+               f'({self.actual} != {self.expected}), {stats}'
+
+
+def compare(name, actual, expected, rtol=1e-04, atol=(2 ** -17) * 4, close=isclose):
+    """
+    :param actual: Columns (``to_columns``) of the simulation output.
+    :param expected: Columns of the expected output.
+    :param close: ``isclose`` or ``allclose``.
+    :returns: ``Comparison``
+    """
+    if actual.keys() != expected.keys():
+        return Comparison(name, error=f'output structure differs: {sorted(actual)} vs {sorted(expected)}')
+    for path in actual:
+        if actual[path].shape != expected[path].shape:
+            return Comparison(name, error=f'output shape differs: {actual[path].shape} vs {expected[path].shape}')
+
+    result = Comparison(name)
+    signal = noise = 0.0
+    for path, a in actual.items():
+        b = expected[path]
+        result.values += a.size
+        bad = ~close(a, b, rtol, atol)
+        count = int(np.count_nonzero(bad))
+        if count:
+            index = np.unravel_index(np.argmax(bad), bad.shape)
+            if result.first_mismatch is None or index < result.first_mismatch[0]:
+                result.first_mismatch = (index, path)
+                result.actual, result.expected = a[index], b[index]
+            result.mismatches += count
+
+        finite = np.isfinite(a) & np.isfinite(b)
+        a, b = a[finite], b[finite]
+        if not a.size:
+            continue
+        error = np.abs(a - b)
+        result.max_abs = max(result.max_abs, float(error.max()))
+        nonzero = b != 0
+        if nonzero.any():
+            result.max_rel = max(result.max_rel, float((error[nonzero] / np.abs(b[nonzero])).max()))
+        signal += float(np.sum(np.abs(b) ** 2))
+        noise += float(np.sum(error ** 2))
+
+    if noise:
+        result.sqnr = 10 * np.log10(signal / noise) if signal else -np.inf
+    return result
+
+
+class ComparisonReport(dict):
+    """ ``Comparison`` of each simulation, ``str()`` gives one summary line per simulation. """
+
+    @property
+    def ok(self):
+        return all(x.ok for x in self.values())
+
+    def __str__(self):
+        return '\n'.join(repr(x) for x in self.values())
+
+
+def golden_output(simulation_results):
+    """ Name of the simulation used as expected output: 'MODEL', 'MODEL_PYHA' or 'HARDWARE' """
+    for name in ['MODEL', 'MODEL_PYHA']:
+        if name in simulation_results:
+            return name
+    return 'HARDWARE'
+
+
+def compare_simulations(simulation_results, expected=None, rtol=1e-04, atol=(2 ** -17) * 4, skip_first_n=0):
+    """
+    Compare the outputs of ``simulate`` function to the expected output.
+
+    :param simulation_results: Output of 'simulate' function
+    :param expected: 'Golden output' to compare against. If None uses the output of ``golden_output``.
+    :param skip_first_n: Skip comparing first N elements
+    :returns: ``ComparisonReport``
+    """
+    if expected is None:
+        expected = simulation_results[golden_output(simulation_results)]
+    expected = to_columns(expected, skip_first_n)
+    return ComparisonReport((name, compare(name, to_columns(output, skip_first_n), expected, rtol, atol))
+                            for name, output in simulation_results.items())
@@ -0,0 +1,72 @@
+""" Fast-forward trough runs of invalid ``DataValid`` input cycles.
+
+Once an invalid input cycle produced no output and left the state unchanged (every assigned register got its current
+value back and ``RAM``/``ShiftRegister`` updates are no-ops), the design is at a fixed point for that input: the
+following cycles with an equal invalid input would do exactly the same, so they are skipped without running the design.
+"""
+from pyha.common.core import DirtyRegisters, PyhaList
+from pyha.common.datavalid import DataValid
+
+
+def values_equal(a, b):
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    return (a == b) is True  # NumPy arrays etc. are never equal
+
+
+def is_invalid_input(input):
+    return len(input) > 0 and all(isinstance(x, DataValid) and x.valid is False for x in input)
+
+
+def inputs_equal(a, b):
+    return all(values_equal(x.data, y.data) for x, y in zip(a, b))
+
+
+def state_is_stable(model):
+    """ Call after 'main' returned, True if register update would not change the design """
+    for obj in DirtyRegisters.objects.values():
+        if isinstance(obj, PyhaList):
+            if len(obj.data) != len(obj._pyha_next) \
+                    or not all(values_equal(x, y) for x, y in zip(obj.data, obj._pyha_next)):
+                return False
+        elif not all(values_equal(obj.__dict__[k], v) for k, v in obj._pyha_next.items()):
+            return False
+
+    for obj in DirtyRegisters.always_for(model):
+        try:
+            if not obj._pyha_is_idle():
+                return False
+        except AttributeError:  # unknown update, cannot tell
+            return False
+    return True
+
+
+class FastForward:
+    """ Used by the 'HARDWARE' simulation loop:
+
+    >>> if fast_forward.skip(input):
+    ...     continue
+    >>> returns = pyha_to_python(model.main(*input))
+    >>> fast_forward.check(input, returns)
+    >>> model._pyha_update_registers()
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.idle_input = None
+        self.skipped = 0
+
+    def skip(self, input):
+        """ True if the cycle with ``input`` can be skipped """
+        if self.idle_input is not None and is_invalid_input(input) and inputs_equal(input, self.idle_input):
+            self.skipped += 1
+            return True
+        self.idle_input = None
+        return False
+
+    def check(self, input, returns):
+        """ Call after 'main' returned (before the register update) """
+        if returns is None and is_invalid_input(input) and state_is_stable(self.model):
+            self.idle_input = input
@@ -0,0 +1,144 @@
+""" Run the COCOTB testbench with a locally installed GHDL, instead of the docker image.
+
+Enabled by the ``PYHA_GHDL`` environment variable, value is the GHDL binary (e.g. 'ghdl' or full path). COCOTB must be
+installed (the version that supports the generator based testbench), ``PYHA_COCOTB_VPI`` overrides the VPI library
+found by ``cocotb-config``.
+
+Support packages (``complex_pkg`` and ``PyhaUtil``) are analysed once into a library in the cache directory
+(``~/.cache/pyha/ghdl``, ``PYHA_GHDL_CACHE`` changes it), key is the hash of GHDL version, arguments and the package
+sources. Each conversion directory has a work library ('ghdl_work') that starts as a copy of it. Generated files are
+analysed only if they changed since the last run, together with the files that follow them in the compile order (these
+may depend on the changed units). ``ieee.fixed_pkg`` is part of GHDL's VHDL-2008 library, 'fixed_pkg_c.vhdl' is only
+needed for Quartus.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import pyha
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('sim')
+
+SUPPORT_PACKAGES = ['complex.vhdl', 'pyha_util.vhdl']  # order matters, PyhaUtil uses complex_pkg
+GHDL_ARGS = ['--std=08']
+
+
+def file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def support_library(ghdl, args=GHDL_ARGS):
+    """ Library with the analysed support packages, analysed on the first call. Returns ``(key, directory)``. """
+    sim_inc = Path(pyha.__path__[0]) / 'simulation' / 'sim_include'
+    sources = [sim_inc / x for x in SUPPORT_PACKAGES]
+    version = subprocess.run([ghdl, '--version'], stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+
+    h = hashlib.sha256()
+    for x in [version, ' '.join(args)] + [file_hash(x) for x in sources]:
+        h.update(x.encode())
+        h.update(b'\0')
+    key = h.hexdigest()
+
+    cache = Path(os.environ.get('PYHA_GHDL_CACHE', '~/.cache/pyha/ghdl')).expanduser()
+    path = cache / key
+    if not path.is_dir():
+        logger.info(f'Analysing GHDL support packages to {path} ...')
+        cache.mkdir(parents=True, exist_ok=True)
+        # analyse to temporary directory and rename, concurrent simulations may build the same library
+        tmp = tempfile.mkdtemp(dir=str(cache), suffix='.tmp')
+        try:
+            subprocess.run([ghdl, '-a', *args, f'--workdir={tmp}', *[str(x) for x in sources]], check=True)
+            os.replace(tmp, str(path))
+        except OSError:  # other process was faster
+            shutil.rmtree(tmp, ignore_errors=True)
+        except subprocess.CalledProcessError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    return key, path
+
+
+def cocotb_environment():
+    """ Environment variables that COCOTB makefiles would set """
+    env = dict(os.environ, TOPLEVEL='top', TOPLEVEL_LANG='vhdl', MODULE='cocotb_simulation_top',
+               PYGPI_PYTHON_BIN=sys.executable)
+    if 'LIBPYTHON_LOC' not in env:
+        try:
+            env['LIBPYTHON_LOC'] = subprocess.run(['cocotb-config', '--libpython'], stdout=subprocess.PIPE,
+                                                  universal_newlines=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):  # older COCOTB, not needed
+            pass
+    return env
+
+
+def cocotb_vpi():
+    if 'PYHA_COCOTB_VPI' in os.environ:
+        return os.environ['PYHA_COCOTB_VPI']
+    return subprocess.run(['cocotb-config', '--lib-name-path', 'vpi', 'ghdl'], stdout=subprocess.PIPE,
+                          universal_newlines=True, check=True).stdout.strip()
+
+
+class LocalGHDL:
+    """ Simulates the ``Converter`` output, inputs are in 'input.npy' (see ``write_cocotb_inputs``). """
+
+    def __init__(self, converter, ghdl=None):
+        self.converter = converter
+        self.ghdl = ghdl or os.environ.get('PYHA_GHDL', 'ghdl')
+        self.args = GHDL_ARGS
+        self.workdir = converter.base_path / 'ghdl_work'
+        self.state_path = self.workdir / 'analysed.json'
+        self.analysed = []  # files analysed by the last 'analyse'
+
+    def generated_sources(self):
+        support = [self.converter.src_util_path / x for x in SUPPORT_PACKAGES]
+        return [x for x in self.converter.vhdl_sources if x not in support]
+
+    def analyse(self):
+        """ Update the work library, only changed files (and the files that follow them) are analysed """
+        key, library = support_library(self.ghdl, self.args)
+        try:
+            with self.state_path.open() as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {}
+
+        if state.get('library') != key:
+            shutil.rmtree(str(self.workdir), ignore_errors=True)
+            self.workdir.mkdir(parents=True)
+            for x in library.iterdir():
+                shutil.copy2(str(x), str(self.workdir / x.name))
+            state = {'library': key, 'files': []}
+
+        files = [[self.converter.relative(x), file_hash(x)] for x in self.generated_sources()]
+        first = 0
+        while first < min(len(files), len(state['files'])) and files[first] == state['files'][first]:
+            first += 1
+
+        self.analysed = self.generated_sources()[first:]
+        if self.analysed:
+            logger.info(f'GHDL analysing {len(self.analysed)} files ...')
+            subprocess.run([self.ghdl, '-a', *self.args, f'--workdir={self.workdir}', *[str(x) for x in self.analysed]],
+                           cwd=str(self.converter.base_path), check=True)
+
+        with self.state_path.open('w') as f:
+            json.dump({'library': key, 'files': files}, f)
+
+    def run(self, output_stream=False, state_cycles=0):
+        """ Same as the docker command of ``get_cocotb_command``, results are in the conversion directory. """
+        self.analyse()
+        env = cocotb_environment()
+        env['PYTHONPATH'] = os.pathsep.join([str(self.converter.base_path)] + sys.path)
+        env['OUTPUT_VARIABLES'] = str(len(self.converter.get_top_module_outputs()))
+        if output_stream:
+            env['OUTPUT_STREAM'] = '1'
+        if state_cycles:
+            env['STATE_CYCLES'] = str(state_cycles)
+
+        subprocess.run([self.ghdl, '--elab-run', *self.args, f'--workdir={self.workdir}', 'top',
+                        f'--vpi={cocotb_vpi()}'], cwd=str(self.converter.base_path), env=env)
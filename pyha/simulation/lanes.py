@@ -0,0 +1,141 @@
+""" Lockstep simulation of many independent instances of one design (SIMD lanes).
+
+Fixed-point inputs of all lanes are merged into ``SfixArray``/``ComplexArray`` (one element per lane), so one call of
+``main`` advances all the instances. Registers turn into arrays once lane data is assigned to them (auto-resize keeps
+the register format), everything else stays scalar. Control path (bools, integers, counters, addresses) is
+shared by all lanes, meaning that lanes must only differ in the data path i.e. channels or random test vectors.
+"""
+import logging
+import sys
+from copy import copy
+from contextlib import suppress
+
+from tqdm import tqdm
+
+from pyha.common.complex import Complex
+from pyha.common.context_managers import RegisterBehaviour, SimulationRunning, AutoResize
+from pyha.common.core import Hardware, DirtyRegisters
+from pyha.common.fixed_point import Sfix
+from pyha.common.fixed_point_array import SfixArray, ComplexArray
+from pyha.common.telemetry import Telemetry
+from pyha.simulation.simulation_interface import convert_input_types, transpose, process_outputs, pyha_to_python
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('sim')
+
+
+class LaneDivergence(Exception):
+    """ Lanes took different control path, cannot be simulated in lockstep """
+
+
+def merge_lanes(values):
+    """ Merge one value from each lane into one lockstep value """
+    first = values[0]
+    if isinstance(first, Sfix):
+        return SfixArray(values, first.left, first.right, overflow_style=first.overflow_style,
+                         round_style=first.round_style, wrap_is_ok=first.wrap_is_ok, signed=first.signed)
+
+    if isinstance(first, Complex):
+        return ComplexArray(values, first.left, first.right, overflow_style=first.overflow_style,
+                            round_style=first.round_style, wrap_is_ok=first.wrap_is_ok)
+
+    if isinstance(first, Hardware):
+        ret = copy(first)
+        for k in first.__dict__:
+            if not k.startswith('_pyha'):
+                ret.__dict__[k] = merge_lanes([x.__dict__[k] for x in values])
+        return ret
+
+    if isinstance(first, (list, tuple)):
+        return type(first)(merge_lanes(list(x)) for x in zip(*values))
+
+    if any(x != first for x in values[1:]):
+        raise LaneDivergence(f'Inputs that are not fixed-point must be equal in all lanes, got {values}')
+    return first
+
+
+def split_lanes(value, lanes):
+    """ Inverse of ``merge_lanes``, returns list of values (one for each lane) """
+    if isinstance(value, (SfixArray, ComplexArray)):
+        return list(value)
+
+    if isinstance(value, Hardware):
+        ret = [copy(value) for _ in range(lanes)]
+        for k, v in value.__dict__.items():
+            if not k.startswith('_pyha'):
+                for obj, lane_value in zip(ret, split_lanes(v, lanes)):
+                    obj.__dict__[k] = lane_value
+        return ret
+
+    if isinstance(value, (list, tuple)):
+        return [type(value)(x) for x in zip(*[split_lanes(x, lanes) for x in value])]
+    return [value] * lanes
+
+
+def simulate_lanes(model, *args, input_types=None, pipeline_flush='self.DELAY'):
+    """
+    Run the 'HARDWARE' simulation of many independent instances of ``model`` in lockstep (one lane per instance).
+    Cost is close to one simulation, no matter the number of lanes.
+
+    :param model: Object derived from ``Hardware``.
+    :param args: Inputs to the ``main`` function, for each argument a list of inputs for each lane i.e. shape is (lanes, samples).
+    :param input_types: Force inputs types, default for floats is Sfix[0:-17].
+    :param pipeline_flush: Same as for ``simulate``, except 'auto' (no MODEL simulation to compare against).
+    :returns: List of outputs for each lane, each is same as ``simulate(...)['HARDWARE']`` for that lane.
+
+    >>> lanes = simulate_lanes(dut, [inputs_channel0, inputs_channel1])
+    >>> lanes[1]  # outputs of channel1
+    """
+    lanes = len(args[0])
+    if any(len(x) != lanes for x in args):
+        raise ValueError('All arguments must have the same number of lanes')
+
+    Telemetry.reset()
+    DirtyRegisters.reset()
+    model._pyha_floats_to_fixed()
+    lane_inputs = []
+    for lane in range(lanes):
+        lane_args = tuple(x[lane] for x in args)
+        if hasattr(model, '_pyha_simulation_input_callback'):
+            # inputs are only read, creating them as local objects skips the costly register setup
+            with SimulationRunning.enable():
+                lane_args = model._pyha_simulation_input_callback(lane_args)
+        else:
+            lane_args = convert_input_types(lane_args, input_types, silence=lane != 0)
+            lane_args = transpose(lane_args)
+        lane_inputs.append(lane_args)
+
+    delay_compensate = 0
+    if pipeline_flush == 'self.DELAY':
+        with suppress(AttributeError):
+            delay_compensate = model.DELAY
+
+    inputs = [tuple(merge_lanes(list(x)) for x in zip(*cycle)) for cycle in zip(*lane_inputs)]
+    if delay_compensate:
+        # duplicate input args to flush pipeline
+        inputs = (inputs * (delay_compensate // len(inputs) + 2))[:len(inputs) + delay_compensate]
+
+    logger.info(f'Running "HARDWARE" simulation with {lanes} lanes...')
+    ret = [[] for _ in range(lanes)]
+    with SimulationRunning.enable():
+        with RegisterBehaviour.enable():
+            with AutoResize.enable():
+                for cycle, input in enumerate(tqdm(inputs, file=sys.stderr)):
+                    Telemetry.cycle = cycle
+                    try:
+                        returns = model.main(*input)
+                    except ValueError as e:
+                        if 'truth value of an array' not in str(e):
+                            raise
+                        raise LaneDivergence(f'Control path depends on lane data (cycle {cycle})') from e
+
+                    if returns is not None:
+                        for lane, x in enumerate(split_lanes(returns, lanes)):
+                            x = pyha_to_python(x)
+                            if x is not None:
+                                ret[lane].append(x)
+                    model._pyha_update_registers()
+    Telemetry.cycle = None
+
+    logger.info(f'OK!')
+    return [process_outputs(delay_compensate, x) for x in ret]
@@ -0,0 +1,98 @@
+""" Run many independent simulations (parameter sweeps, seeds) in a pool of worker processes.
+
+Simulator and converter keep global state (``RecursiveConverter``, ``Tracer.traced_objects``, context manager counters),
+so each design is built and simulated in its own worker process instead of threads.
+"""
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('sim')
+
+
+class SimulationJob:
+    """ Outcome of one ``simulate_many`` config.
+
+    :ivar index: position of the config in the ``configs`` list
+    :ivar result: ``SimulationResults`` returned by ``simulate``, None if the job failed
+    :ivar error: formatted traceback if the job failed, else None
+    :ivar build_time: seconds spent constructing the design
+    :ivar simulate_time: seconds spent in ``simulate``
+    :ivar pid: process id of the worker that ran the job
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.result = None
+        self.error = None
+        self.build_time = 0.0
+        self.simulate_time = 0.0
+        self.pid = os.getpid()
+
+    @property
+    def elapsed(self):
+        return self.build_time + self.simulate_time
+
+    def __repr__(self):
+        status = 'FAILED' if self.error is not None else 'OK'
+        return f'SimulationJob({self.index}, {status}, build {self.build_time:.2f}s, simulate {self.simulate_time:.2f}s)'
+
+
+def run_job(index, config):
+    """ Build and simulate one config, runs in the worker process """
+    from pyha.simulation.simulation_interface import simulate
+
+    job = SimulationJob(index)
+    config = dict(config)
+    try:
+        start = time.perf_counter()
+        model = config.pop('model')(*config.pop('model_args', ()), **config.pop('model_kwargs', {}))
+        job.build_time = time.perf_counter() - start
+
+        inputs = config.pop('inputs')
+        start = time.perf_counter()
+        job.result = simulate(model, *inputs, **config)
+        job.simulate_time = time.perf_counter() - start
+    except Exception:
+        job.error = traceback.format_exc()
+    return job
+
+
+def simulate_many(configs, workers=None):
+    """
+    Build and simulate each config in a pool of worker processes.
+
+    :param configs: List of dicts, each has:
+        * ``'model'``: ``Hardware`` class (or other picklable callable) that builds the design
+        * ``'model_args'``, ``'model_kwargs'``: (optional) passed to ``'model'``
+        * ``'inputs'``: list of inputs to the 'main' function, same as ``*args`` of ``simulate``
+        * all other keys are passed to ``simulate``, for example ``simulations`` or ``conversion_path``
+    :param workers: Number of worker processes, default is the number of CPUs. ``1`` runs the configs serially in
+                    this process (debuggable).
+    :returns: List of ``SimulationJob`` in the order of ``configs``. Failed jobs have ``error`` set instead of raising.
+
+    >>> configs = [{'model': R2SDF, 'model_args': (fft_size,), 'inputs': [x]} for fft_size in [64, 128, 256]]
+    >>> jobs = simulate_many(configs, workers=3)
+    >>> jobs[0].result['HARDWARE'], jobs[0].simulate_time
+    """
+    configs = list(configs)
+    if workers is None:
+        workers = os.cpu_count()
+    workers = max(1, min(workers, len(configs)))
+
+    start = time.perf_counter()
+    if workers == 1:
+        jobs = [run_job(i, config) for i, config in enumerate(configs)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            jobs = list(pool.map(run_job, range(len(configs)), configs))
+
+    for job in jobs:
+        if job.error is not None:
+            logger.error(f'Simulation job {job.index} failed:\n{job.error}')
+    logger.info(f'{len(jobs)} simulation jobs took {time.perf_counter() - start:.2f}s with {workers} workers '
+                f'(sum of job times {sum(x.elapsed for x in jobs):.2f}s)')
+    return jobs
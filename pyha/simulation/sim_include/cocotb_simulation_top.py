@@ -20,8 +20,8 @@ def reset(dut, duration=10000): # pragma: no cover
     dut.log.debug("Out of reset")
 
 
-@cocotb.coroutine                       # pragma: no cover
-def run_dut(dut, in_data, out_count):   # pragma: no cover
+@cocotb.coroutine                                                       # pragma: no cover
+def run_dut(dut, in_data, out_count, sink=None, states=None, state_from=0):  # pragma: no cover
     # dut.enable = 1
     # dut.in0 = 0
     cocotb.fork(Clock(dut.clk, 5000).start())
@@ -51,7 +51,14 @@ def run_dut(dut, in_data, out_count):   # pragma: no cover
             val = str(getattr(dut, var).value)
             # print(val)
             tmp.append(val)
-        ret.append(tmp)
+        if sink is not None:
+            sink(tmp)
+        else:
+            ret.append(tmp)
+
+        # register state of the debug conversion
+        if states is not None and count > state_from:
+            states.append(str(dut.state.value))
 
     # print('Finish, ret: {}'.format(ret))
     raise ReturnValue(ret)
@@ -60,9 +67,20 @@ def run_dut(dut, in_data, out_count):   # pragma: no cover
 @cocotb.test()      # pragma: no cover
 def test_main(dut): # pragma: no cover
     import os
-    in_data = np.load(os.getcwd() + '/input.npy')
+    in_data = np.load(os.getcwd() + '/input.npy', mmap_mode='r')
 
     output_vars = int(os.environ['OUTPUT_VARIABLES'])
-    hdl_out = yield run_dut(dut, in_data, output_vars)
+    if os.environ.get('OUTPUT_STREAM'):
+        # streaming simulation, write outputs as they come -> memory usage does not depend on the input length
+        with open(os.getcwd() + '/output.txt', 'w') as f:
+            yield run_dut(dut, in_data, output_vars, sink=lambda row: f.write(' '.join(row) + '\n'))
+        return
 
+    state_cycles = int(os.environ.get('STATE_CYCLES', 0))
+    if state_cycles:
+        states = []
+        hdl_out = yield run_dut(dut, in_data, output_vars, states=states, state_from=len(in_data) - state_cycles)
+        np.save(os.getcwd() + '/state.npy', states)
+    else:
+        hdl_out = yield run_dut(dut, in_data, output_vars)
     np.save(os.getcwd() + '/output.npy', hdl_out)
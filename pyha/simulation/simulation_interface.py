@@ -12,7 +12,14 @@ from wurlitzer import pipes
 from pyha import Hardware
 from pyha.common.complex import default_complex
 from pyha.common.context_managers import RegisterBehaviour, SimulationRunning, SimPath, AutoResize
+from pyha.common.core import PyhaFunc, DirtyRegisters
 from pyha.common.fixed_point import Sfix, default_sfix
+from pyha.common.profiler import Profiler
+from pyha.common.telemetry import Telemetry
+from pyha.simulation.compare import compare, compare_simulations, golden_output, to_columns, allclose
+from pyha.simulation.codegen import CodegenBackend, is_supported as codegen_supported
+from pyha.simulation.fast_forward import FastForward
+from pyha.simulation.ghdl import LocalGHDL
 from pyha.common.util import get_iterable, np_to_py, is_float, is_complex
 from pyha.conversion.conversion import Converter
 from pyha.conversion.type_transforms import init_vhdl_type
@@ -121,8 +128,20 @@ def pyha_to_python(simulation_output):
     return ret
 
 
+class SimulationResults(dict):
+    """ Output of ``simulate``, dict of output lists for each simulation.
+    ``overflows`` holds the wrap/saturation summary (``OverflowReport``) of the simulation run,
+    ``profile`` the 'HARDWARE' simulation profile (``ProfileReport``) if ``simulate(profile=True)``. """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.overflows = None
+        self.profile = None
+
+
 def simulate(model, *args, simulations=None, conversion_path=None, input_types=None,
-             pipeline_flush='self.DELAY', trace=False):
+             pipeline_flush='self.DELAY', trace=False, overflow_hook=None, backend='interpreter', fast_forward=False,
+             profile=False, waveform=None):
     """
     Run simulations on model.
 
@@ -153,14 +172,33 @@ def simulate(model, *args, simulations=None, conversion_path=None, input_types=N
         input_types:
         pipeline_flush:
         trace:
+        overflow_hook: Called with ``OverflowEvents`` on the first wrap/saturation of each location.
+                       Use ``pyha.common.telemetry.break_into_debugger`` to stop the debugger there.
+        backend: How the 'HARDWARE' simulation is executed:
+            * 'interpreter' : every register assign goes trough ``Hardware.__setattr__``, debuggable.
+            * 'codegen'     : runs on generated code with register formats baked in, bit-exact and much faster.
+                              Falls back to 'interpreter' if VHDL conversion needs type discovery or with ``profile``.
+        fast_forward: Skip runs of equal invalid ``DataValid`` inputs once the design is idle (no outputs, no register
+                      changes), see ``pyha.simulation.fast_forward``. Results are exact. Not used with 'codegen'.
+        profile: Profile the 'HARDWARE' simulation per design instance and method (e.g. 'self.stages[0].main') and
+                 per framework phase (type discovery, auto-resize, register update, input/output conversion).
+                 'memory' also tracks net allocated bytes and blocks (slow). Report is in ``.profile``, full data stays
+                 in ``pyha.common.profiler.Profiler`` e.g. for ``pstats.Stats(Profiler)``. Uses the 'interpreter'
+                 backend, profiled methods would shadow the generated ones of 'codegen'.
+        waveform: ``pyha.simulation.waveform.WaveformRecorder``, records the selected registers and ports of the
+                  'HARDWARE' simulation every cycle. Recording is in ``waveform.waveform`` after the simulation.
 
     Returns:
-        dict:
+        SimulationResults: dict of outputs, ``.overflows`` holds the wrap/saturation summary table, ``.profile``
+        the profile table.
 
     """
     from pyha.simulation.tracer import Tracer
     Tracer.traced_objects.clear()
     set_simulator_quartus(None)
+    Telemetry.reset()
+    DirtyRegisters.reset()
+    Telemetry.hook = overflow_hook
 
     if simulations is None:
         if hasattr(model, 'model'):
@@ -205,7 +243,7 @@ def simulate(model, *args, simulations=None, conversion_path=None, input_types=N
         logger.info(f'Tracing is enabled, running "MODEL" and "HARDWARE" simulations')
         model._pyha_insert_tracer(label='self')
 
-    out = {}
+    out = SimulationResults()
     if 'MODEL' in simulations:
         logger.info(f'Running "MODEL" simulation...')
 
@@ -248,59 +286,113 @@ def simulate(model, *args, simulations=None, conversion_path=None, input_types=N
 
     if 'HARDWARE' in simulations:
         if 'RTL' in simulations or 'NETLIST' in simulations or conversion_path is not None:
-            logger.info(f'Simulaton needs to support conversion to VHDL -> major slowdown')
+            logger.info(f'Simulaton needs to support conversion to VHDL -> slowdown until types are stable '
+                        f'({PyhaFunc.discovery_stable_calls} calls)')
             model._pyha_enable_function_profiling_for_types()
 
         model._pyha_floats_to_fixed()
-        if hasattr(model, '_pyha_simulation_input_callback'):
-            args = model._pyha_simulation_input_callback(args)
-        else:
-            args = convert_input_types(args, input_types)
-            args = transpose(args)
-
-
-        delay_compensate = 0
-        if pipeline_flush == 'self.DELAY':
-            with suppress(AttributeError):
-                delay_compensate = model.DELAY
-
-            # duplicate input args to flush pipeline
-            target_len = len(args) + delay_compensate
-            args += args * int(np.ceil(delay_compensate / len(args)))
-            args = args[:target_len]
-
-        logger.info(f'Running "HARDWARE" simulation...')
-        ret = []
-        valid_samples = 0
-        with SimulationRunning.enable():
-            with RegisterBehaviour.enable():
-                with AutoResize.enable():
-                    for input in tqdm(args, file=sys.stderr):
-                        returns = model.main(*input)
-                        returns = pyha_to_python(returns)
-                        if returns is not None:
-                            valid_samples += 1
-                            ret.append(returns)
-                        model._pyha_update_registers()
-
-                    if pipeline_flush == 'auto' and valid_samples != len(out['MODEL']):
-                        args = list(args)
-                        logger.info(
-                            f'Flushing the pipeline to collect {len(out["MODEL"])} valid samples (currently have {valid_samples})')
-                        hardware_delay = 0
-                        while valid_samples != len(out["MODEL"]):
-                            hardware_delay += 1
-                            returns = model.main(*args[-1])
-                            returns = pyha_to_python(returns)
+        if profile:
+            Profiler.start(model, memory=profile == 'memory')
+        try:
+            with Profiler.phase('input conversion'):
+                if hasattr(model, '_pyha_simulation_input_callback'):
+                    args = model._pyha_simulation_input_callback(args)
+                else:
+                    args = convert_input_types(args, input_types)
+                    args = transpose(args)
+
+
+            delay_compensate = 0
+            if pipeline_flush == 'self.DELAY':
+                with suppress(AttributeError):
+                    delay_compensate = model.DELAY
+
+                # duplicate input args to flush pipeline
+                target_len = len(args) + delay_compensate
+                args += args * int(np.ceil(delay_compensate / len(args)))
+                args = args[:target_len]
+
+            logger.info(f'Running "HARDWARE" simulation...')
+            ret = []
+            valid_samples = 0
+            with SimulationRunning.enable():
+                with RegisterBehaviour.enable():
+                    with AutoResize.enable():
+                        codegen = None
+                        if backend == 'codegen':
+                            if profile:
+                                logger.warning('Codegen backend cannot be profiled -> using interpreter')
+                            elif codegen_supported(model):
+                                codegen = CodegenBackend(model)
+                            else:
+                                logger.warning('Codegen backend does not support type discovery -> using interpreter')
+                        if waveform is not None:
+                            waveform.start(model)  # after codegen, port probes wrap the generated methods
+                        main = model.main
+                        update_registers = model._pyha_update_registers if codegen is None else codegen.update_registers
+                        # codegen assigns registers directly, idle state cannot be detected
+                        idle = FastForward(model) if fast_forward and codegen is None else None
+                        output_phase = Profiler.phase('output conversion')
+                        update_phase = Profiler.phase('register update')
+
+                        for cycle, input in enumerate(tqdm(args, file=sys.stderr)):
+                            Telemetry.cycle = cycle
+                            if idle is not None and idle.skip(input):
+                                if waveform is not None:
+                                    waveform.sample()
+                                continue
+                            returns = main(*input)
+                            if waveform is not None:
+                                waveform.sample()
+                            with output_phase:
+                                returns = pyha_to_python(returns)
                             if returns is not None:
                                 valid_samples += 1
                                 ret.append(returns)
-                            model._pyha_update_registers()
-                            args.append(
-                                args[-1])  # collect samples needed to flush the system, so RTL and GATE sims work also!
-                        logger.info(f'Flush took {hardware_delay} cycles.')
-
-        out['HARDWARE'] = process_outputs(delay_compensate, ret)
+                            if idle is not None:
+                                idle.check(input, returns)
+                            with update_phase:
+                                update_registers()
+
+                        if idle is not None:
+                            logger.info(f'Fast-forwarded {idle.skipped} idle cycles')
+
+                        if pipeline_flush == 'auto' and valid_samples != len(out['MODEL']):
+                            args = list(args)
+                            logger.info(
+                                f'Flushing the pipeline to collect {len(out["MODEL"])} valid samples (currently have {valid_samples})')
+                            hardware_delay = 0
+                            while valid_samples != len(out["MODEL"]):
+                                hardware_delay += 1
+                                Telemetry.cycle = len(args)
+                                returns = main(*args[-1])
+                                if waveform is not None:
+                                    waveform.sample()
+                                with output_phase:
+                                    returns = pyha_to_python(returns)
+                                if returns is not None:
+                                    valid_samples += 1
+                                    ret.append(returns)
+                                with update_phase:
+                                    update_registers()
+                                args.append(
+                                    args[-1])  # collect samples needed to flush the system, so RTL and GATE sims work also!
+                            logger.info(f'Flush took {hardware_delay} cycles.')
+
+                        if waveform is not None:
+                            waveform.stop()
+                        if codegen is not None:
+                            codegen.uninstall()
+
+            Telemetry.cycle = None
+            with output_phase:
+                out['HARDWARE'] = process_outputs(delay_compensate, ret)
+        finally:
+            if profile:
+                Profiler.stop()
+        if profile:
+            out.profile = Profiler.report()
+            logger.info(f'"HARDWARE" simulation profile:\n{out.profile}')
         logger.info(f'OK!')
 
     if 'RTL' in simulations or 'NETLIST' in simulations or conversion_path is not None:
@@ -324,29 +416,19 @@ def simulate(model, *args, simulations=None, conversion_path=None, input_types=N
         out['NETLIST'] = process_outputs(delay_compensate, ret)
         logger.info(f'OK!')
 
+    out.overflows = Telemetry.report()
+    Telemetry.hook = None
+    if len(out.overflows):
+        logger.warning(f'Overflows during simulation:\n{out.overflows}')
+
     logger.info('Simulations completed!')
     return out
 
 
-def run_ghdl_cocotb(*inputs, converter=None, netlist=None, verbose=False):
-    """ RTL simulator with GHDL and COCOTB. This requires that MODEL and PYHA simulations already ran.
-    Inputs to the simulator are 'pipeline compensated' from PYHA simulation.
-    """
-    indata = []
-    for arguments in inputs:
-        if len(arguments) == 1:
-            l = [init_vhdl_type('-', arguments[0], arguments[0])._pyha_serialize()]
-        else:
-            l = [init_vhdl_type('-', arg, arg)._pyha_serialize() for arg in arguments]
-        indata.append(l)
-
-    np.save(str(converter.base_path / 'input.npy'), indata)
-
-    # make sure output file does not exist
-    out_path = str(converter.base_path / 'output.npy')
-    if os.path.exists(out_path):
-        os.remove(out_path)
-
+def get_cocotb_command(converter, netlist=None, output_stream=False, state_cycles=0):
+    """ Shell command that runs the GHDL + COCOTB testbench (docker) on 'input.npy' in the conversion directory.
+    With ``output_stream`` outputs are written to 'output.txt' line by line instead of collecting into 'output.npy'.
+    ``state_cycles`` saves the 'state' port (``Converter(state_output=True)``) of the last cycles to 'state.npy'. """
     if netlist:
         src = '.' + netlist[len(str(converter.base_path)):]  # need relative path!
         ghdl_args = '-P/quartus_sim_lib/ --ieee=synopsys --no-vital-checks'
@@ -360,10 +442,49 @@ def run_ghdl_cocotb(*inputs, converter=None, netlist=None, verbose=False):
           f"VHDL_SOURCES=\"{src}\" " \
           f"OUTPUT_VARIABLES=\"{str(len(converter.get_top_module_outputs()))}\" " \
           f"GHDL_ARGS=\"{ghdl_args}\" "
+    if output_stream:
+        cmd += 'OUTPUT_STREAM=1 '
+    if state_cycles:
+        cmd += f'STATE_CYCLES={state_cycles} '
+    return cmd
+
+
+def run_cocotb(converter, netlist=None, output_stream=False, state_cycles=0):
+    """ Runs the testbench of ``get_cocotb_command``. RTL simulations use local GHDL if ``PYHA_GHDL`` environment
+    variable is set (see ``pyha.simulation.ghdl``), else docker. """
+    if 'PYHA_GHDL' in os.environ and not netlist:
+        LocalGHDL(converter).run(output_stream=output_stream, state_cycles=state_cycles)
+    else:
+        subprocess.run(get_cocotb_command(converter, netlist, output_stream, state_cycles), shell=True)
+
+
+def write_cocotb_inputs(inputs, path):
+    """ Serialize the hardware inputs of each cycle to 'input.npy' in ``path``, read by the COCOTB testbench """
+    indata = []
+    for arguments in inputs:
+        if len(arguments) == 1:
+            l = [init_vhdl_type('-', arguments[0], arguments[0])._pyha_serialize()]
+        else:
+            l = [init_vhdl_type('-', arg, arg)._pyha_serialize() for arg in arguments]
+        indata.append(l)
+
+    np.save(str(Path(path) / 'input.npy'), indata)
+
+
+def run_ghdl_cocotb(*inputs, converter=None, netlist=None, verbose=False):
+    """ RTL simulator with GHDL and COCOTB. This requires that MODEL and PYHA simulations already ran.
+    Inputs to the simulator are 'pipeline compensated' from PYHA simulation.
+    """
+    write_cocotb_inputs(inputs, converter.base_path)
+
+    # make sure output file does not exist
+    out_path = str(converter.base_path / 'output.npy')
+    if os.path.exists(out_path):
+        os.remove(out_path)
 
     with pipes(stdout=sys.stdout if verbose else None, stderr=sys.stderr):
         # Weirdness: running in Pycharm 'pytest -s' gets somehow stuck in wurlizer...
-        subprocess.run(cmd, shell=True)
+        run_cocotb(converter, netlist)
 
     print('\n', file=sys.stderr)
 
@@ -401,17 +522,26 @@ def assert_simulations_equal(simulations, rtol=1e-05, atol=1e-30):
     :param simulations: Output of 'simulate' function
     :param rtol: 1e-1 = 10% accuracy, 1e-2= 1% accuracy...
     :param atol: Tune this when numbers close to 0 are failing assertions. Default assumes that inputs are in range of [-1,1] and 18 bits.
+
+    Tolerance is same as for ``numpy.testing.assert_allclose``: ``abs(actual - expected) <= atol + rtol * abs(expected)``.
     """
-    from numpy.testing import assert_allclose
+    checks = []
     if 'MODEL' in simulations and 'HARDWARE' in simulations:
-        assert_allclose(simulations['HARDWARE'], simulations['MODEL'], rtol, atol)
+        checks.append(('HARDWARE', 'MODEL', rtol, atol))
 
     # hardware simulations must be EXACTLY equal
-    if 'RTL' in simulations:
-        assert_allclose(simulations['RTL'], simulations['HARDWARE'], rtol=1e-32, atol=1e-32)
+    checks += [(name, 'HARDWARE', 1e-32, 1e-32) for name in ['RTL', 'NETLIST'] if name in simulations]
 
-    if 'NETLIST' in simulations:
-        assert_allclose(simulations['NETLIST'], simulations['HARDWARE'], rtol=1e-32, atol=1e-32)
+    columns = {}
+    failed = []
+    for name, expected, rtol, atol in checks:
+        for x in [name, expected]:
+            if x not in columns:
+                columns[x] = to_columns(simulations[x])
+        result = compare(f'{name} vs {expected}', columns[name], columns[expected], rtol, atol, close=allclose)
+        if not result.ok:
+            failed.append(result)
+    assert not failed, '\n'.join(repr(x) for x in failed)
 
 
 def hardware_sims_equal(simulation_results):
@@ -442,32 +572,16 @@ def sims_close(simulation_results, expected=None, rtol=1e-04, atol=(2 ** -17) *
     """
     logger.info(f'sims_close(rtol={rtol}, atol={atol})')
     if expected is None:
-        if 'MODEL' in simulation_results.keys():
-            expected = simulation_results['MODEL']
-            logger.info(f'Using "MODEL" as golden output')
-        elif 'MODEL_PYHA' in simulation_results.keys():
-            expected = simulation_results['MODEL_PYHA']
-            logger.info(f'Using "MODEL_PYHA" as golden output')
-        else:
-            expected = simulation_results['HARDWARE']
-            logger.info(f'Using "HARDWARE" as golden output')
-
-    expected = np_to_py(get_iterable(expected))[skip_first_n:]
-
-    expected = init_vhdl_type('root', expected, expected)
-    result = True
-    for sim_name, sim_data in simulation_results.items():
-        sim_data = get_iterable(sim_data)
-        sim_data = sim_data[skip_first_n:]
-        sim_data = init_vhdl_type(sim_name, sim_data, sim_data)
-        eq = sim_data._pyha_is_equal(expected, sim_name, rtol, atol)
-        if eq:
-            logger.info(f'{sim_name} OK!')
+        logger.info(f'Using "{golden_output(simulation_results)}" as golden output')
+
+    report = compare_simulations(simulation_results, expected, rtol, atol, skip_first_n)
+    for result in report.values():
+        if result.ok:
+            logger.info(result)
         else:
-            logger.info(f'{sim_name} FAILED!')
-            result = False
+            logger.error(result)
 
-    return result
+    return report.ok
 
 
     # if expected is None:
@@ -0,0 +1,310 @@
+""" Persistent 'HARDWARE' simulation: design state is kept between ``run`` calls and can be saved/restored. """
+import logging
+import pickle
+import types
+from contextlib import suppress
+from copy import deepcopy
+
+from pyha.common.context_managers import RegisterBehaviour, SimulationRunning, AutoResize
+from pyha.common.core import Hardware, PyhaList, PyhaFunc, DirtyRegisters
+from pyha.common.telemetry import Telemetry
+from pyha.simulation.codegen import CodegenBackend, is_supported as codegen_supported
+from pyha.simulation.fast_forward import FastForward
+from pyha.simulation.simulation_interface import convert_input_types, transpose, process_outputs, pyha_to_python, \
+    SimulationResults, assert_simulations_equal
+from pyha.simulation.tracer import Tracer
+from pyha.simulation.waveform import PortProbe
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('sim')
+
+
+def get_state(obj):
+    """ Register state of the design (or part of it): current values and the ``_pyha_next`` shadows.
+    Result holds no references to the design. """
+    if isinstance(obj, Hardware):
+        state = {}
+        for k, v in obj.__dict__.items():
+            if k.startswith('_pyha') or isinstance(v, (PyhaFunc, Tracer, PortProbe, types.MethodType, types.FunctionType)):
+                continue
+            state[k] = get_state(v)
+        if '_pyha_next' in obj.__dict__:
+            state['_pyha_next'] = deepcopy(obj._pyha_next)
+        return state
+
+    if isinstance(obj, PyhaList):
+        state = {'data': [get_state(x) for x in obj.data]}
+        if hasattr(obj, '_pyha_next'):
+            state['_pyha_next'] = deepcopy(obj._pyha_next)
+        return state
+
+    return deepcopy(obj)
+
+
+def set_state(obj, state):
+    """ Inverse of ``get_state``, ``obj`` must be built the same way as the design the state was taken from """
+    if isinstance(obj, Hardware):
+        for k, v in state.items():
+            if k == '_pyha_next':
+                # update in place, generated code (codegen backend) holds references to this dict
+                obj._pyha_next.clear()
+                obj._pyha_next.update(deepcopy(v))
+            elif isinstance(obj.__dict__.get(k), (Hardware, PyhaList)):
+                set_state(obj.__dict__[k], v)
+            else:
+                obj.__dict__[k] = deepcopy(v)
+        return
+
+    # PyhaList
+    if obj.data and isinstance(obj.data[0], Hardware):
+        for x, s in zip(obj.data, state['data']):
+            set_state(x, s)
+    else:
+        obj.data = deepcopy(state['data'])
+    if '_pyha_next' in state:
+        obj._pyha_next = deepcopy(state['_pyha_next'])
+
+
+def share_model_tracers(obj, reference):
+    """ 'model' tracers of ``obj`` are replaced with the ones of its copy ``reference``, that runs the 'MODEL' """
+    for k, v in obj.__dict__.items():
+        if k.startswith('_pyha'):
+            continue
+        if k == 'model' and isinstance(v, Tracer):
+            tracer = reference.__dict__[k]
+            tracer.owner = obj
+            obj.__dict__[k] = tracer
+        elif isinstance(v, Hardware):
+            share_model_tracers(v, reference.__dict__[k])
+        elif isinstance(v, PyhaList):
+            for x, ref in zip(v.data, reference.__dict__[k].data):
+                if isinstance(x, Hardware):
+                    share_model_tracers(x, ref)
+
+
+def cut(checkpointed_list):
+    """ ``(list, length)`` of checkpoint with only the checkpointed items in the list """
+    lst, length = checkpointed_list
+    return lst[:length], length
+
+
+def truncated(checkpointed_list):
+    """ Copy of the list as it was at the checkpoint """
+    lst, length = checkpointed_list
+    return lst[:length]
+
+
+class Simulator:
+    """
+    'HARDWARE' simulation that can be continued: each ``run`` feeds more inputs to the same design state.
+    Register state can be checkpointed to memory or disk and restored later, for example to resume long runs or to
+    branch many experiments from one warmed-up state.
+
+    :param model: Object derived from ``Hardware``.
+    :param input_types: Force inputs types, default for floats is Sfix[0:-17].
+    :param pipeline_flush: 'self.DELAY' drops the first ``model.DELAY`` outputs, ``flush`` pushes the remaining ones
+                           out. None disables this.
+    :param trace: Insert tracers (same as ``simulate(trace=True)``).
+    :param backend: 'interpreter' or 'codegen', see ``simulate``.
+    :param fast_forward: Skip idle invalid input cycles, see ``simulate``.
+    :param waveform: ``WaveformRecorder``, records every cycle of all runs. ``waveform.stop()`` ends the recording,
+                     on-disk recording can be loaded any time.
+
+    >>> sim = Simulator(dut, trace=True).run(input_signal[:1024])
+    >>> checkpoint = sim.checkpoint()
+    >>> sim.run(input_signal[1024:]).assert_equal(rtol=1e-3, atol=1e-3)
+    >>> sim.restore(checkpoint)  # back to state after first 1024 samples
+    >>> sim.save('warm.pkl')
+    """
+
+    def __init__(self, model, input_types=None, pipeline_flush='self.DELAY', trace=False, backend='interpreter',
+                 fast_forward=False, waveform=None):
+        self.model = model
+        self.input_types = input_types
+        self.backend = backend
+        self.fast_forward = fast_forward
+        self.waveform = waveform
+
+        self.delay = 0
+        if pipeline_flush == 'self.DELAY':
+            with suppress(AttributeError):
+                self.delay = model.DELAY
+
+        if trace:
+            Tracer.traced_objects.clear()
+            model._pyha_insert_tracer(label='self')
+
+        self.reference = None
+        if hasattr(model, 'model'):
+            # 'MODEL' runs on a copy, '_pyha_floats_to_fixed' below changes the design
+            with SimulationRunning.enable():
+                self.reference = deepcopy(model)
+            if trace:
+                share_model_tracers(model, self.reference)
+
+        Telemetry.reset()
+        DirtyRegisters.reset()
+        model._pyha_floats_to_fixed()
+        if waveform is not None:
+            waveform.start(model)
+
+        self.cycle = 0
+        self.skip = self.delay  # initial pipeline outputs to drop
+        self.flush_inputs = []  # first inputs of the simulation, replayed by 'flush'
+        self.outputs = []
+        self.model_inputs = None  # inputs are collected for the 'MODEL' simulation
+        self.flushed = False
+        self.skipped_cycles = 0  # by 'fast_forward'
+
+    def convert_inputs(self, args):
+        """ Python inputs (a list for each argument of 'main') to list of hardware inputs for each cycle """
+        if hasattr(self.model, '_pyha_simulation_input_callback'):
+            # inputs are only read, creating them as local objects skips the costly register setup
+            with SimulationRunning.enable():
+                return list(self.model._pyha_simulation_input_callback(args))
+        args = convert_input_types(args, self.input_types, silence=self.cycle != 0)
+        return transpose(args)
+
+    def simulate_cycles(self, cycles):
+        """ Run the design for each of the (converted) ``cycles``, returns the valid outputs """
+        if self.flushed:
+            raise Exception('Simulator is flushed, restore a checkpoint to continue')
+        if len(self.flush_inputs) < self.delay:
+            self.flush_inputs += cycles[:self.delay - len(self.flush_inputs)]
+
+        ret = []
+        with SimulationRunning.enable():
+            with RegisterBehaviour.enable():
+                with AutoResize.enable():
+                    codegen = None
+                    if self.backend == 'codegen':
+                        if codegen_supported(self.model):
+                            codegen = CodegenBackend(self.model)
+                        else:
+                            logger.warning('Codegen backend does not support type discovery -> using interpreter')
+                    main = self.model.main
+                    update_registers = self.model._pyha_update_registers if codegen is None \
+                        else codegen.update_registers
+                    idle = FastForward(self.model) if self.fast_forward and codegen is None else None
+
+                    for input in cycles:
+                        Telemetry.cycle = self.cycle
+                        self.cycle += 1
+                        if idle is not None and idle.skip(input):
+                            if self.waveform is not None:
+                                self.waveform.sample()
+                            continue
+                        returns = main(*input)
+                        if self.waveform is not None:
+                            self.waveform.sample()
+                        returns = pyha_to_python(returns)
+                        if idle is not None:
+                            idle.check(input, returns)
+                        update_registers()
+                        if returns is None:
+                            continue
+                        if self.skip:
+                            self.skip -= 1
+                            continue
+                        ret.append(returns)
+
+                    if idle is not None:
+                        self.skipped_cycles += idle.skipped
+                    if codegen is not None:
+                        codegen.uninstall()
+        Telemetry.cycle = None
+        return ret
+
+    def run(self, *args):
+        """ Simulate more inputs (a list for each argument of 'main'), returns ``self`` """
+        if self.reference is not None:
+            if self.model_inputs is None:
+                self.model_inputs = [[] for _ in args]
+            for collected, arg in zip(self.model_inputs, args):
+                collected.extend(arg)
+
+        self.outputs += self.simulate_cycles(self.convert_inputs(args))
+        return self
+
+    def flush_cycles(self):
+        """ Inputs that push out the last ``model.DELAY`` outputs, the first inputs are repeated """
+        if not self.delay or not self.flush_inputs:
+            return []
+        flush = self.flush_inputs * (self.delay // len(self.flush_inputs) + 1)
+        return flush[:self.delay]
+
+    def flush(self):
+        """ Flush the pipeline (see ``flush_cycles``). Ends the simulation. """
+        self.outputs += self.simulate_cycles(self.flush_cycles())
+        self.flushed = True
+        return self
+
+    @property
+    def hardware(self):
+        """ Outputs so far, same format as ``simulate(...)['HARDWARE']`` """
+        return process_outputs(0, self.outputs)
+
+    @property
+    def results(self):
+        """ ``SimulationResults`` with 'HARDWARE' and 'MODEL' (if model has ``model`` function) of all inputs so far """
+        out = SimulationResults()
+        if self.model_inputs is not None:
+            r = self.reference.model(*self.model_inputs)
+            with suppress(AttributeError):
+                if r.size != 1:
+                    r = r.squeeze()
+            out['MODEL'] = list(r) if isinstance(r, tuple) else r
+        out['HARDWARE'] = self.hardware
+        out.overflows = Telemetry.report()
+        return out
+
+    def assert_equal(self, rtol=1e-05, atol=1e-30):
+        """ ``assert_simulations_equal`` on ``results``, 'MODEL' is cut to the length of 'HARDWARE' if not flushed """
+        results = self.results
+        if 'MODEL' in results and not self.flushed:
+            model = results['MODEL']
+            n = len(self.outputs)
+            results['MODEL'] = [x[:n] for x in model] if isinstance(model, list) else model[:n]
+        assert_simulations_equal(results, rtol, atol)
+        return self
+
+    def checkpoint(self):
+        """ Snapshot of the registers and simulator progress, holds no references to the design.
+        Inputs and outputs are not copied: these lists only grow, so checkpoint keeps the list and its current length
+        and ``restore`` continues from that prefix. """
+        return {'registers': get_state(self.model),
+                'cycle': self.cycle,
+                'skip': self.skip,
+                'flushed': self.flushed,
+                'flush_inputs': (self.flush_inputs, len(self.flush_inputs)),
+                'outputs': (self.outputs, len(self.outputs)),
+                'model_inputs': None if self.model_inputs is None else [(x, len(x)) for x in self.model_inputs]}
+
+    def restore(self, checkpoint):
+        """ Return to the ``checkpoint`` state, can be restored many times. Also works for a new instance of the
+        design (e.g. after crash) if it is constructed with the same arguments. Returns ``self``. """
+        if isinstance(checkpoint, str):
+            with open(checkpoint, 'rb') as f:
+                checkpoint = pickle.load(f)
+
+        set_state(self.model, checkpoint['registers'])
+        self.cycle = checkpoint['cycle']
+        self.skip = checkpoint['skip']
+        self.flushed = checkpoint['flushed']
+        # new lists, the old ones may still be used by other checkpoints
+        self.flush_inputs = truncated(checkpoint['flush_inputs'])
+        self.outputs = truncated(checkpoint['outputs'])
+        self.model_inputs = None if checkpoint['model_inputs'] is None \
+            else [truncated(x) for x in checkpoint['model_inputs']]
+        return self
+
+    def save(self, path):
+        """ Write ``checkpoint`` to disk, use ``restore(path)`` to load """
+        checkpoint = self.checkpoint()
+        for k in ['flush_inputs', 'outputs']:
+            checkpoint[k] = cut(checkpoint[k])
+        if checkpoint['model_inputs'] is not None:
+            checkpoint['model_inputs'] = [cut(x) for x in checkpoint['model_inputs']]
+        with open(path, 'wb') as f:
+            pickle.dump(checkpoint, f)
+        return self
@@ -0,0 +1,175 @@
+""" Streaming simulation: inputs are consumed from iterables in chunks and outputs are produced in chunks,
+so memory usage does not depend on the length of the input (e.g. long SDR captures). """
+import logging
+import os
+import sys
+from contextlib import suppress
+from itertools import islice
+from pathlib import Path
+import tempfile
+
+import numpy as np
+from wurlitzer import pipes
+
+from pyha.conversion.conversion import Converter
+from pyha.conversion.type_transforms import init_vhdl_type
+from pyha.simulation.simulation_interface import process_outputs, run_cocotb
+from pyha.simulation.simulator import Simulator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger('sim')
+
+
+def iter_samples(source):
+    """ Samples of one input, ``source`` is any iterable of samples or of chunks (lists/NumPy arrays) of samples """
+    for item in source:
+        if isinstance(item, (list, np.ndarray)) and np.ndim(item) > 0:
+            yield from item
+        else:
+            yield item
+
+
+class SerializedInputs:
+    """ Appends serialized (bit-string) inputs of each cycle to a raw file, ``finalize`` turns it into 'input.npy'
+    for the COCOTB testbench. """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.raw_path = self.path / 'input.raw'
+        self.file = open(self.raw_path, 'wb')
+        self.dtype = None
+        self.rows = 0
+        self.columns = 0
+
+    def append(self, cycles):
+        rows = [[init_vhdl_type('-', arg, arg)._pyha_serialize() for arg in cycle] for cycle in cycles]
+        if not rows:
+            return
+        if self.dtype is None:
+            self.columns = len(rows[0])
+            self.dtype = np.dtype(f'<U{max(len(x) for row in rows for x in row)}')
+        data = np.array(rows, dtype=self.dtype)
+        if any(len(x) != self.dtype.itemsize // 4 for x in data.ravel()):
+            raise Exception('Serialized input width changed during the stream, RTL simulation needs fixed types')
+        data.tofile(self.file)
+        self.rows += len(rows)
+
+    def finalize(self):
+        """ Write 'input.npy' in chunks, never loads the whole stream """
+        self.file.close()
+        out = np.lib.format.open_memmap(str(self.path / 'input.npy'), mode='w+', dtype=self.dtype,
+                                        shape=(self.rows, self.columns))
+        raw = np.memmap(self.raw_path, dtype=self.dtype, mode='r', shape=(self.rows, self.columns))
+        chunk = 1 << 16
+        for start in range(0, self.rows, chunk):
+            out[start:start + chunk] = raw[start:start + chunk]
+        out.flush()
+        del out, raw
+        os.remove(self.raw_path)
+
+
+def run_ghdl_cocotb_stream(converter, delay_compensate=0, chunk_size=4096, verbose=False):
+    """ Runs the RTL simulation on the 'input.npy' written by ``SerializedInputs``, yields chunks of outputs """
+    out_path = converter.base_path / 'output.txt'
+    with suppress(FileNotFoundError):
+        os.remove(out_path)
+
+    with pipes(stdout=sys.stdout if verbose else None, stderr=sys.stderr):
+        run_cocotb(converter, output_stream=True)
+
+    outputs = converter.get_top_module_outputs()
+    skip = delay_compensate
+    ret = []
+    with open(out_path) as f:
+        for line in f:
+            values = [out._pyha_deserialize(x) for out, x in zip(outputs, line.split())]
+            values = tuple(values) if len(values) > 1 else values[0]
+            if values is None:
+                continue  # invalid packets
+            if skip:
+                skip -= 1
+                continue
+            ret.append(values)
+            if len(ret) == chunk_size:
+                yield process_outputs(0, ret)
+                ret = []
+    if ret:
+        yield process_outputs(0, ret)
+
+
+def stream(model, inputs, chunk_size, input_types, pipeline_flush, rtl, conversion_path):
+    temporary = None
+    if rtl:
+        model._pyha_enable_function_profiling_for_types()
+        if conversion_path is None:
+            temporary = tempfile.TemporaryDirectory()  # removed when the generator finishes or is closed
+            conversion_path = temporary.name
+        Path(conversion_path).mkdir(parents=True, exist_ok=True)
+        serialized = SerializedInputs(conversion_path)
+    sim = Simulator(model, input_types=input_types, pipeline_flush=pipeline_flush)
+
+    def run(cycles):
+        if rtl:
+            serialized.append(cycles)
+        return process_outputs(0, sim.simulate_cycles(cycles))
+
+    try:
+        rows = zip(*[iter_samples(x) for x in inputs])
+        while True:
+            raw = list(islice(rows, chunk_size))
+            if not raw:
+                break
+            yield 'HARDWARE', run(sim.convert_inputs(tuple(list(x) for x in zip(*raw))))
+
+        flush = sim.flush_cycles()
+        if flush:
+            yield 'HARDWARE', run(flush)
+
+        if rtl:
+            serialized.finalize()
+            converter = Converter(model, output_dir=conversion_path).to_vhdl()
+            for chunk in run_ghdl_cocotb_stream(converter, sim.delay, chunk_size):
+                yield 'RTL', chunk
+    finally:
+        if rtl:
+            serialized.file.close()
+        if temporary is not None:
+            temporary.cleanup()
+
+
+def simulate_stream(model, *inputs, chunk_size=4096, input_types=None, pipeline_flush='self.DELAY', sink=None,
+                    rtl=False, conversion_path=None):
+    """
+    Streaming 'HARDWARE' (and optionally 'RTL') simulation with bounded memory usage.
+
+    :param model: Object derived from ``Hardware``.
+    :param inputs: Inputs to the 'main' function, each can be any iterable (generator, file reader...) of samples or
+                   of sample chunks (lists or NumPy arrays). Packet (2D) inputs are not supported.
+    :param chunk_size: Number of cycles simulated per chunk.
+    :param input_types: Force inputs types, default for floats is Sfix[0:-17].
+    :param pipeline_flush: Same as for ``simulate``, except 'auto' (no MODEL simulation to compare against).
+    :param sink: Called with ``(simulation_name, chunk)`` for every output chunk, instead of returning them.
+    :param rtl: Also run the 'RTL' simulation on the same stream, after the 'HARDWARE' simulation ends.
+                Inputs are recorded to ``conversion_path`` on disk, not in memory.
+    :param conversion_path: Where the VHDL sources and recorded inputs are written, default is temporary directory
+                            (removed when the stream ends or the generator is closed).
+    :returns: Generator of ``(simulation_name, chunk)``, chunk is a list of outputs in same format as ``simulate`` gives.
+              If ``sink`` is used, returns the number of chunks instead.
+              ``pyha.common.telemetry.Telemetry.report()`` has the overflows once the stream is consumed.
+
+    >>> for name, chunk in simulate_stream(dut, load_iq_chunks('capture.raw'), chunk_size=1 << 16):
+    ...     out_file.write(np.array(chunk).tobytes())
+    """
+    if rtl and 'PYHA_SKIP_RTL' in os.environ:
+        logger.warning('SKIPPING **RTL** simulations -> "PYHA_SKIP_RTL" environment variable is set')
+        rtl = False
+
+    chunks = stream(model, inputs, chunk_size, input_types, pipeline_flush, rtl, conversion_path)
+    if sink is None:
+        return chunks
+
+    count = 0
+    for name, chunk in chunks:
+        sink(name, chunk)
+        count += 1
+    return count
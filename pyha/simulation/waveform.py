@@ -0,0 +1,382 @@
+""" Waveform recording of the 'HARDWARE' simulation.
+
+Selected registers and ports (arguments and return values of methods) of any part of the design are sampled once per
+cycle into preallocated NumPy columns. Fixed-point values are stored as their raw integers, so the recording is
+bit-exact. Full chunks are appended to an on-disk columnar file (one raw file per column and a 'waveform.json'
+manifest), thus memory usage is bounded by ``chunk_size`` no matter how long the simulation runs.
+
+>>> recorder = WaveformRecorder(['self.dc_removal', 'self.fft.main'], path='run.wave')
+>>> simulate(dut, x, simulations=['HARDWARE'], waveform=recorder)
+>>> Waveform.load('run.wave').to_vcd('run.vcd')  # open with GTKWave etc.
+"""
+import json
+import re
+from enum import Enum
+from pathlib import Path
+
+import numpy as np
+
+from pyha.common.complex import Complex
+from pyha.common.core import Hardware, PyhaList
+from pyha.common.datavalid import DataValid
+from pyha.common.fixed_point import Sfix
+from pyha.common.util import is_constant
+
+MANIFEST = 'waveform.json'
+DTYPES = {'fixed': np.int64, 'int': np.int64, 'bool': np.uint8, 'real': np.float64}
+
+
+class Column:
+    """ One recorded scalar value stream.
+
+    :param kind: 'fixed' (raw integer of fixed-point ``[left:right]``), 'int', 'bool' or 'real'
+    :param get: Returns the value to record, called once per cycle.
+    """
+
+    def __init__(self, name, kind, get, left=None, right=None, signed=True):
+        self.name = name
+        self.kind = kind
+        self.get = get
+        self.left = left
+        self.right = right
+        self.signed = signed
+        self.buffer = None
+
+    @property
+    def width(self):
+        if self.kind == 'fixed':
+            return self.left - self.right + (1 if self.signed else 0)
+        return {'int': 64, 'bool': 1, 'real': 64}[self.kind]
+
+    def meta(self, file):
+        return {'name': self.name, 'kind': self.kind, 'left': self.left, 'right': self.right, 'signed': self.signed,
+                'width': self.width, 'file': file}
+
+
+def sfix_raw(get, scale):
+    def raw():
+        x = get()
+        return x.fix if x.fix is not None else round(x.val * scale)  # lazy bounds are float backed
+
+    return raw
+
+
+def complex_raw(get, scale, part):
+    """ ``Complex`` keeps the quantized value as float, that is a whole number of LSB's """
+
+    def raw():
+        return round(getattr(get().val, part) * scale)
+
+    return raw
+
+
+def value_columns(name, value, get, strict=True):
+    """ Columns that record ``value`` (as returned by ``get``), non-strict mode skips unsupported types """
+    if isinstance(value, DataValid):
+        return value_columns(f'{name}.data', value.data, lambda: get().data, strict) \
+               + value_columns(f'{name}.valid', value.valid, lambda: get().valid, strict)
+    if isinstance(value, Complex):
+        fmt = value.fmt
+        if fmt.int_ok and fmt.left - fmt.right <= 52:  # float value is exact
+            return [Column(f'{name}.{part}', 'fixed', complex_raw(get, 2.0 ** -fmt.right, part), fmt.left, fmt.right,
+                           fmt.signed) for part in ('real', 'imag')]
+        return [Column(f'{name}.real', 'real', lambda: float(get().val.real)),
+                Column(f'{name}.imag', 'real', lambda: float(get().val.imag))]
+    if isinstance(value, Sfix):
+        fmt = value.fmt
+        if fmt.int_ok and fmt.left - fmt.right <= 62:
+            return [Column(name, 'fixed', sfix_raw(get, 2.0 ** -fmt.right), fmt.left, fmt.right, fmt.signed)]
+        return [Column(name, 'real', lambda: float(get().val))]
+    if isinstance(value, (bool, np.bool_)):
+        return [Column(name, 'bool', get)]
+    if isinstance(value, Enum):
+        return [Column(name, 'int', lambda: get().value)] if isinstance(value.value, int) else []
+    if isinstance(value, (int, np.integer)):
+        return [Column(name, 'int', get)]
+    if isinstance(value, (float, np.floating)):
+        return [Column(name, 'real', get)]
+    if strict:
+        raise TypeError(f'Cannot record "{name}" of type {type(value).__name__}')
+    return []
+
+
+def is_method(obj, name):
+    """ Methods can be replaced by wrappers (``PyhaFunc``, ``Tracer``...) in the instance ``__dict__`` """
+    return callable(getattr(type(obj), name, None))
+
+
+def register_columns(obj, name):
+    """ Columns for all registers of ``obj`` (and its submodules) """
+    ret = []
+    for k, v in obj.__dict__.items():
+        if k.startswith('_pyha') or is_constant(k) or is_method(obj, k):
+            continue
+        if isinstance(v, Hardware):
+            ret += register_columns(v, f'{name}.{k}')
+        elif isinstance(v, PyhaList):
+            for i in range(len(v.data)):
+                elem_name = f'{name}.{k}[{i}]'
+                if isinstance(v.data[i], Hardware):
+                    ret += register_columns(v.data[i], elem_name)
+                else:
+                    ret += value_columns(elem_name, v.data[i], lambda v=v, i=i: v.data[i], strict=False)
+        else:
+            ret += value_columns(f'{name}.{k}', v, lambda obj=obj, k=k: obj.__dict__[k], strict=False)
+    return ret
+
+
+def resolve(model, path):
+    """ Object (and its owner, attribute name) at ``path``, for example 'self.fft.stages[0].main' """
+    parts = re.findall(r'\.?([A-Za-z_]\w*)|\[(\d+)\]', path)
+    if not parts or parts[0][0] != 'self':
+        raise ValueError(f'Signal path must start with "self": {path}')
+    owner, attr, obj = None, None, model
+    for name, index in parts[1:]:
+        owner, attr = obj, name or None
+        try:
+            obj = getattr(obj, name) if name else obj[int(index)]
+        except (AttributeError, IndexError) as e:
+            raise ValueError(f'No signal "{path}" in the design') from e
+    return owner, attr, obj
+
+
+class PortProbe:
+    """ Replaces a method in the instance ``__dict__``, keeps the arguments and returns of the last call """
+
+    def __init__(self, recorder, name, func):
+        self.recorder = recorder
+        self.name = name
+        self.func = func
+        self.args = None
+        self.returns = None
+
+    def __call__(self, *args, **kwargs):
+        ret = self.func(*args, **kwargs)
+        self.args = args
+        self.returns = ret
+        if self.recorder.lazy_ports.get(self.name) is self:
+            self.recorder.add_port_columns(self)
+        return ret
+
+
+class WaveformRecorder:
+    """
+    :param signals: Paths of the recorded signals, a path to:
+                    * ``Hardware`` object records all its registers (also submodules), 'self' is the whole design,
+                    * register records that register,
+                    * method (e.g. 'self.fft.main') records the arguments and return value of the last call in each
+                      cycle (port columns are added on the first call).
+    :param path: Directory of the on-disk recording, memory is bounded by ``chunk_size``.
+                 None keeps the recording in memory.
+    :param chunk_size: Number of cycles buffered in memory.
+    """
+
+    def __init__(self, signals=('self',), path=None, chunk_size=1 << 16):
+        self.signals = [signals] if isinstance(signals, str) else list(signals)
+        self.path = None if path is None else Path(path)
+        self.chunk_size = chunk_size
+
+        self.columns = []
+        self.chunks = []  # in-memory recording: list of chunks for each column
+        self.probes = []  # (owner, name, previous value in __dict__)
+        self.lazy_ports = {}
+        self.row = 0
+        self.cycles = 0  # flushed cycles
+        self.waveform = None
+
+    def start(self, model):
+        """ Resolve the signals in ``model`` and install the port probes """
+        self.columns = []
+        self.chunks = []
+        self.row = self.cycles = 0
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            for x in self.path.glob('*.bin'):
+                x.unlink()
+
+        columns = []
+        for signal in self.signals:
+            owner, attr, obj = resolve(model, signal)
+            if isinstance(obj, Hardware):
+                columns += register_columns(obj, signal)
+            elif attr is not None and is_method(owner, attr):
+                probe = PortProbe(self, signal, obj)
+                self.probes.append((owner, attr, owner.__dict__.get(attr)))
+                owner.__dict__[attr] = probe
+                self.lazy_ports[signal] = probe
+            elif isinstance(owner, PyhaList):
+                index = int(signal[signal.rindex('[') + 1:-1])
+                columns += value_columns(signal, obj, lambda owner=owner, i=index: owner.data[i])
+            else:
+                columns += value_columns(signal, obj, lambda owner=owner, k=attr: owner.__dict__[k])
+        for column in columns:
+            self.add_column(column)
+        return self
+
+    def add_column(self, column):
+        """ Columns added later (ports) are zero for the past cycles """
+        column.buffer = np.zeros(self.chunk_size, DTYPES[column.kind])
+        index = len(self.columns)
+        self.columns.append(column)
+        if self.path is not None:
+            np.zeros(self.cycles, DTYPES[column.kind]).tofile(self.path / f'{index}.bin')
+        else:
+            self.chunks.append([np.zeros(self.cycles, DTYPES[column.kind])])
+
+    def add_port_columns(self, probe):
+        del self.lazy_ports[probe.name]
+        for i, arg in enumerate(probe.args):
+            name = f'{probe.name}.input' if len(probe.args) == 1 else f'{probe.name}.input{i}'
+            for column in value_columns(name, arg, lambda i=i: probe.args[i], strict=False):
+                self.add_column(column)
+        returns = probe.returns if isinstance(probe.returns, tuple) else (probe.returns,)
+        for i, ret in enumerate(returns):
+            if ret is None:
+                continue
+            name = f'{probe.name}.output' if len(returns) == 1 else f'{probe.name}.output{i}'
+            get = (lambda: probe.returns) if len(returns) == 1 else (lambda i=i: probe.returns[i])
+            for column in value_columns(name, ret, get, strict=False):
+                self.add_column(column)
+
+    def sample(self):
+        """ Record one cycle, call after the 'main' of the cycle has returned (before the register update) """
+        row = self.row
+        for column in self.columns:
+            column.buffer[row] = column.get()
+        self.row = row + 1
+        if self.row == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """ Move the buffered cycles to the recording, on-disk recording is readable after each flush """
+        for i, column in enumerate(self.columns):
+            data = column.buffer[:self.row]
+            if self.path is not None:
+                with open(self.path / f'{i}.bin', 'ab') as f:
+                    data.tofile(f)
+            else:
+                self.chunks[i].append(data.copy())
+        self.cycles += self.row
+        self.row = 0
+        if self.path is not None:
+            with open(self.path / MANIFEST, 'w') as f:
+                json.dump({'cycles': self.cycles, 'columns': [x.meta(f'{i}.bin') for i, x in enumerate(self.columns)]},
+                          f, indent=1)
+
+    def stop(self):
+        """ Flush, remove the port probes, ``waveform`` holds the recording """
+        self.flush()
+        for owner, attr, previous in reversed(self.probes):
+            if previous is None:
+                owner.__dict__.pop(attr, None)
+            else:
+                owner.__dict__[attr] = previous
+        self.probes = []
+        self.lazy_ports = {}
+        if self.path is not None:
+            self.waveform = Waveform.load(self.path)
+        else:
+            self.waveform = Waveform([x.meta(None) for x in self.columns],
+                                     [np.concatenate(x) for x in self.chunks], self.cycles)
+        return self.waveform
+
+
+def vcd_identifier(i):
+    chars = ''
+    while True:
+        chars += chr(33 + i % 94)
+        i //= 94
+        if not i:
+            return chars
+
+
+class Waveform:
+    """ Recorded columns, ``waveform['self.fft.main.output.data.real']`` gives the raw column,
+    ``value(name)`` the real-world values. """
+
+    def __init__(self, meta, data, cycles):
+        self.meta = {x['name']: x for x in meta}
+        self.data = {x['name']: d for x, d in zip(meta, data)}
+        self.cycles = cycles
+
+    @classmethod
+    def load(cls, path):
+        """ Open on-disk recording, columns are memory-mapped """
+        path = Path(path)
+        with open(path / MANIFEST) as f:
+            manifest = json.load(f)
+        cycles = manifest['cycles']
+        data = [np.memmap(path / x['file'], dtype=DTYPES[x['kind']], mode='r', shape=(cycles,)) if cycles
+                else np.zeros(0, DTYPES[x['kind']]) for x in manifest['columns']]
+        return cls(manifest['columns'], data, cycles)
+
+    @property
+    def names(self):
+        return list(self.data)
+
+    def __getitem__(self, name):
+        return self.data[name]
+
+    def value(self, name):
+        """ Float values of fixed-point columns """
+        meta = self.meta[name]
+        if meta['kind'] == 'fixed':
+            return self.data[name] * 2.0 ** meta['right']
+        return self.data[name]
+
+    def to_vcd(self, file, timescale='1ns', clock_period=10, chunk_size=1 << 16):
+        """ Value Change Dump, time of cycle ``n`` is ``n * clock_period``. Written in chunks. """
+        names = self.names
+        ids = [vcd_identifier(i) for i in range(len(names))]
+        with open(file, 'w') as f:
+            f.write(f'$timescale {timescale} $end\n')
+            self._write_scopes(f, names, ids)
+            f.write('$enddefinitions $end\n')
+
+            last = [None] * len(names)
+            for start in range(0, self.cycles, chunk_size):
+                events = []
+                for i, name in enumerate(names):
+                    data = np.asarray(self.data[name][start:start + chunk_size])
+                    changed = np.empty(len(data), dtype=bool)
+                    changed[0] = last[i] is None or data[0] != last[i]
+                    changed[1:] = data[1:] != data[:-1]
+                    index = np.flatnonzero(changed)
+                    events += [(start + x, i, data[x]) for x in index]
+                    last[i] = data[-1]
+
+                events.sort(key=lambda x: x[0])
+                time = None
+                for cycle, i, value in events:
+                    if cycle != time:
+                        time = cycle
+                        f.write(f'#{cycle * clock_period}\n')
+                    f.write(self._vcd_value(names[i], value) + ids[i] + '\n')
+            f.write(f'#{self.cycles * clock_period}\n')
+
+    def _write_scopes(self, f, names, ids):
+        scope = []
+        for name, id in sorted(zip(names, ids)):
+            parts = [x.replace('[', '_').replace(']', '') for x in name.split('.')]
+            path, var = parts[:-1], parts[-1]
+            common = 0
+            while common < min(len(scope), len(path)) and scope[common] == path[common]:
+                common += 1
+            f.write('$upscope $end\n' * (len(scope) - common))
+            for x in path[common:]:
+                f.write(f'$scope module {x} $end\n')
+            scope = path
+
+            meta = self.meta[name]
+            kind = 'real' if meta['kind'] == 'real' else 'wire'
+            f.write(f'$var {kind} {meta["width"]} {id} {var} $end\n')
+        f.write('$upscope $end\n' * len(scope))
+
+    def _vcd_value(self, name, value):
+        meta = self.meta[name]
+        if meta['kind'] == 'real':
+            return f'r{float(value):.16g} '
+        if meta['kind'] == 'bool':
+            return '1' if value else '0'
+        width = meta['width']
+        return f'b{int(value) & ((1 << width) - 1):0{width}b} '
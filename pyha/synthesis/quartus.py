@@ -1,6 +1,5 @@
 import logging
 import os
-import shutil
 import subprocess
 import sys
 from pathlib import Path
@@ -8,7 +7,7 @@ from pathlib import Path
 from wurlitzer import pipes
 
 import pyha
-from pyha.conversion.conversion import Converter
+from pyha.conversion.conversion import Converter, write_if_changed
 
 logger = logging.getLogger('synth')
 
@@ -36,22 +35,19 @@ def make_quartus_project(conversion: Converter):
     for file in conversion.get_vhdl_sources_relative():
         buffer += f"set_global_assignment -name VHDL_FILE {file}\n"
 
-    # add fixed-point library files (only needed for Quartus)
+    # add fixed-point library files (only needed for Quartus), files are rewritten only if changed
     sim_inc = Path(pyha.__path__[0] + '/simulation/sim_include')
-    shutil.copyfile(sim_inc / 'fixed_pkg_c.vhdl', conversion.src_util_path / 'fixed_pkg_c.vhdl')
+    write_if_changed(conversion.src_util_path / 'fixed_pkg_c.vhdl', (sim_inc / 'fixed_pkg_c.vhdl').read_bytes())
     buffer += f"set_global_assignment -name VHDL_FILE ./src/util/fixed_pkg_c.vhdl\n"
-    shutil.copyfile(sim_inc / 'fixed_float_types_c.vhdl', conversion.src_util_path / 'fixed_float_types_c.vhdl')
+    write_if_changed(conversion.src_util_path / 'fixed_float_types_c.vhdl',
+                     (sim_inc / 'fixed_float_types_c.vhdl').read_bytes())
     buffer += f"set_global_assignment -name VHDL_FILE ./src/util/fixed_float_types_c.vhdl\n"
 
 
-    outpath = conversion.base_path / 'quartus_project.qsf'
-    with outpath.open('w') as f:
-        f.write(buffer)
+    write_if_changed(conversion.base_path / 'quartus_project.qsf', buffer)
 
     # this is just useless project file, enables opening from IDE
-    outpath = conversion.base_path / 'quartus_project.qpf'
-    with outpath.open('w') as f:
-        f.write('PROJECT_REVISION = "quartus_project"')
+    write_if_changed(conversion.base_path / 'quartus_project.qpf', 'PROJECT_REVISION = "quartus_project"')
 
 
 class QuartusDockerWrapper:
@@ -64,15 +60,20 @@ class QuartusDockerWrapper:
         self.flag_eda = False
 
     def _run_quartus_docker(self, quartus_command):
+        """ Runs in docker, or with locally installed Quartus if ``PYHA_QUARTUS`` environment variable is set (directory
+        of the Quartus binaries, e.g. '~/intelFPGA_lite/18.1/quartus/bin') """
         logger.info(f'Running {quartus_command}...')
-        cmd = f"docker run " \
-              f"-u `id -u` " \
-              f"-v /sys:/sys:ro " \
-              f"-v {self.project_path}:/simulation " \
-              f"gasparka/quartus {quartus_command}"
+        if 'PYHA_QUARTUS' in os.environ:
+            cmd = os.path.join(os.path.expanduser(os.environ['PYHA_QUARTUS']), quartus_command)
+        else:
+            cmd = f"docker run " \
+                  f"-u `id -u` " \
+                  f"-v /sys:/sys:ro " \
+                  f"-v {self.project_path}:/simulation " \
+                  f"gasparka/quartus {quartus_command}"
 
         with pipes(stdout=sys.stdout if self.verbose else None, stderr=sys.stderr):
-            subprocess.run(cmd, shell=True)
+            subprocess.run(cmd, shell=True, cwd=self.project_path)
 
     def map(self):
         if not self.flag_map:
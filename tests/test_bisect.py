@@ -0,0 +1,55 @@
+import numpy as np
+
+from pyha import Hardware, Sfix
+from pyha.conversion.conversion import Converter
+from pyha.simulation.bisect import find_divergence, hardware_runner, register_vhdl, register_bits, unpack_registers
+
+
+class Accumulator(Hardware):
+    def __init__(self, bug_at=-1):
+        self.BUG_AT = bug_at
+        self.count = 0
+        self.acc = Sfix(0, 4, -17)
+
+    def main(self, x):
+        self.count = self.count + 1
+        if self.count == self.BUG_AT:
+            self.acc = self.acc + x + 0.5
+        else:
+            self.acc = self.acc + x
+        return self.acc
+
+
+def get_input():
+    np.random.seed(0)
+    return np.random.uniform(-0.01, 0.01, 1000)
+
+
+def test_find_divergence():
+    divergence = find_divergence(Accumulator(), get_input(), checkpoint_interval=64,
+                                 rtl=hardware_runner(Accumulator(bug_at=700)))
+    assert divergence.cycle == 701
+    assert divergence.kind == 'state'
+    assert divergence.registers == ['self.acc']
+    assert divergence.rtl_state['self.acc'] == divergence.hardware_state['self.acc'] + 0.5
+    assert divergence.hardware_state['self.count'] == 701
+    assert divergence.rtl_runs <= 6  # 16 checkpoints
+    assert 'self.acc' in str(divergence)
+
+
+def test_equal():
+    assert find_divergence(Accumulator(), get_input(), rtl=hardware_runner(Accumulator())) is None
+
+
+def test_state_port(tmpdir):
+    dut = Accumulator()
+    dut._pyha_enable_function_profiling_for_types()
+    find_divergence(dut, get_input()[:8], rtl=hardware_runner(Accumulator()))
+    Converter(dut, output_dir=str(tmpdir), state_output=True).to_vhdl()
+    with (tmpdir / 'src' / 'top.vhd').open() as f:
+        top = f.read()
+    assert 'state: out std_logic_vector(53 downto 0)' in top  # 32 bit counter + 22 bit accumulator
+
+    # same layout as the outputs
+    vhdl = register_vhdl(dut)
+    assert unpack_registers(vhdl, vhdl._pyha_serialize()) == register_bits(vhdl)
@@ -0,0 +1,149 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from pyha import Hardware, Sfix, Complex, simulate
+from pyha.cores.fft.fft_core.r2sdf import R2SDF
+from pyha.cores.filter.dc_removal.dc_removal import DCRemoval
+from pyha.cores.filter.fir.fir import FIR
+from pyha.cores.filter.moving_average.moving_average import MovingAverage
+from pyha.common.telemetry import Telemetry
+from pyha.simulation.codegen import specialize
+
+
+def assert_bit_exact(dut, *inputs, **kwargs):
+    a = simulate(deepcopy(dut), *inputs, simulations=['HARDWARE'], **kwargs)['HARDWARE']
+    b = simulate(deepcopy(dut), *inputs, simulations=['HARDWARE'], backend='codegen', **kwargs)['HARDWARE']
+    np.testing.assert_array_equal(a, b)
+
+
+def test_sfix_registers():
+    class A(Hardware):
+        def __init__(self):
+            self.a = Sfix(0, 0, -8)
+            self.b = Sfix(0, 2, -8, overflow_style='saturate')
+            self.counter = 0
+
+        def main(self, x):
+            self.a = x
+            self.b += self.a
+            self.counter += 1
+            return self.b
+
+    np.random.seed(0)
+    assert_bit_exact(A(), np.random.uniform(-1, 1, 64))
+
+
+def test_submodule_registers():
+    class Child(Hardware):
+        def __init__(self):
+            self.data = Sfix(0, 0, -17)
+            self.valid = False
+
+    class A(Hardware):
+        def __init__(self):
+            self.out = Child()
+            self.lazy = Sfix()  # format comes from the assigned value
+
+        def main(self, x):
+            self.out.data = x * x
+            self.out.valid = not self.out.valid
+            self.lazy = x + x
+            return self.out.data, self.lazy
+
+    np.random.seed(0)
+    assert_bit_exact(A(), np.random.uniform(-1, 1, 32))
+
+
+def test_list_registers():
+    class A(Hardware):
+        def __init__(self):
+            self.lst = [Sfix(0, 0, -4, round_style='round', overflow_style='saturate')] * 3
+            self.clst = [Complex(0, 0, -6)] * 2
+            self.ints = [0, 0]
+
+        def main(self, x):
+            self.lst[0] = x
+            for i in range(1, len(self.lst)):
+                self.lst[i] = self.lst[i - 1] + x  # rounding and overflows
+            self.clst[0] = Complex(x, 0, -17) * 0.5
+            self.clst[-1] = self.clst[0] + self.clst[0]
+            self.ints[1] = self.ints[0]
+            self.ints[0] += 1
+            return self.lst[-1], self.clst[-1], self.ints[1]
+
+    assert set(specialize(A())) == {'main'}
+
+    np.random.seed(0)
+    inp = np.random.uniform(-1, 1, 64)
+    assert_bit_exact(A(), inp)
+
+    # overflows are counted on the same locations
+    reports = []
+    for backend in ['interpreter', 'codegen']:
+        simulate(A(), inp, simulations=['HARDWARE'], backend=backend)
+        reports.append([(x.kind, x.location, x.count) for x in Telemetry.report()])
+    assert reports[0] == reports[1] and reports[0]
+
+
+def test_list_register_replaced():
+    """ Whole list assigns replace the registers of the list, element assigns must go to the new one """
+    class A(Hardware):
+        def __init__(self):
+            self.lst = [Sfix(0, 0, -8)] * 3
+            self.shift = True
+
+        def main(self, x):
+            if self.shift:
+                self.lst = [x] + self.lst[:-1]
+            else:
+                self.lst[0] = x
+            self.shift = not self.shift
+            return self.lst[0], self.lst[-1]
+
+    np.random.seed(0)
+    assert_bit_exact(A(), np.random.uniform(-1, 1, 32))
+
+
+def test_specialize_skips_unknown():
+    class A(Hardware):
+        def __init__(self):
+            self.CONST = 1
+            self.lst = [Sfix(0, 0, -8)] * 2
+
+        def main(self, x):
+            self.lst = [x] + self.lst[:-1]
+            return self.lst[-1]
+
+    assert specialize(A()) == {}
+
+
+def test_moving_average():
+    np.random.seed(0)
+    assert_bit_exact(MovingAverage(window_len=4, dtype=Complex),
+                     np.random.uniform(-1, 1, 64) + np.random.uniform(-1, 1, 64) * 1j, pipeline_flush=None)
+
+
+def test_dc_removal():
+    np.random.seed(0)
+    assert_bit_exact(DCRemoval(window_len=4), (np.random.normal(size=64) + np.random.normal(size=64) * 1j) * 0.1,
+                     pipeline_flush=None)
+
+
+def test_fir():
+    np.random.seed(0)
+    assert_bit_exact(FIR([0.01, 0.02, 0.03, 0.04, 0.03, 0.02, 0.01]), np.random.uniform(-1, 1, 64))
+
+
+@pytest.mark.parametrize('inverse', [False, True])
+def test_fft(inverse):
+    np.random.seed(0)
+    inp = (np.random.uniform(-1, 1, 64 * 2) + np.random.uniform(-1, 1, 64 * 2) * 1j) * 0.125
+    assert_bit_exact(R2SDF(64, twiddle_bits=18, inverse=inverse), inp, pipeline_flush=None)
+
+
+def test_model_is_restored():
+    dut = FIR([0.01, 0.02])
+    simulate(dut, [0.1, 0.2], simulations=['HARDWARE'], backend='codegen')
+    assert 'main' not in dut.__dict__
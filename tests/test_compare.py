@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from pyha import Sfix, Complex, sims_close, assert_simulations_equal
+from pyha.common.datavalid import DataValid
+from pyha.simulation.compare import compare_simulations, to_columns
+
+
+def test_numeric():
+    expected = np.linspace(-1, 1, 1000)
+    hardware = expected.copy()
+    hardware[[10, 20, 30]] += 0.01
+    report = compare_simulations({'MODEL': list(expected), 'HARDWARE': hardware}, rtol=1e-4, atol=1e-4)
+
+    assert report['MODEL'].ok
+    result = report['HARDWARE']
+    assert not report.ok
+    assert result.mismatches == 3
+    assert result.first_mismatch == ((10,), '')
+    assert result.max_abs == pytest.approx(0.01)
+    assert result.sqnr == pytest.approx(10 * np.log10(np.sum(expected ** 2) / (3 * 0.01 ** 2)))
+    assert 'FAILED: 3/1000 values differ, first at [10]' in repr(result)
+
+
+def test_complex():
+    expected = np.array([0.5 + 0.5j, 0.25 - 0.25j])
+    assert sims_close({'HARDWARE': [0.5 + 0.5j, 0.25 - 0.25j]}, expected)
+
+    result = compare_simulations({'HARDWARE': [0.5 + 0.5j, 0.25 - 0.35j]}, expected)['HARDWARE']
+    assert result.mismatches == 1
+    assert result.first_mismatch == ((1,), '')
+    assert result.max_abs == pytest.approx(0.1)
+    assert not sims_close({'HARDWARE': [0.5 + 0.5j, 0.25 - 0.35j]}, expected)
+
+
+def test_nested():
+    """ Pyha types, DataValid and tuples are flattened to columns """
+
+    def output(x):
+        return [(DataValid(Complex(v, 0, -17), valid=i % 2 == 0), Sfix(v.real, 0, -17)) for i, v in enumerate(x)]
+
+    x = np.array([0.1 + 0.2j, 0.3 - 0.4j, -0.5 + 0.6j])
+    columns = to_columns(output(x))
+    assert list(columns) == ['[0]', '[1]']
+    assert np.isnan(columns['[0]'][1])
+
+    result = compare_simulations({'HARDWARE': output(x)}, output(x[::-1]), rtol=1e-3, atol=1e-3)['HARDWARE']
+    assert result.mismatches == 4  # invalid sample is NaN in both
+    assert result.first_mismatch == ((0,), '[0]')
+
+
+def test_length_differs():
+    result = compare_simulations({'HARDWARE': [1, 2, 3]}, [1, 2])['HARDWARE']
+    assert not result.ok
+    assert 'shape differs' in repr(result)
+
+
+def test_assert_simulations_equal():
+    sims = {'MODEL': [0.1, 0.2], 'HARDWARE': [0.1, 0.2], 'RTL': [0.1, 0.2]}
+    assert_simulations_equal(sims)
+
+    sims['RTL'] = [0.1, 0.2 + 2 ** -17]
+    with pytest.raises(AssertionError, match='RTL vs HARDWARE FAILED'):
+        assert_simulations_equal(sims)
+
+
+def test_assert_simulations_equal_tolerance():
+    """ Same tolerance as ``assert_allclose``: relative to the expected (MODEL) value """
+    sims = {'MODEL': [0.5, 1.0 + 1.0j], 'HARDWARE': [0.5, 1.0 + 1.0j]}
+    assert_simulations_equal(sims, rtol=0.5, atol=0.0)
+
+    sims['HARDWARE'] = [0.75, 1.5 + 1.0j]  # complex error is the magnitude of the difference
+    np.testing.assert_allclose(sims['HARDWARE'], sims['MODEL'], rtol=0.5, atol=0.0)
+    assert_simulations_equal(sims, rtol=0.5, atol=0.0)
+
+    sims['HARDWARE'] = [1.0, 1.0 + 1.0j]  # 'isclose' accepts this, it is relative to the larger value
+    with pytest.raises(AssertionError):
+        np.testing.assert_allclose(sims['HARDWARE'], sims['MODEL'], rtol=0.5, atol=0.0)
+    with pytest.raises(AssertionError, match='HARDWARE vs MODEL FAILED'):
+        assert_simulations_equal(sims, rtol=0.5, atol=0.0)
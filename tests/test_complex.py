@@ -342,3 +342,9 @@ def test_complex_constants():
     sims = simulate(dut, inputs, simulations=['HARDWARE', 'RTL'],
                     conversion_path='/home/gaspar/git/pyhacores/playground')
     assert sims_close(sims)
+
+
+def test_overflow_bounds():
+    assert Complex(1.5 - 3.0j, 0, -4, overflow_style='saturate').val == 0.9375 - 1.0j
+    assert Complex(1.25 - 1.25j, 0, -4).val == -0.75 + 0.75j
+    assert Complex(-4.5 + 3.75j, 1, -2, overflow_style='saturate').val == -2.0 + 1.75j
@@ -4,7 +4,7 @@ import pytest
 from pyha import simulate
 from pyha.common.core import Hardware
 from pyha.common.fixed_point import Sfix
-from pyha.conversion.conversion import RecursiveConverter, get_objects_rednode
+from pyha.conversion.conversion import RecursiveConverter, get_objects_rednode, class_sources
 from pyha.simulation.simulation_interface import assert_sim_match
 from unittest.mock import MagicMock, patch
 
@@ -71,6 +71,36 @@ def test_get_objects_rednode_local_two():
     assert red.name == 'Dummy2'
 
 
+def test_get_objects_rednode_cached():
+    """ Class is parsed once, conversion may modify the returned tree """
+
+    class T0:
+        def a(self):
+            pass
+
+    red = get_objects_rednode(T0())
+    red.value[0].name = 'b'
+    assert class_sources[T0] == 'class T0:\n    def a(self):\n        pass\n'
+
+    red2 = get_objects_rednode(T0())
+    assert red2 is not red
+    assert red2.dumps() == 'class T0:\n    def a(self):\n        pass\n'
+
+
+def test_class_trees_bounded():
+    from pyha.conversion import conversion
+
+    class T0:
+        def a(self):
+            pass
+
+    with patch.dict(conversion.class_trees, clear=True), patch.object(conversion, 'CLASS_TREES_MAX', 2):
+        for name in ['a', 'b', 'c']:
+            red = get_objects_rednode(T0(), f'class T0:\n    def {name}(self):\n        pass\n')
+            assert red.value[0].name == name
+        assert len(conversion.class_trees) == 2
+
+
 def test_get_objects_rednode_selective():
     pytest.xfail('Will not work, since locals cannot be walked')
 
@@ -176,3 +206,115 @@ def test_element_with_none_bound():
     with patch('os._exit', MagicMock(return_value=0)):
         with pytest.raises(Exception):
             sims = simulate(dut, inp, simulations=['HARDWARE', 'RTL'])
+
+
+def test_conversion_cache(tmpdir):
+    from pyha.conversion.cache import Cache
+
+    class Cached(Hardware):
+        def __init__(self, bits):
+            self.reg = Sfix(0, 0, -bits)
+
+        def main(self, a):
+            self.reg = a
+            return self.reg
+
+    def make(bits):
+        dut = Cached(bits)
+        dut._pyha_enable_function_profiling_for_types()
+        dut.main(Sfix(0.5, 0, -bits))
+        return dut
+
+    with patch.object(Cache, 'path', Path(str(tmpdir))), patch.object(Cache, 'enabled', True):
+        expected = RecursiveConverter(make(17)).converted_modules['Cached_0'][1]
+
+        with patch('pyha.conversion.conversion.convert', MagicMock(side_effect=AssertionError)):
+            conv = RecursiveConverter(make(17))
+        assert conv.converted_modules['Cached_0'][1] == expected
+
+        # types changed -> converted again
+        conv = RecursiveConverter(make(12))
+        assert 'sfixed(0 downto -12)' in conv.converted_modules['Cached_0'][1]
+        assert len(list(Path(str(tmpdir)).glob('*.json'))) == 2
+
+
+def test_parallel_conversion():
+    from pyha.conversion.cache import Cache
+
+    class Stage(Hardware):
+        def __init__(self, bits):
+            self.reg = Sfix(0, 0, -bits)
+
+        def main(self, a):
+            self.reg = a
+            return self.reg
+
+    class Chain(Hardware):
+        def __init__(self):
+            self.stages = [Stage(bits) for bits in range(10, 14)]
+
+        def main(self, a):
+            for stage in self.stages:
+                a = stage.main(a)
+            return a
+
+    def convert(jobs):
+        dut = Chain()
+        dut._pyha_enable_function_profiling_for_types()
+        dut.main(Sfix(0.5, 0, -17))
+        conv = RecursiveConverter(dut, jobs=jobs)
+        return [(k, v[1]) for k, v in conv.converted_modules.items()], conv.build_typedefs_package()
+
+    with patch.object(Cache, 'enabled', False), patch.object(RecursiveConverter, 'parallel_min_modules', 2):
+        serial = convert(jobs=1)
+        assert [x[0] for x in serial[0]] == ['Stage_0', 'Stage_1', 'Stage_2', 'Stage_3', 'Chain_4']
+        assert convert(jobs=3) == serial
+
+
+def test_incremental_output(tmpdir):
+    import json
+    from pyha.conversion.conversion import Converter
+
+    class Inc(Hardware):
+        def __init__(self, bits):
+            self.reg = Sfix(0, 0, -bits)
+
+        def main(self, a):
+            self.reg = a
+            return self.reg
+
+    class IncTop(Hardware):
+        def __init__(self):
+            self.sub = Inc(12)
+
+        def main(self, a):
+            return self.sub.main(a)
+
+    def to_vhdl(dut):
+        dut._pyha_enable_function_profiling_for_types()
+        dut.main(Sfix(0.5, 0, -17))
+        return Converter(dut, output_dir=str(tmpdir)).to_vhdl()
+
+    conv = to_vhdl(Inc(17))
+    manifest = json.loads((conv.base_path / 'manifest.json').read_text())
+    assert manifest['changed'] == manifest['files']
+    assert manifest['files'][:4] == ['./src/util/complex.vhdl', './src/util/pyha_util.vhdl',
+                                     './src/util/typedefs.vhdl', './src/Inc_0.vhd']
+    mtimes = {x: x.stat().st_mtime_ns for x in conv.output_files}
+
+    # nothing changed -> nothing written
+    conv = to_vhdl(Inc(17))
+    assert conv.changed == [] and conv.removed == []
+    assert mtimes == {x: x.stat().st_mtime_ns for x in conv.output_files}
+
+    conv = to_vhdl(Inc(12))
+    assert [conv.relative(x) for x in conv.changed] == ['./src/Inc_0.vhd', './src/top.vhd']
+
+    # Inc_0.vhd is the same as before
+    conv = to_vhdl(IncTop())
+    assert [conv.relative(x) for x in conv.changed] == ['./src/IncTop_1.vhd', './src/top.vhd']
+    assert conv.removed == []
+
+    conv = to_vhdl(Inc(12))
+    assert conv.changed == [conv.src_path / 'top.vhd'] and conv.removed == ['./src/IncTop_1.vhd']
+    assert not (conv.src_path / 'IncTop_1.vhd').exists()
@@ -1,7 +1,9 @@
 import time
+from copy import deepcopy
 
 from pyha import Complex
-from pyha.common.core import Hardware, Meta, PyhaFunc
+from pyha.common.context_managers import RegisterBehaviour, AutoResize
+from pyha.common.core import Hardware, Meta, PyhaFunc, DirtyRegisters
 from pyha.common.fixed_point import Sfix
 
 
@@ -333,3 +335,147 @@ def test_submodule_setattr():
     assert dut.b._pyha_next['val'].val == 0.00122833251953125 # auto-resize works
     dut._pyha_update_registers()
     assert dut.b.val.val == 0.00122833251953125
+
+
+def test_dirty_registers():
+    """ Only registers assigned in the cycle are committed """
+
+    class Tap(Hardware):
+        def __init__(self):
+            self.acc = Sfix(0.0, 0, -17)
+
+    class A(Hardware):
+        def __init__(self):
+            self.taps = [Tap() for _ in range(16)]
+            self.delay = [0.0] * 16
+            self.counter = 0
+
+        def main(self, x):
+            self.taps[3].acc = x
+            self.counter += 1
+
+    DirtyRegisters.reset()
+    dut = A()
+    with RegisterBehaviour.enable(), AutoResize.enable():
+        dut.main(0.5)
+        assert list(DirtyRegisters.objects.values()) == [dut.taps[3], dut]
+        dut._pyha_update_registers()
+    assert not DirtyRegisters.objects
+    assert float(dut.taps[3].acc) == 0.5
+    assert dut.counter == 1
+
+
+def test_deepcopy_submodule_registers():
+    class A(Hardware):
+        def __init__(self):
+            self.a = Sfix(0.0, 0, -17)
+
+    class B(Hardware):
+        def __init__(self):
+            self.sub = A()
+
+        def main(self, x):
+            self.sub.a = x
+
+    orig = B()
+    dut = deepcopy(orig)
+    with RegisterBehaviour.enable(), AutoResize.enable():
+        dut.main(0.5)
+        dut._pyha_update_registers()
+    assert float(dut.sub.a) == 0.5
+    assert float(orig.sub.a) == 0.0
+
+
+class TestDiscoveryWarmup:
+    class A(Hardware):
+        def __init__(self):
+            self.a = Sfix(0.0, 0, -17)
+
+        def main(self, x):
+            local = x + x
+            self.a = local
+            return local
+
+    def setup_method(self):
+        self.stable_calls = PyhaFunc.discovery_stable_calls
+        PyhaFunc.discovery_stable_calls = 4
+
+    def teardown_method(self):
+        PyhaFunc.discovery_stable_calls = self.stable_calls
+
+    def test_discovery_stops(self):
+        dut = self.A()
+        dut._pyha_enable_function_profiling_for_types()
+        for _ in range(4):
+            dut.main(Sfix(0.1, 0, -17))
+        assert dut.main.discovery
+
+        dut.main(Sfix(0.1, 0, -17))
+        assert not dut.main.discovery
+        assert dut.main.get_local_types()['local'].left == 1
+
+        dut.main(Sfix(0.1, 0, -17))
+        assert dut.main.calls == 6
+
+    def test_register_behaviour_without_discovery(self):
+        """ Register assigns and auto-resize work the same after discovery stops """
+        dut = self.A()
+        dut._pyha_enable_function_profiling_for_types()
+        for _ in range(5):
+            dut.main(Sfix(0.1, 0, -17))
+        assert not dut.main.discovery
+
+        dut.main(Sfix(0.3, 0, -17))
+        assert dut.a.val == 0.0
+        assert dut._pyha_next['a'].left == 0 and dut._pyha_next['a'].val == (Sfix(0.3, 0, -17) + Sfix(0.3, 0, -17)).val
+
+    def test_new_type_restarts_discovery(self):
+        dut = self.A()
+        dut._pyha_enable_function_profiling_for_types()
+        for _ in range(5):
+            dut.main(Sfix(0.1, 0, -17))
+        assert not dut.main.discovery
+
+        dut.main(Sfix(0.1, 2, -17))
+        assert dut.main.discovery
+        assert dut.main.get_arg_types()[0].left == 2
+        assert dut.main.get_output_types().left == 3
+
+        dut.main(Sfix(0.1, 2, -17))
+        assert dut.main.get_local_types()['local'].left == 3
+
+    def test_branch_locals(self):
+        """ Discovery must not stop before the locals of a rarely taken branch are seen """
+        class B(Hardware):
+            def __init__(self):
+                self.a = Sfix(0.0, 0, -17)
+
+            def main(self, x, valid):
+                if valid:
+                    branch = x + x
+                    self.a = branch
+                return x
+
+        dut = B()
+        dut._pyha_enable_function_profiling_for_types()
+        for _ in range(8):
+            dut.main(Sfix(0.1, 0, -17), False)
+        assert dut.main.discovery
+
+        dut.main(Sfix(0.1, 0, -17), True)
+        assert dut.main.get_local_types()['branch'].left == 1
+        for _ in range(5):
+            dut.main(Sfix(0.1, 0, -17), False)
+        assert not dut.main.discovery
+
+    def test_warmup(self):
+        PyhaFunc.discovery_warmup = 2
+        try:
+            dut = self.A()
+            dut._pyha_enable_function_profiling_for_types()
+            dut.main(Sfix(0.1, 0, -17))
+            assert dut.main.discovery
+            dut.main(Sfix(0.1, 1, -17))
+            assert not dut.main.discovery
+        finally:
+            PyhaFunc.discovery_warmup = None
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from pyha import Complex, IQFile, load_iq_chunks, load_complex64_file, save_complex64_file
+
+
+@pytest.fixture
+def iq():
+    np.random.seed(0)
+    return ((np.random.uniform(-1, 1, 1000) + np.random.uniform(-1, 1, 1000) * 1j) * 0.9).astype(np.complex64)
+
+
+def test_complex64(tmpdir, iq):
+    file = str(tmpdir / 'iq.raw')
+    save_complex64_file(file, iq)
+    np.testing.assert_array_equal(load_complex64_file(file), iq)
+
+    f = IQFile(file, chunk_size=300)
+    assert len(f) == 1000
+    chunks = list(f)
+    assert [len(x) for x in chunks] == [300, 300, 300, 100]
+    np.testing.assert_array_equal(np.concatenate(chunks), iq)
+
+
+def test_seek(tmpdir, iq):
+    file = str(tmpdir / 'iq.raw')
+    save_complex64_file(file, iq)
+
+    f = IQFile(file)
+    f.seek(100)
+    np.testing.assert_array_equal(f.read(10), iq[100:110])
+    f.seek(-5, 1)
+    assert f.tell() == 105
+    f.seek(-3, 2)
+    np.testing.assert_array_equal(f.read(), iq[-3:])
+    assert len(f.read()) == 0
+
+    chunks = list(load_iq_chunks(file, chunk_size=64, offset=500, count=200))
+    np.testing.assert_array_equal(np.concatenate(chunks), iq[500:700])
+
+
+def test_int16(tmpdir, iq):
+    file = str(tmpdir / 'iq.raw')
+    raw = np.empty(2 * len(iq), dtype=np.int16)
+    raw[0::2] = np.round(iq.real * 32767)
+    raw[1::2] = np.round(iq.imag * 32767)
+    raw.tofile(file)
+
+    got = IQFile(file, format='int16').read()
+    np.testing.assert_allclose(got, iq, atol=2 / 32768)
+
+
+def test_int12_packed(tmpdir, iq):
+    file = str(tmpdir / 'iq.raw')
+    i = np.round(iq.real * 2047).astype(np.int32) & 0xFFF
+    q = np.round(iq.imag * 2047).astype(np.int32) & 0xFFF
+    raw = np.stack([i & 0xFF, (i >> 8) | ((q & 0x0F) << 4), q >> 4], axis=1).astype(np.uint8)
+    raw.tofile(file)
+
+    f = IQFile(file, format='int12')
+    assert len(f) == len(iq)
+    np.testing.assert_allclose(f.read(), iq, atol=2 / 2048)
+
+
+def test_quantize(tmpdir, iq):
+    file = str(tmpdir / 'iq.raw')
+    save_complex64_file(file, iq * 2)
+    dtype = Complex(0.0, 0, -11, overflow_style='saturate', round_style='round')
+
+    got = IQFile(file, dtype=dtype).read()
+    expected = [complex(dtype(x)) for x in iq * 2]
+    np.testing.assert_array_equal(got, expected)
@@ -0,0 +1,44 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from pyha import Simulator, simulate, Complex, Sfix
+from pyha.common.datavalid import DataValid
+from pyha.cores.filter.dc_removal.dc_removal import DCRemoval
+from pyha.cores.filter.moving_average.moving_average import MovingAverage
+
+
+def sparse_input(n, gap):
+    """ One valid sample, then ``gap`` invalid (None) samples """
+    np.random.seed(0)
+    data = np.random.uniform(-0.5, 0.5, n) + np.random.uniform(-0.5, 0.5, n) * 1j
+    ret = []
+    for x in data:
+        ret += [x] + [None] * gap
+    return ret
+
+
+@pytest.mark.parametrize('dut', [
+    MovingAverage(window_len=4, dtype=Complex),
+    DCRemoval(window_len=4),
+], ids=['moving_average', 'dc_removal'])
+def test_exact(dut):
+    inp = sparse_input(64, gap=20)
+    expected = simulate(deepcopy(dut), inp, simulations=['HARDWARE'], pipeline_flush=None)['HARDWARE']
+
+    sim = Simulator(deepcopy(dut), pipeline_flush=None, fast_forward=True).run(inp)
+    np.testing.assert_array_equal(sim.hardware, expected)
+    assert sim.skipped_cycles > 64 * 10
+
+    got = simulate(deepcopy(dut), inp, simulations=['HARDWARE'], pipeline_flush=None, fast_forward=True)['HARDWARE']
+    np.testing.assert_array_equal(got, expected)
+
+
+def test_invalid_data_must_match():
+    """ Invalid inputs with different data are not skipped, design might look at the data """
+    dut = MovingAverage(window_len=2, dtype=Sfix)
+    inp = [[DataValid(Sfix(x, 0, -17), valid=False)] for x in np.linspace(-0.5, 0.5, 32)]
+    sim = Simulator(dut, pipeline_flush=None, fast_forward=True)
+    sim.simulate_cycles(inp)
+    assert sim.skipped_cycles == 0
@@ -3,8 +3,8 @@ from decimal import *
 import numpy as np
 import pytest
 
-from pyha import Hardware, simulate, sims_close
-from pyha.common.fixed_point import Sfix, resize
+from pyha import Hardware, simulate, sims_close, scalb
+from pyha.common.fixed_point import Sfix, resize, FixedFormat
 
 getcontext().prec = 128
 
@@ -515,6 +515,15 @@ class TestFloatMode:
             assert b.left == 0
             assert b.right == -2
 
+    def test_unbounded_growth(self):
+        """ Accumulator bounds grow every cycle without resize """
+        with Sfix._float_mode:
+            acc = Sfix(0.0, 0, -17)
+            for _ in range(2048):
+                acc = acc + Sfix(0.25, 0, -17)
+            assert acc.val == 512.0
+            assert acc.left == 2048
+
 
 class TestIndexing:
 
@@ -641,3 +650,120 @@ class TestUpperBits:
         assert dut.reg.left == -3
         assert dut.reg.right == -17
         assert sims_close(sims)
+
+
+class TestIntegerBacked:
+    def test_fix(self):
+        a = Sfix(0.123, 0, -17)
+        assert a.fix == 16121
+        assert a.fixed_value() == 16121
+
+    def test_lazy_bounds_float_backed(self):
+        a = Sfix(0.123)
+        assert a.fix is None
+
+        with Sfix._float_mode:
+            a = Sfix(0.123, 0, -17)
+        assert a.fix is None
+
+    def test_wide_mul_exact(self):
+        a = Sfix(0.123, 0, -17)
+        b = a * a * a * a
+        assert b.right == -68
+        assert b.fix == 16121 ** 4  # 56 bits, float has only 53
+
+        c = resize(b, 0, -60)
+        expect = Decimal(16121 ** 4) / Decimal(2 ** 8)
+        assert c.fix == int(expect.to_integral_value(rounding=ROUND_FLOOR))
+
+    def test_add_sub_align(self):
+        a = Sfix(0.5, 0, -4)
+        b = Sfix(-0.25, 0, -60)
+        assert (a + b).fix == 1 << 58
+        assert (a - b).fix == 3 << 58
+        assert (a - b).right == -60
+
+    def test_round_half_even(self):
+        a = Sfix(0.5 + 2 ** -9, 0, -9)
+        assert resize(a, 0, -8, round_style='round').fix == 128  # tie, 128 is even
+        a = Sfix(0.5 + 3 * 2 ** -9, 0, -9)
+        assert resize(a, 0, -8, round_style='round').fix == 130
+        a = Sfix(-0.5 - 2 ** -9, 0, -9)
+        assert resize(a, 0, -8, round_style='round').fix == -128
+
+    def test_wrap_saturate(self):
+        a = Sfix(0.75, 0, -2)
+        b = resize(a + a, 0, -2)
+        assert b.fix == -2
+        assert float(b) == -0.5
+
+        b = resize(a + a, 0, -2, overflow_style='saturate')
+        assert b.fix == 3
+        assert float(b) == 0.75
+
+    def test_shift(self):
+        a = Sfix(-0.75, 0, -8)
+        assert (a >> 1).fix == -96
+        assert (a >> 20).fix == -1
+        assert (a << 1).fix == 128  # wraps
+        assert scalb(a, 3).fix == a.fix
+
+    def test_getitem_setitem(self):
+        a = Sfix(0.5, 0, -70)
+        assert a[-1]
+        a[-70] = True
+        assert a.fix == (1 << 69) + 1
+
+
+class TestFixedFormat:
+    def test_shared(self):
+        a = Sfix(0.1, 0, -17)
+        b = Sfix(-0.5, 0, -17)
+        assert a.fmt is b.fmt
+        assert Sfix(0.1, 0, -17, round_style='round').fmt is not a.fmt
+
+    def test_precomputed(self):
+        fmt = FixedFormat.get(0, -17)
+        assert fmt.max_representable == 2 ** 0 - 2 ** -17
+        assert fmt.min_representable == -1
+        assert fmt.max_fix == 2 ** 17 - 1
+        assert fmt.min_fix == -2 ** 17
+        assert FixedFormat.get(0, -17, signed=False).min_fix == 0
+
+    def test_copy_keeps_interned(self):
+        import pickle
+        from copy import deepcopy
+        a = Sfix(0.1, 0, -17)
+        assert deepcopy(a).fmt is a.fmt
+        assert pickle.loads(pickle.dumps(a)).fmt is a.fmt
+
+    def test_wide_not_interned(self):
+        from pyha.common.fixed_point import _intern_format
+        _intern_format.cache_clear()
+        with Sfix._float_mode:
+            acc = Sfix(0.0, 0, -17)
+            for _ in range(1000):
+                acc = acc + Sfix(0.25, 0, -17)
+        assert acc.val == 250.0
+        assert _intern_format.cache_info().currsize < 300
+
+        fmt = FixedFormat.get(1000, -17)
+        assert fmt is not FixedFormat.get(1000, -17)
+        assert fmt == FixedFormat.get(1000, -17)
+        assert fmt.max_fix == 2 ** 1017 - 1
+        assert Sfix(0.5, 1000, -17) == Sfix(0.5, 1000, -17)
+
+    def test_setter_switches_format(self):
+        a = Sfix(0.1, 0, -17)
+        b = Sfix(0.1, 0, -17)
+        a.round_style = 'round'
+        assert a.round_style == 'round'
+        assert b.round_style == 'truncate'
+        assert a.fmt is FixedFormat.get(0, -17, round_style='round')
+
+    def test_complex(self):
+        from pyha import Complex
+        a = Complex(0.1 + 0.2j, 0, -17)
+        b = Complex(0.3, 0, -17)
+        assert a.fmt is b.fmt
+        assert a.real.fmt is a.fmt
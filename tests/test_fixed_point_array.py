@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from pyha import Sfix, Complex, SfixArray, ComplexArray, resize
+
+
+@pytest.fixture
+def data():
+    np.random.seed(0)
+    return np.random.uniform(-1, 1, 64)
+
+
+def sfix_list(x, left=0, right=-17, **kwargs):
+    return [Sfix(v, left, right, **kwargs) for v in x]
+
+
+def test_init(data):
+    a = SfixArray(data, 0, -17)
+    expect = sfix_list(data)
+    assert a.fix.dtype == np.int64
+    assert [x.fix for x in expect] == a.fix.tolist()
+    assert a.tolist() == expect
+
+
+@pytest.mark.parametrize('overflow_style', ['wrap', 'saturate'])
+@pytest.mark.parametrize('round_style', ['truncate', 'round'])
+def test_resize(data, overflow_style, round_style):
+    data = data * 4
+    a = SfixArray(data, 2, -17)
+    r = a.resize(0, -6, overflow_style=overflow_style, round_style=round_style)
+
+    expect = [resize(x, 0, -6, overflow_style=overflow_style, round_style=round_style) for x in sfix_list(data, 2, -17)]
+    assert r.fix.tolist() == [x.fix for x in expect]
+
+
+def test_arithmetic(data):
+    a = SfixArray(data, 0, -17)
+    b = SfixArray(data[::-1] * 0.5, -1, -9)
+    sa = sfix_list(data)
+    sb = sfix_list(data[::-1] * 0.5, -1, -9)
+
+    for res, expect in [(a + b, [x + y for x, y in zip(sa, sb)]),
+                        (a - b, [x - y for x, y in zip(sa, sb)]),
+                        (a * b, [x * y for x, y in zip(sa, sb)]),
+                        (-a, [-x for x in sa]),
+                        (abs(a), [abs(x) for x in sa]),
+                        (a >> 3, [x >> 3 for x in sa]),
+                        (a + 0.25, [x + 0.25 for x in sa]),
+                        (a * sb[0], [x * sb[0] for x in sa])]:
+        assert res.left == expect[0].left
+        assert res.right == expect[0].right
+        assert res.fix.tolist() == [x.fix for x in expect]
+
+
+def test_reflected_sub(data):
+    """ Scalar on the left must give the same format as the scalar arithmetic """
+    a = SfixArray(data, 0, -17)
+    sa = sfix_list(data)
+    for left in [Sfix(0.5, 0, -17), Sfix(0.5, 2, -9), 0.5]:
+        res = left - a
+        expect = [left - x for x in sa]
+        assert (res.left, res.right) == (expect[0].left, expect[0].right)
+        assert res.fix.tolist() == [x.fix for x in expect]
+
+    cdata = data + data[::-1] * 1j
+    c = ComplexArray(cdata, 0, -17)
+    for left in [Complex(0.5 - 0.25j, 0, -17), Complex(0.5, 1, -9)]:
+        res = left - c
+        expect = [left - Complex(x, 0, -17) for x in cdata]
+        assert (res.left, res.right) == (expect[0].left, expect[0].right)
+        assert np.array_equal(res.val, [complex(x) for x in expect])
+
+
+def test_wide_switches_to_object(data):
+    a = SfixArray(data, 0, -40)
+    b = a * a
+    assert b.right == -80
+    assert b.fix.dtype == object
+
+    sa = sfix_list(data, 0, -40)
+    assert b.fix.tolist() == [(x * x).fix for x in sa]
+    assert b.resize(0, -17).fix.dtype == np.int64
+
+
+def test_getitem(data):
+    a = SfixArray(data, 0, -17)
+    assert a[3] == Sfix(data[3], 0, -17)
+    assert isinstance(a[2:5], SfixArray)
+    assert len(a[2:5]) == 3
+
+    a[0] = 0.5
+    assert a.val[0] == 0.5
+    a[1:3] = [0.25, -0.25]
+    assert a.val[1:3].tolist() == [0.25, -0.25]
+
+
+def test_complex(data):
+    cdata = data + data[::-1] * 1j
+    a = ComplexArray(cdata, 0, -17)
+    ca = [Complex(x, 0, -17) for x in cdata]
+    assert np.allclose(a.val, [complex(x) for x in ca], rtol=0, atol=0)
+
+    b = a * a
+    cb = [x * x for x in ca]
+    assert b.left == cb[0].left
+    assert b.right == cb[0].right
+    assert np.allclose(b.val, [complex(x) for x in cb], rtol=0, atol=1e-12)
+
+    r = b.resize(0, -17, round_style='round', overflow_style='saturate')
+    cr = [x.resize(0, -17, round_style='round', overflow_style='saturate') for x in cb]
+    assert np.array_equal(r.val, [complex(x) for x in cr])
+
+    s = a * SfixArray(data, 0, -17)
+    assert s.left == 1
+    assert np.allclose(s.val, a.val * SfixArray(data, 0, -17).val, rtol=0, atol=0)
+
+
+def test_out_of_range_floats():
+    """ Values past int64 are wrapped/saturated exactly, same as ``Sfix`` """
+    data = [1e30 + 2 ** 80, -3e20, 0.5]
+    for overflow_style in ['wrap', 'saturate']:
+        a = SfixArray(data, 0, -17, overflow_style=overflow_style)
+        assert a.fix.dtype == np.int64
+        assert a.fix.tolist() == [x.fix for x in sfix_list(data, overflow_style=overflow_style)]
+
+    with pytest.raises(ValueError):
+        SfixArray([0.5, np.nan], 0, -17)
+    with pytest.raises(ValueError):
+        ComplexArray([0.5, np.inf * 1j], 0, -17)
+
+
+def test_complex_lazy_operands(data):
+    """ Operands with unknown bounds are treated like floats, same as ``SfixArray`` """
+    cdata = data + data[::-1] * 1j
+    a = ComplexArray(cdata, 0, -17)
+    assert a + Sfix(0.5, None, None) == a + 0.5
+    assert a + Complex(0.5 - 0.25j, None, None, init_only=True) == a + (0.5 - 0.25j)
+
+
+def test_complex_getitem_raw():
+    a = ComplexArray._from_fix(np.array([(1 << 50) - 1, -5]), np.array([-(1 << 50), 3]), 0, -50)
+    assert a[0].val == complex(1 - 2 ** -50, -1)
+    assert a[1].val == complex(-5 * 2 ** -50, 3 * 2 ** -50)
+    assert (a[0].left, a[0].right) == (0, -50)
+    assert a.tolist() == [Complex(x, 0, -50) for x in a.val]
@@ -0,0 +1,67 @@
+import os
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+from pyha import Hardware, Sfix
+from pyha.conversion.conversion import Converter
+from pyha.simulation.ghdl import LocalGHDL
+
+# records the 'ghdl -a' calls, library is a list of the analysed files
+FAKE_GHDL = f"""#!{sys.executable}
+import sys
+if sys.argv[1] == '--version':
+    print('GHDL 0.0 (fake)')
+    sys.exit()
+workdir = [x for x in sys.argv if x.startswith('--workdir=')][0][len('--workdir='):]
+files = [x for x in sys.argv[2:] if not x.startswith('-')]
+with open(workdir + '/work-obj08.cf', 'a') as f:
+    f.write('\\n'.join(files) + '\\n')
+with open(__file__ + '.log', 'a') as f:
+    f.write(' '.join(x.split('/')[-1] for x in files) + '\\n')
+"""
+
+
+class Stage(Hardware):
+    def __init__(self, bits):
+        self.reg = Sfix(0, 0, -bits)
+
+    def main(self, a):
+        self.reg = a
+        return self.reg
+
+
+class Chain(Hardware):
+    def __init__(self, bits):
+        self.a = Stage(17)
+        self.b = Stage(bits)
+
+    def main(self, x):
+        return self.b.main(self.a.main(x))
+
+
+def test_incremental_analysis(tmpdir):
+    tmpdir = Path(str(tmpdir))
+    ghdl = tmpdir / 'ghdl'
+    ghdl.write_text(FAKE_GHDL)
+    ghdl.chmod(0o755)
+    log = tmpdir / 'ghdl.log'
+
+    def analyse(bits):
+        dut = Chain(bits)
+        dut._pyha_enable_function_profiling_for_types()
+        dut.main(Sfix(0.5, 0, -17))
+        runner = LocalGHDL(Converter(dut, output_dir=str(tmpdir / 'conversion')).to_vhdl(), ghdl=str(ghdl))
+        runner.analyse()
+        return [x.name for x in runner.analysed]
+
+    with patch.dict(os.environ, {'PYHA_GHDL_CACHE': str(tmpdir / 'cache')}):
+        assert analyse(12) == ['typedefs.vhdl', 'Stage_0.vhd', 'Stage_1.vhd', 'Chain_2.vhd', 'top.vhd']
+        assert log.read_text().splitlines()[0] == 'complex.vhdl pyha_util.vhdl'
+        assert analyse(12) == []
+
+        # support library is analysed once, generated files starting from the first changed one
+        assert analyse(10) == ['Stage_1.vhd', 'Chain_2.vhd', 'top.vhd']
+        assert analyse(10) == []
+        assert len(log.read_text().splitlines()) == 3
+        assert 'complex.vhdl' in (tmpdir / 'conversion' / 'ghdl_work' / 'work-obj08.cf').read_text()
@@ -0,0 +1,97 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from pyha import Hardware, Sfix, simulate, simulate_lanes
+from pyha.cores.fft.fft_core.r2sdf import R2SDF
+from pyha.cores.filter.dc_removal.dc_removal import DCRemoval
+from pyha.cores.filter.fir.fir import FIR
+from pyha.simulation.lanes import LaneDivergence
+
+
+def assert_lanes_equal(dut, lanes, **kwargs):
+    outs = simulate_lanes(deepcopy(dut), lanes, **kwargs)
+    assert len(outs) == len(lanes)
+    for lane, out in zip(lanes, outs):
+        expected = simulate(deepcopy(dut), lane, simulations=['HARDWARE'], **kwargs)['HARDWARE']
+        np.testing.assert_array_equal(expected, out)
+
+
+def test_fir():
+    np.random.seed(0)
+    dut = FIR([0.01, 0.02, 0.03, 0.04, 0.03, 0.02, 0.01])
+    assert_lanes_equal(dut, [np.random.uniform(-1, 1, 64) for _ in range(4)])
+
+
+def test_dc_removal():
+    np.random.seed(0)
+    lanes = [(np.random.normal(size=64) + np.random.normal(size=64) * 1j) * 0.1 for _ in range(4)]
+    assert_lanes_equal(DCRemoval(window_len=4), lanes, pipeline_flush=None)
+
+
+def test_fft():
+    np.random.seed(0)
+    lanes = [(np.random.uniform(-1, 1, 128) + np.random.uniform(-1, 1, 128) * 1j) * 0.125 for _ in range(3)]
+    assert_lanes_equal(R2SDF(64, twiddle_bits=18), lanes, pipeline_flush=None)
+
+
+def test_reflected_sub():
+    """ Format of 'scalar - lane data' must match the HARDWARE simulation, here the shift wraps to it """
+
+    class A(Hardware):
+        def __init__(self):
+            self.reg = Sfix(0, 0, -17)
+            self.diff = Sfix(0, 1, -17)
+
+        def main(self, x):
+            self.reg = x
+            self.diff = Sfix(0.5, 0, -17) - self.reg
+            return (Sfix(0.5, 0, -17) - x) << 1, self.diff
+
+    np.random.seed(0)
+    assert_lanes_equal(A(), [np.random.uniform(-1, 1, 64) for _ in range(3)])
+
+
+def test_multiple_outputs():
+    class A(Hardware):
+        def __init__(self):
+            self.reg = Sfix(0, 0, -17)
+            self.counter = 0
+
+        def main(self, x, y):
+            self.reg = x * y
+            self.counter += 1
+            return self.reg, self.counter
+
+    np.random.seed(0)
+    a = [np.random.uniform(-1, 1, 16) for _ in range(2)]
+    b = [np.random.uniform(-1, 1, 16) for _ in range(2)]
+    outs = simulate_lanes(A(), a, b)
+    for i in range(2):
+        expected = simulate(A(), a[i], b[i], simulations=['HARDWARE'])['HARDWARE']
+        np.testing.assert_array_equal(expected[0], outs[i][0])
+        assert outs[i][1] == expected[1] == list(range(16))
+
+
+def test_data_dependent_control():
+    class A(Hardware):
+        def __init__(self):
+            self.reg = Sfix(0, 0, -17)
+
+        def main(self, x):
+            if x > 0:
+                self.reg = x
+            return self.reg
+
+    with pytest.raises(LaneDivergence):
+        simulate_lanes(A(), [[0.1, 0.2], [-0.1, 0.2]])
+
+
+def test_control_inputs_must_match():
+    class A(Hardware):
+        def main(self, x):
+            return x
+
+    with pytest.raises(LaneDivergence):
+        simulate_lanes(A(), [[True, False], [True, True]])
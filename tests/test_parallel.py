@@ -0,0 +1,36 @@
+import numpy as np
+
+from pyha import simulate, simulate_many
+from pyha.cores.filter.fir.fir import FIR
+
+
+def make_configs():
+    np.random.seed(0)
+    return [{'model': FIR, 'model_args': (list(np.random.uniform(-0.1, 0.1, n)),),
+             'inputs': [np.random.uniform(-1, 1, 32)], 'simulations': ['MODEL', 'HARDWARE']}
+            for n in [2, 4, 8, 16]]
+
+
+def test_results_in_order():
+    configs = make_configs()
+    jobs = simulate_many(configs, workers=2)
+    assert [x.index for x in jobs] == [0, 1, 2, 3]
+    for job, config in zip(jobs, configs):
+        assert job.error is None
+        assert job.simulate_time > 0
+        expected = simulate(FIR(*config['model_args']), *config['inputs'], simulations=['MODEL', 'HARDWARE'])
+        np.testing.assert_array_equal(expected['HARDWARE'], job.result['HARDWARE'])
+
+
+def test_serial():
+    jobs = simulate_many(make_configs()[:2], workers=1)
+    assert all(x.error is None for x in jobs)
+
+
+def test_failed_job():
+    configs = make_configs()[:2]
+    configs[0]['model_args'] = ()  # missing taps
+    jobs = simulate_many(configs, workers=2)
+    assert 'TypeError' in jobs[0].error
+    assert jobs[0].result is None
+    assert jobs[1].error is None
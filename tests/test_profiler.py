@@ -0,0 +1,85 @@
+import pstats
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from pyha import simulate
+from pyha.common.core import PyhaFunc
+from pyha.common.profiler import Profiler, ProfiledFunction
+from pyha.cores.filter.dc_removal.dc_removal import DCRemoval
+
+
+def get_input():
+    np.random.seed(0)
+    return (np.random.uniform(-1, 1, 128) + np.random.uniform(-1, 1, 128) * 1j) * 0.1
+
+
+def test_report():
+    dut = DCRemoval(window_len=4)
+    expected = simulate(deepcopy(dut), get_input(), simulations=['HARDWARE'], pipeline_flush=None)['HARDWARE']
+    sims = simulate(dut, get_input(), simulations=['HARDWARE'], pipeline_flush=None, profile=True)
+    np.testing.assert_array_equal(sims['HARDWARE'], expected)
+
+    entries = {x.location: x for x in sims.profile}
+    assert entries['self.main'].calls == 128
+    assert entries['self.averages[1].main'].calls == 128
+    assert entries['self.main'].total >= entries['self.averages[1].main'].total
+    assert entries['self.main'].own < entries['self.main'].total
+    for phase in ['<input conversion>', '<output conversion>', '<register update>', '<auto-resize>']:
+        assert phase in entries
+    assert entries['self.averages[1].main'].callers['self.main'][0] == 128
+    assert 'self.averages[0].main' in str(sims.profile)
+
+    # wrappers are removed
+    assert not [x for x in vars(dut).values() if isinstance(x, ProfiledFunction)]
+
+
+def test_type_discovery(tmpdir):
+    """ ``PyhaFunc`` methods profile themselves, type discovery still works """
+    dut = DCRemoval(window_len=4)
+    dut._pyha_enable_function_profiling_for_types()
+    sims = simulate(dut, get_input(), simulations=['HARDWARE'], pipeline_flush=None, profile=True)
+
+    entries = {x.location: x for x in sims.profile}
+    assert entries['self.main'].calls == 128
+    assert entries['<type discovery>'].calls > 0
+    assert isinstance(dut.main, PyhaFunc)
+    assert dut.averages[0].main.get_local_types()
+
+    stats = pstats.Stats(Profiler)
+    assert any(x[2] == 'self.main' for x in stats.stats)
+
+    path = str(tmpdir / 'hardware.prof')
+    Profiler.dump_stats(path)
+    assert pstats.Stats(path).total_calls == sum(x.calls for x in sims.profile)
+
+
+def test_memory():
+    sims = simulate(DCRemoval(window_len=4), get_input(), simulations=['HARDWARE'], pipeline_flush=None,
+                    profile='memory')
+    assert sims.profile.memory
+    assert 'ALLOCATED' in str(sims.profile)
+    assert 'BLOCKS' in str(sims.profile)
+    assert Profiler.allocation_sites
+    assert all(hasattr(x, 'count_diff') and hasattr(x, 'size_diff') for x in Profiler.allocation_sites)
+
+
+def test_raises():
+    """ profiler is stopped and the wrappers are removed if the simulation raises """
+    dut = DCRemoval(window_len=4)
+    with pytest.raises(ValueError):
+        simulate(dut, get_input(), [1, 2], simulations=['HARDWARE'], pipeline_flush=None, profile=True)
+    assert not Profiler.enabled
+    assert not Profiler.stack
+    assert not [x for x in vars(dut).values() if isinstance(x, ProfiledFunction)]
+
+
+def test_codegen_uses_interpreter():
+    dut = DCRemoval(window_len=4)
+    expected = simulate(deepcopy(dut), get_input(), simulations=['HARDWARE'], pipeline_flush=None)['HARDWARE']
+    sims = simulate(dut, get_input(), simulations=['HARDWARE'], pipeline_flush=None, profile=True,
+                    backend='codegen')
+    np.testing.assert_array_equal(sims['HARDWARE'], expected)
+    entries = {x.location: x for x in sims.profile}
+    assert entries['self.averages[1].main'].calls == 128
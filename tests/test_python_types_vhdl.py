@@ -140,6 +140,16 @@ class TestVHDLModule:
         assert not c._pyha_type_is_compatible(a)
         assert not c._pyha_type_is_compatible(b)
 
+    def test_pyha_type_signature(self):
+        class A(Hardware):
+            def __init__(self, init):
+                self.REG = init
+                self.f = Sfix(init, 0, -init)
+
+        index = {VHDLModule('name', A(1), A(1))._pyha_type_signature(): 'A_0'}
+        assert index.get(VHDLModule('name', A(1), A(1))._pyha_type_signature()) == 'A_0'
+        assert index.get(VHDLModule('name', A(2), A(2))._pyha_type_signature()) is None
+
     def test_pyha_convert_from_stdlogic(self):
         class B(Hardware):
             def __init__(self):
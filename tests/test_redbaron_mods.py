@@ -1,12 +1,12 @@
 import textwrap
 
 import pytest
-from redbaron import RedBaron
+from redbaron import RedBaron, AtomtrailersNode, AssignmentNode, CallNode
 
 from pyha.common.core import Hardware
 from pyha.common.fixed_point import Sfix, resize
 from pyha.conversion.conversion import get_conversion
-from pyha.conversion.redbaron_transforms import convert
+from pyha.conversion.redbaron_transforms import convert, find_all, remove_unconverted_functions
 
 
 @pytest.fixture
@@ -1168,3 +1168,116 @@ class TestForModification:
         conv = get_conversion(dut)
         func = conv.get_function('a')
         assert expect == func.build_body()
+
+
+def test_find_all_order():
+    code = textwrap.dedent("""\
+        class T:
+            def main(self, a):
+                b = self.sub.main(a.real) + c[self.f(1)]
+                for x in self.arr:
+                    self.x = x.imag""")
+    red = RedBaron(code)[0]
+    for identifier, node_type in [('atomtrailers', AtomtrailersNode), ('assign', AssignmentNode), ('call', CallNode)]:
+        assert find_all(red, node_type) == list(red.find_all(identifier))
+
+
+def test_remove_unconverted_functions():
+    class T(Hardware):
+        """ doc """
+
+        def __init__(self):
+            self.a = 1
+
+        def main(self, x):
+            # comment
+            return x
+
+        # model comment
+        @staticmethod
+        def model():
+            pass
+
+        def not_called(self):
+            pass
+
+        def _pyha_hidden(self):
+            pass
+
+    dut = T()
+    dut._pyha_enable_function_profiling_for_types()
+    dut.main(1)
+    source = textwrap.dedent('''\
+        class T(Hardware):
+            """ doc """
+
+            def __init__(self):
+                self.a = 1
+
+            def main(self, x):
+                # comment
+                return x
+
+            # model comment
+            @staticmethod
+            def model():
+                pass
+
+            def not_called(self):
+                pass
+
+            def _pyha_hidden(self):
+                pass
+        ''')
+    expect = textwrap.dedent('''\
+        class T(Hardware):
+            """ doc """
+
+            def main(self, x):
+                # comment
+                return x
+        ''')
+    assert remove_unconverted_functions(source, dut) == expect
+
+
+def test_remove_unconverted_functions_comments():
+    """ Trailing comments and decorators of removed functions must not end up in the previous function """
+    source = textwrap.dedent('''\
+        class T(Hardware):
+            def main(self, x):
+                return x
+                # main trailing
+
+            @staticmethod
+            @other_decorator
+            def model(x):
+                pass
+                # model trailing
+                    # deeper
+
+            # about 'next'
+            def next(self):
+                pass
+            # class trailing
+        ''')
+    expect = textwrap.dedent('''\
+        class T(Hardware):
+            def main(self, x):
+                return x
+                # main trailing
+
+            # about 'next'
+            def next(self):
+                pass
+            # class trailing
+        ''')
+    assert remove_unconverted_functions(source) == expect
+
+    expect = textwrap.dedent('''\
+        class T(Hardware):
+            def main(self, x):
+                return x
+                # main trailing
+            # class trailing
+        ''')
+    assert remove_unconverted_functions(source.replace('def next', 'def __next'), None) == expect
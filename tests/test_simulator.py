@@ -0,0 +1,99 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from pyha import Simulator, simulate
+from pyha.cores.fft.fft_core.r2sdf import R2SDF
+from pyha.cores.filter.dc_removal.dc_removal import DCRemoval
+from pyha.cores.filter.fir.fir import FIR
+
+
+def test_incremental_run():
+    np.random.seed(0)
+    inp = np.random.uniform(-1, 1, 128)
+    dut = FIR([0.01, 0.02, 0.03, 0.04, 0.03, 0.02, 0.01])
+    expected = simulate(deepcopy(dut), inp, simulations=['HARDWARE'])['HARDWARE']
+
+    sim = Simulator(deepcopy(dut))
+    sim.run(inp[:50]).run(inp[50:100])
+    sim.assert_equal(rtol=1e-3, atol=1e-4)
+    sim.run(inp[100:]).flush()
+    np.testing.assert_array_equal(sim.hardware, expected)
+    sim.assert_equal(rtol=1e-3, atol=1e-4)
+
+    with pytest.raises(Exception):
+        sim.run(inp)
+
+
+@pytest.mark.parametrize('dut', [
+    DCRemoval(window_len=4),
+    R2SDF(16, twiddle_bits=18),
+], ids=['dc_removal', 'r2sdf'])
+def test_checkpoint(dut):
+    """ Designs with 'ShiftRegister', 'RAM' and lists of submodules """
+    np.random.seed(0)
+    inp = (np.random.uniform(-1, 1, 256) + np.random.uniform(-1, 1, 256) * 1j) * 0.1
+    expected = Simulator(deepcopy(dut), pipeline_flush=None).run(inp).hardware
+
+    sim = Simulator(deepcopy(dut), pipeline_flush=None).run(inp[:100])
+    checkpoint = sim.checkpoint()
+    sim.run(inp[100:])
+    np.testing.assert_array_equal(sim.hardware, expected)
+
+    # branch again from the same state
+    sim.restore(checkpoint).run(inp[100:])
+    np.testing.assert_array_equal(sim.hardware, expected)
+
+
+def test_checkpoint_branches():
+    """ Checkpoint does not copy the inputs and outputs, restoring one branch must not change the others """
+    np.random.seed(0)
+    inp = np.random.uniform(-1, 1, 96)
+    other = np.random.uniform(-1, 1, 48)
+    dut = FIR([0.1, 0.2, 0.3])
+    expected = Simulator(deepcopy(dut)).run(inp).hardware
+
+    sim = Simulator(deepcopy(dut)).run(inp[:48])
+    first = sim.checkpoint()
+    assert first['outputs'][0] is sim.outputs
+
+    sim.run(inp[48:])
+    second = sim.checkpoint()
+
+    sim.restore(first).run(other)
+    assert len(sim.outputs) == len(expected) and len(sim.model_inputs[0]) == 96
+
+    sim.restore(second)
+    np.testing.assert_array_equal(sim.hardware, expected)
+    sim.assert_equal(rtol=1e-3, atol=1e-4)
+
+    sim.restore(first).run(inp[48:])
+    np.testing.assert_array_equal(sim.hardware, expected)
+
+
+def test_save_restore_new_instance(tmpdir):
+    """ Resume after crash: fresh design object, state from disk """
+    np.random.seed(0)
+    inp = (np.random.uniform(-1, 1, 128) + np.random.uniform(-1, 1, 128) * 1j) * 0.1
+    expected = Simulator(DCRemoval(window_len=4), pipeline_flush=None).run(inp).hardware
+
+    path = str(tmpdir / 'checkpoint.pkl')
+    Simulator(DCRemoval(window_len=4), pipeline_flush=None).run(inp[:70]).save(path)
+
+    sim = Simulator(DCRemoval(window_len=4), pipeline_flush=None).restore(path)
+    sim.run(inp[70:])
+    np.testing.assert_array_equal(sim.hardware, expected)
+
+
+def test_codegen_backend_restore():
+    np.random.seed(0)
+    inp = np.random.uniform(-1, 1, 64)
+    dut = FIR([0.1, 0.2, 0.3])
+    expected = Simulator(deepcopy(dut)).run(inp).hardware
+
+    sim = Simulator(deepcopy(dut), backend='codegen').run(inp[:20])
+    checkpoint = sim.checkpoint()
+    sim.run(inp[20:40])
+    sim.restore(checkpoint).run(inp[20:])
+    np.testing.assert_array_equal(sim.hardware, expected)
@@ -0,0 +1,73 @@
+import tempfile
+from copy import deepcopy
+
+import numpy as np
+
+from pyha import simulate, simulate_stream
+from pyha.cores.filter.dc_removal.dc_removal import DCRemoval
+from pyha.cores.filter.fir.fir import FIR
+from pyha.simulation.streaming import stream
+
+
+def collect(chunks):
+    ret = []
+    for name, chunk in chunks:
+        assert name == 'HARDWARE'
+        ret += list(chunk)
+    return ret
+
+
+def test_fir_generator_input():
+    np.random.seed(0)
+    inp = np.random.uniform(-1, 1, 100)
+    dut = FIR([0.01, 0.02, 0.03, 0.04, 0.03, 0.02, 0.01])
+    expected = simulate(deepcopy(dut), inp, simulations=['HARDWARE'])['HARDWARE']
+
+    samples = (x for x in inp)
+    chunks = list(simulate_stream(deepcopy(dut), samples, chunk_size=16))
+    assert all(len(chunk) <= 16 for _, chunk in chunks)
+    np.testing.assert_array_equal(collect(chunks), expected)
+
+
+def test_chunked_input():
+    """ Input is given as chunks (e.g. blocks read from file), chunk sizes do not need to match 'chunk_size' """
+    np.random.seed(0)
+    inp = np.random.uniform(-1, 1, 100)
+    dut = FIR([0.1, 0.2, 0.3])
+    expected = simulate(deepcopy(dut), inp, simulations=['HARDWARE'])['HARDWARE']
+
+    blocks = np.array_split(inp, 7)
+    got = collect(simulate_stream(deepcopy(dut), blocks, chunk_size=10))
+    np.testing.assert_array_equal(got, expected)
+
+
+def test_data_valid_callback():
+    np.random.seed(0)
+    inp = (np.random.normal(size=128) + np.random.normal(size=128) * 1j) * 0.1
+    dut = DCRemoval(window_len=4)
+    expected = simulate(deepcopy(dut), inp, simulations=['HARDWARE'], pipeline_flush=None)['HARDWARE']
+
+    got = collect(simulate_stream(deepcopy(dut), iter(inp), chunk_size=50, pipeline_flush=None))
+    np.testing.assert_array_equal(got, expected)
+
+
+def test_sink():
+    inp = np.random.uniform(-1, 1, 64)
+    dut = FIR([0.1, 0.2, 0.3])
+    expected = simulate(deepcopy(dut), inp, simulations=['HARDWARE'])['HARDWARE']
+
+    got = []
+    count = simulate_stream(deepcopy(dut), inp, chunk_size=32, sink=lambda name, chunk: got.extend(chunk))
+    assert count == 3  # two input chunks and the pipeline flush
+    np.testing.assert_array_equal(got, expected)
+
+
+def test_rtl_temporary_directory(tmpdir, monkeypatch):
+    """ Recorded inputs go to a temporary directory, that is removed when the generator is closed """
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmpdir))
+    inp = np.random.uniform(-1, 1, 64)
+    chunks = stream(FIR([0.1, 0.2, 0.3]), [inp], 16, None, 'self.DELAY', rtl=True, conversion_path=None)
+    next(chunks)
+    assert len(tmpdir.listdir()) == 1
+    chunks.close()
+    assert not tmpdir.listdir()
@@ -0,0 +1,61 @@
+import numpy as np
+
+from pyha import Hardware, Sfix, simulate, SfixArray
+from pyha.common.context_managers import SimPath
+from pyha.common.telemetry import Telemetry
+
+
+def test_counts_per_location():
+    Telemetry.reset()
+    with SimPath('a'):
+        for x in [1.5, 1.25, 1.75]:
+            Sfix(x, 0, -17)
+    with SimPath('b'):
+        Sfix(-3.0, 0, -17, overflow_style='saturate')
+
+    report = Telemetry.report()
+    assert len(report) == 2
+    assert report[0].kind == 'WRAP'
+    assert report[0].location == 'a'
+    assert report[0].count == 3
+    assert report[0].min == 1.25
+    assert report[0].max == 1.75
+
+    assert report[1].kind == 'SATURATION'
+    assert report[1].location == 'b'
+    assert report[1].count == 1
+    assert 'SATURATION' in str(report)
+
+
+def test_array_events():
+    Telemetry.reset()
+    SfixArray([0.5, 1.5, 2.5, -4.0], 0, -17, overflow_style='saturate')
+    report = Telemetry.report()
+    assert report[0].count == 3
+    assert report[0].min == -4.0
+    assert report[0].max == 2.5
+
+
+def test_simulate():
+    class T(Hardware):
+        def __init__(self):
+            self.reg = Sfix(0, 0, -17)
+            self.DELAY = 1
+
+        def main(self, x):
+            self.reg = x + x
+            return self.reg
+
+    inp = [0.1, 0.6, 0.2, 0.7, 0.8]
+    first_events = []
+    sims = simulate(T(), inp, simulations=['HARDWARE'], overflow_hook=first_events.append)
+
+    assert len(sims.overflows) == 1
+    events = sims.overflows[0]
+    assert events.kind == 'WRAP'
+    assert events.location == 'reg='
+    assert events.count == 3
+    assert events.first_cycle == 1
+    assert events.last_cycle == 4
+    assert first_events == [events]
+    assert Telemetry.hook is None
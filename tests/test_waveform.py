@@ -0,0 +1,109 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+
+from pyha import simulate, Simulator, Hardware, Complex
+from pyha.cores.filter.dc_removal.dc_removal import DCRemoval
+from pyha.simulation.waveform import WaveformRecorder, Waveform
+
+
+def get_input(n=512):
+    np.random.seed(0)
+    return (np.random.uniform(-1, 1, n) + np.random.uniform(-1, 1, n) * 1j) * 0.1
+
+
+def output_of(waveform, port='self.main'):
+    """ Valid outputs from the port columns """
+    out = waveform.value(f'{port}.output.data.real') + waveform.value(f'{port}.output.data.imag') * 1j
+    return out[waveform[f'{port}.output.valid'].astype(bool)]
+
+
+def test_registers_and_ports():
+    dut = DCRemoval(window_len=4)
+    expected = simulate(deepcopy(dut), get_input(), simulations=['HARDWARE'], pipeline_flush=None)['HARDWARE']
+
+    recorder = WaveformRecorder(['self', 'self.main', 'self.averages[1].main'], chunk_size=100)
+    simulate(dut, get_input(), simulations=['HARDWARE'], pipeline_flush=None, waveform=recorder)
+    waveform = recorder.waveform
+
+    assert waveform.cycles == 512
+    np.testing.assert_array_equal(output_of(waveform), expected)
+    assert 'self.averages[0].acc.real' in waveform.names
+    assert waveform.meta['self.averages[0].acc.real']['kind'] == 'fixed'
+    assert 'self.averages[1].main.input.data.imag' in waveform.names
+
+    # registers are sampled before the update, 'main' returns the current value of the output register
+    np.testing.assert_array_equal(waveform.value('self.output.data.real'),
+                                  waveform.value('self.main.output.data.real'))
+
+    # probes are removed
+    assert 'main' not in vars(dut)
+
+
+def test_disk(tmpdir):
+    path = tmpdir / 'run.wave'
+    recorder = WaveformRecorder('self.main', path=str(path), chunk_size=64)
+    sim = Simulator(DCRemoval(window_len=4), pipeline_flush=None, waveform=recorder)
+    sim.run(get_input()[:300])
+
+    partial = Waveform.load(str(path))  # readable during the simulation
+    assert partial.cycles == 256
+
+    sim.run(get_input()[300:])
+    recorder.stop()
+    assert all(len(x.buffer) == 64 for x in recorder.columns)
+
+    waveform = Waveform.load(str(path))
+    assert waveform.cycles == 512
+    np.testing.assert_array_equal(output_of(waveform), sim.hardware)
+
+
+def test_vcd(tmpdir):
+    recorder = WaveformRecorder(['self.output', 'self.main'])
+    simulate(DCRemoval(window_len=4), get_input(64), simulations=['HARDWARE'], pipeline_flush=None,
+             waveform=recorder)
+    path = str(tmpdir / 'run.vcd')
+    recorder.waveform.to_vcd(path, chunk_size=16)
+
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert lines[0] == '$timescale 1ns $end'
+    assert '$scope module main $end' in lines
+    assert lines.count('$enddefinitions $end') == 1
+    variables = [x.split() for x in lines if x.startswith('$var')]
+    assert ['$var', 'wire', '18', variables[0][3], 'imag', '$end'] == variables[0]
+    assert ['$var', 'wire', '1'] == [x for x in variables if x[4] == 'valid'][0][:3]
+
+    times = [int(x[1:]) for x in lines if x.startswith('#')]
+    assert times == sorted(set(times))
+    assert times[-1] == 64 * 10
+
+
+def test_unknown_signal():
+    with pytest.raises(ValueError):
+        WaveformRecorder('self.nope').start(DCRemoval(window_len=4))
+
+
+def test_complex_raw():
+    """ Complex registers are recorded as raw integers if the float value is exact, wider ones as 'real' """
+
+    class Registers(Hardware):
+        def __init__(self):
+            self.narrow = Complex(0, 0, -17)
+            self.wide = Complex(0, 0, -60)
+
+        def main(self, x):
+            self.narrow = x
+            self.wide = x
+            return self.narrow
+
+    recorder = WaveformRecorder(['self'])
+    sims = simulate(Registers(), get_input(64), simulations=['HARDWARE'], pipeline_flush=None, waveform=recorder)
+    waveform = recorder.waveform
+
+    assert waveform.meta['self.narrow.real']['kind'] == 'fixed'
+    assert waveform.meta['self.wide.imag']['kind'] == 'real'
+    # 'main' returns the current value of the register
+    np.testing.assert_array_equal(waveform['self.narrow.real'], np.real(sims['HARDWARE']) * 2 ** 17)
+    np.testing.assert_array_equal(waveform['self.narrow.imag'], np.imag(sims['HARDWARE']) * 2 ** 17)